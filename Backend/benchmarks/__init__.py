@@ -0,0 +1,3 @@
+# Benchmarki API na lokalnej bazie SQLite (DB_BACKEND=sqlite):
+#   python -m benchmarks.generator --receipts 1000000   - dane syntetyczne
+#   python -m benchmarks                               - scenariusze i porównanie z baseline
@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+
+from benchmarks.generator import BENCHMARK_DB_PATH, generate
+
+# Konfiguracja aplikacji musi być ustawiona przed importem main
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", BENCHMARK_DB_PATH)
+os.environ.setdefault("SERVER_TIMING", "true")
+# Mierzymy ścieżkę do bazy, a nie cache odpowiedzi
+os.environ.setdefault("RESPONSE_CACHE_MAX_BYTES", "0")
+# Scenariusz shopping_list potrzebuje indeksu cen zbudowanego przy starcie
+os.environ.setdefault("PRICE_INDEX", "true")
+
+
+def wait_for_startup_indexes(timeout: float = 600.0) -> None:
+    """
+    Czeka na indeksy budowane w tle przy starcie - skan pozycji paragonów konkurowałby
+    o GIL z mierzonymi żądaniami i wyniki pierwszych scenariuszy zależałyby od przypadku
+    """
+    from services import aggregates, price_index
+
+    stores = [
+        store for enabled, store in (
+            (price_index.PRICE_INDEX, price_index.price_index),
+            (aggregates.STATS_AGGREGATES, aggregates.aggregate_store)
+        )
+        if enabled
+    ]
+    deadline = time.monotonic() + timeout
+    while any(not store.ready for store in stores) and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+def main() -> int:
+    from benchmarks.report import format_report, load_baseline, regressions, save_baseline, summarize
+    from benchmarks.scenarios import SCENARIOS, BenchmarkContext, run_scenario
+
+    parser = argparse.ArgumentParser(description="Benchmarki API na lokalnej bazie SQLite")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Lista scenariuszy oddzielona przecinkami")
+    parser.add_argument("--requests", type=int, default=200, help="Liczba żądań na scenariusz")
+    parser.add_argument("--concurrency", type=int, default=1, help="Liczba równoczesnych żądań")
+    parser.add_argument("--generate", type=int, default=0, help="Wygeneruj bazę z podaną liczbą paragonów")
+    parser.add_argument("--save-baseline", action="store_true", help="Zapisz wyniki jako nowy baseline")
+    args = parser.parse_args()
+
+    db_path = os.environ["SQLITE_PATH"]
+    if args.generate or not os.path.exists(db_path):
+        print(generate(db_path, receipts=args.generate or 100_000))
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    ctx = BenchmarkContext(db_path)
+    results = {}
+    with TestClient(app) as client:
+        wait_for_startup_indexes()
+        for name in args.scenarios.split(","):
+            results[name] = summarize(run_scenario(client, name, ctx, args.requests, concurrency=args.concurrency))
+
+    baseline = load_baseline()
+    print(format_report(results, baseline))
+
+    if args.save_baseline:
+        save_baseline(results)
+        return 0
+
+    found = regressions(results, baseline)
+    for regression in found:
+        print(f"REGRESJA {regression}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+from typing import Any, Dict
+
+from benchmarks.generator import BENCHMARK_DB_PATH, generate
+
+# Jak w python -m benchmarks - konfiguracja przed importem main
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", BENCHMARK_DB_PATH)
+os.environ.setdefault("SERVER_TIMING", "true")
+os.environ.setdefault("RESPONSE_CACHE_MAX_BYTES", "0")
+
+
+def run(requests: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Scenariusz stats z funkcjami RPC i z agregatami w pamięci (plus czas ich odbudowy)
+    """
+    from fastapi.testclient import TestClient
+
+    from benchmarks.report import summarize
+    from benchmarks.scenarios import BenchmarkContext, run_scenario
+    from main import app
+    from services.aggregates import aggregate_store
+    from services.db import supabase_client
+
+    ctx = BenchmarkContext(os.environ["SQLITE_PATH"])
+    results = {}
+    with TestClient(app) as client:
+        aggregate_store.ready = False
+        results["stats_rpc"] = summarize(run_scenario(client, "stats", ctx, requests))
+
+        print(aggregate_store.rebuild(supabase_client))
+        results["stats_aggregates"] = summarize(run_scenario(client, "stats", ctx, requests))
+    return results
+
+
+def main() -> int:
+    from benchmarks.report import format_report
+
+    parser = argparse.ArgumentParser(description="Statystyki: funkcje RPC vs agregaty w pamięci")
+    parser.add_argument("--requests", type=int, default=200, help="Liczba żądań na wariant")
+    args = parser.parse_args()
+
+    db_path = os.environ["SQLITE_PATH"]
+    if not os.path.exists(db_path):
+        print(generate(db_path))
+    print(format_report(run(args.requests), {}))
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.aggregates [--requests N]
+    sys.exit(main())
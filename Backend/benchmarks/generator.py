@@ -0,0 +1,164 @@
+import argparse
+import csv
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+from services.sqlite_backend import SQLiteClient
+
+BENCHMARK_DB_PATH = os.getenv("BENCHMARK_DB_PATH", "benchmark.db")
+
+_SEED_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "product_categories.csv")
+
+SHOPS = ["Biedronka", "Lidl", "Żabka", "Kaufland", "Carrefour", "Auchan", "Netto", "Dino", "Stokrotka", "Lewiatan"]
+CITIES = ["Warszawa", "Kraków", "Łódź", "Wrocław", "Poznań", "Gdańsk", "Szczecin", "Lublin"]
+
+# Pozycje w stylu paragon.txt (gastronomia, nazwy z OCR)
+MENU_ITEMS = [
+    "PLACEK PO WEGIERSKU", "SCHABOWY PANIEROWANY", "GRZANE WINO", "GRZANE Z SOKIEM I CYNAMONEM",
+    "CZEKOLADA DLA DZIARSKIEJ BABKI", "CYTRYNOWKA", "PIEROGI RUSKIE", "ZUREK W CHLEBIE",
+    "BIGOS MYSLIWSKI", "ZAPIEKANKA Z PIECZARKAMI", "KOMPOT Z SUSZU", "HERBATA Z CYTRYNA"
+]
+
+USER_TOKEN_PREFIX = "bench-user-"
+
+
+def base_names() -> List[str]:
+    with open(_SEED_PATH, encoding="utf-8") as seed_file:
+        return [row["name"] for row in csv.DictReader(seed_file)] + MENU_ITEMS
+
+
+def ocr_noise(rng: random.Random, name: str) -> str:
+    """
+    Zniekształca nazwę jak OCR: podmiana, zgubienie albo podwojenie jednej litery
+    """
+    i = rng.randrange(len(name))
+    kind = rng.random()
+    if kind < 0.4:
+        return name[:i] + rng.choice("ABCDEHIKLMNOPRSTUWYZ") + name[i + 1:]
+    if kind < 0.7:
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i] + name[i:]
+
+
+def product_names(rng: random.Random, count: int) -> List[str]:
+    names = base_names()
+    variants = dict.fromkeys(names)
+    sizes = ["", " 1L", " 0.5L", " 200G", " 500G", " 1KG", " 6SZT", " MAXI", " BIO", " PROMO"]
+    while len(variants) < count:
+        name = f"{rng.choice(names)}{rng.choice(sizes)}"
+        variants[ocr_noise(rng, name) if rng.random() < 0.1 else name] = None
+    return list(variants)[:count]
+
+
+def generate(
+    path: str = BENCHMARK_DB_PATH,
+    users: int = 1_000,
+    receipts: int = 100_000,
+    products: int = 5_000,
+    seed: int = 42,
+    chunk_size: int = 10_000
+) -> dict:
+    """
+    Tworzy bazę SQLite z użytkownikami, sklepami, produktami i paragonami. Ten sam seed
+    daje te same dane, więc wyniki benchmarków są porównywalne między uruchomieniami.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    client = SQLiteClient(path)
+    conn = client.connection
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (id, token, name) VALUES (?, ?, ?)",
+            [(i, f"{USER_TOKEN_PREFIX}{i}", f"Użytkownik {i}") for i in range(1, users + 1)]
+        )
+        conn.executemany("INSERT INTO shops (id, name) VALUES (?, ?)", list(enumerate(SHOPS, start=1)))
+
+        parcels: List[Tuple[int, int]] = []
+        for shop_id in range(1, len(SHOPS) + 1):
+            for city in rng.sample(CITIES, rng.randint(1, 4)):
+                parcels.append((len(parcels) + 1, shop_id))
+                conn.execute(
+                    "INSERT INTO shops_parcels (id, shops_id, location) VALUES (?, ?, ?)",
+                    (len(parcels), shop_id, city)
+                )
+
+        names = product_names(rng, products)
+        conn.executemany("INSERT INTO product (id, name) VALUES (?, ?)", list(enumerate(names, start=1)))
+
+    base_prices = [round(rng.uniform(1.5, 40.0), 2) for _ in names]
+    shop_factors = [rng.uniform(0.9, 1.15) for _ in SHOPS]
+    first_day = date.today() - timedelta(days=730)
+    created = datetime.now() - timedelta(days=730)
+
+    indeks_id = 0
+    receipt_id = 0
+    while receipt_id < receipts:
+        receipt_rows = []
+        indeks_rows = []
+        connect_rows = []
+        for _ in range(min(chunk_size, receipts - receipt_id)):
+            receipt_id += 1
+            parcel_id, shop_id = rng.choice(parcels)
+            day = first_day + timedelta(days=rng.randrange(730))
+            created += timedelta(seconds=rng.randint(1, 120))
+
+            total = 0.0
+            for _ in range(rng.randint(1, 20)):
+                product = rng.randrange(len(names))
+                quantity = rng.choice((1, 1, 1, 2, 3))
+                price = round(base_prices[product] * shop_factors[shop_id - 1] * rng.uniform(0.95, 1.05) * quantity, 2)
+                total += price
+                indeks_id += 1
+                indeks_rows.append((indeks_id, names[product], price, product + 1, shop_id))
+                connect_rows.append((indeks_id, receipt_id, indeks_id, quantity))
+
+            # jak w ścieżce /receipt/save: receipts.shop_id to ID lokalizacji sklepu
+            receipt_rows.append((
+                receipt_id, rng.randint(1, users), day.isoformat(),
+                created.isoformat(timespec="milliseconds"), parcel_id, round(total, 2),
+                receipt_id, created.isoformat(timespec="milliseconds")
+            ))
+
+        with conn:
+            conn.executemany(
+                "INSERT INTO receipts (id, creator_id, date, create_date, shop_id, sum_price, items_saved, sync_seq, synced_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)",
+                receipt_rows
+            )
+            conn.executemany(
+                "INSERT INTO receipt_indekses (id, indeks, price, product_id, shop_id) VALUES (?, ?, ?, ?, ?)",
+                indeks_rows
+            )
+            conn.executemany(
+                "INSERT INTO receipt_connect_indekses (id, receipt_id, receipt_indeks_id, quantity) VALUES (?, ?, ?, ?)",
+                connect_rows
+            )
+        print(f"{receipt_id}/{receipts} paragonów")
+
+    conn.execute("ANALYZE")
+    client.close()
+    return {
+        "path": path,
+        "users": users,
+        "receipts": receipts,
+        "items": indeks_id,
+        "products": len(names),
+        "seconds": round(time.perf_counter() - started, 1)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generuje syntetyczną bazę SQLite do benchmarków")
+    parser.add_argument("--path", default=BENCHMARK_DB_PATH)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(generate(args.path, args.users, args.receipts, args.products, args.seed))
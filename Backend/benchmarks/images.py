@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import io
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import AsyncIterator, Dict, List
+
+from benchmarks.report import percentile
+
+# Przesyłanie kawałkami o rozmiarze zbliżonym do tego, co daje serwer ASGI
+CHUNK_SIZE = 64 * 1024
+
+
+def receipt_image(rng: random.Random, width: int = 1200, height: int = 2400) -> bytes:
+    """
+    Syntetyczne zdjęcie paragonu: ciemne wiersze "tekstu" na jasnym tle, lekko przekrzywione
+    """
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(image)
+    for y in range(80, height - 80, 48):
+        x = 60
+        while x < width - 120:
+            word = rng.randint(30, 160)
+            draw.rectangle((x, y, x + word, y + 22), fill=rng.randint(10, 60))
+            x += word + rng.randint(15, 40)
+    image = image.rotate(rng.uniform(-4, 4), expand=True, fillcolor=235).convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def _chunks(data: bytes) -> AsyncIterator[bytes]:
+    for start in range(0, len(data), CHUNK_SIZE):
+        yield data[start:start + CHUNK_SIZE]
+        await asyncio.sleep(0)
+
+
+async def run(images: List[bytes], concurrency: int) -> Dict[str, float]:
+    from services import receipt_images
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def upload(data: bytes) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await receipt_images.store_image(_chunks(data))
+            latencies.append(time.perf_counter() - started)
+
+    # rozgrzewka - start procesów roboczych nie wlicza się do wyniku
+    await receipt_images.store_image(_chunks(images[0]))
+    latencies.clear()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(data) for data in images[1:]))
+    elapsed = time.perf_counter() - started
+    receipt_images.shutdown()
+
+    return {
+        "images": len(images) - 1,
+        "concurrency": concurrency,
+        "images_per_second": round((len(images) - 1) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        # ru_maxrss w KB (Linux); dla procesów roboczych - największy z nich
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_worker_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Przepustowość przetwarzania zdjęć paragonów")
+    parser.add_argument("--images", type=int, default=40, help="Liczba przesyłanych zdjęć")
+    parser.add_argument("--concurrency", type=int, default=8, help="Liczba równoległych przesłań")
+    args = parser.parse_args()
+
+    # Zdjęcia trafiają do katalogu tymczasowego, żeby deduplikacja nie pominęła przetwarzania
+    with tempfile.TemporaryDirectory() as images_dir:
+        os.environ["RECEIPT_IMAGES_DIR"] = images_dir
+        rng = random.Random(42)
+        images = [receipt_image(rng) for _ in range(args.images + 1)]
+        print(asyncio.run(run(images, args.concurrency)))
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.images [--images N] [--concurrency C]
+    sys.exit(main())
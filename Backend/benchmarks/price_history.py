@@ -0,0 +1,63 @@
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Dict
+
+from benchmarks.report import percentile
+from services.price_history import PriceHistory
+
+
+def fill(history: PriceHistory, observations: int, products: int, shops: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    first_day = date(2023, 1, 1)
+    for i in range(observations):
+        day = first_day + timedelta(days=i * 1000 // observations)
+        history.add(rng.randrange(products), rng.randrange(shops), day.isoformat(), round(rng.uniform(1.0, 50.0), 2))
+
+
+def run(observations: int, products: int, shops: int, queries: int) -> Dict[str, float]:
+    tracemalloc.start()
+    history = PriceHistory()
+    started = time.perf_counter()
+    fill(history, observations, products, shops)
+    fill_seconds = time.perf_counter() - started
+    # generator danych nie zostawia nic w pamięci - cały przyrost to historia
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    rng = random.Random(7)
+    result = {
+        "observations": observations,
+        "series": sum(len(shops) for shops in history._series.values()),
+        "bytes_per_observation": round(memory / observations, 1),
+        "mb_per_million": round(memory / observations * 1_000_000 / 1024 / 1024, 1),
+        "appends_per_second": round(observations / fill_seconds)
+    }
+    for bucket in ("raw", "day", "week", "month"):
+        latencies = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            history.history(rng.randrange(products), None, "2023-06-01", "2024-06-01", bucket)
+            latencies.append(time.perf_counter() - started)
+        result[f"{bucket}_p50_ms"] = round(percentile(latencies, 50) * 1000, 3)
+        result[f"{bucket}_p95_ms"] = round(percentile(latencies, 95) * 1000, 3)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pamięć i czas zapytań historii cen")
+    parser.add_argument("--observations", type=int, default=1_000_000, help="Liczba obserwacji cen")
+    parser.add_argument("--products", type=int, default=5_000, help="Liczba produktów")
+    parser.add_argument("--shops", type=int, default=50, help="Liczba sklepów")
+    parser.add_argument("--queries", type=int, default=500, help="Liczba zapytań na rodzaj agregacji")
+    args = parser.parse_args()
+    print(run(args.observations, args.products, args.shops, args.queries))
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.price_history [--observations N]
+    sys.exit(main())
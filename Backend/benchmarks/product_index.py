@@ -0,0 +1,78 @@
+import argparse
+import random
+import re
+import sys
+import time
+from typing import Dict
+
+from benchmarks.generator import ocr_noise, product_names
+from benchmarks.report import percentile
+from services.product_index import ProductIndex, attributes, normalize_name
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def other_size(rng: random.Random, name: str) -> str:
+    """
+    Ta sama nazwa z inną liczbą ("MLEKO 2%" -> "MLEKO 3%") - inny produkt
+    """
+    numbers = list(_NUMBER_RE.finditer(name))
+    if not numbers:
+        return f"{name} {rng.randint(2, 9)}SZT"
+    number = rng.choice(numbers)
+    changed = str(int(number.group()) + rng.randint(1, 9))
+    return name[:number.start()] + changed + name[number.end():]
+
+
+def run(products: int, queries: int, seed: int = 42) -> Dict[str, float]:
+    rng = random.Random(seed)
+    names = product_names(rng, products)
+    index = ProductIndex()
+    started = time.perf_counter()
+    for product_id, name in enumerate(names):
+        index.add(product_id, name)
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    found = false_merges = 0
+    for _ in range(queries):
+        product_id = rng.randrange(len(names))
+        # połowa zapytań to nazwa z błędem OCR, połowa - ta sama nazwa z inną liczbą
+        noisy = rng.random() < 0.5
+        query = ocr_noise(rng, names[product_id]) if noisy else other_size(rng, names[product_id])
+
+        started = time.perf_counter()
+        match = index.match(query)
+        latencies.append(time.perf_counter() - started)
+
+        if noisy:
+            found += match is not None and match[0] == product_id
+        elif match is not None and attributes(normalize_name(names[match[0]])) != attributes(normalize_name(query)):
+            false_merges += 1
+
+    return {
+        "products": len(names),
+        "queries": queries,
+        "build_seconds": round(build_seconds, 3),
+        "matches_per_second": round(queries / sum(latencies)),
+        "p50_us": round(percentile(latencies, 50) * 1_000_000, 1),
+        "p95_us": round(percentile(latencies, 95) * 1_000_000, 1),
+        # odsetek nazw z błędem OCR dopasowanych do właściwego produktu
+        "ocr_recall": round(found / max(1, queries // 2), 3),
+        # dopasowania do produktu o innej liczbie/pojemności - powinno być 0
+        "false_merges": false_merges
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Szybkość i jakość dopasowania nazw produktów")
+    parser.add_argument("--products", type=int, default=50_000, help="Liczba produktów w indeksie")
+    parser.add_argument("--queries", type=int, default=5_000, help="Liczba dopasowywanych nazw")
+    args = parser.parse_args()
+    print(run(args.products, args.queries))
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.product_index [--products N] [--queries Q]
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import json
+import os
+from typing import Any, Dict, List
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Dopuszczalne pogorszenie względem baseline, zanim wynik zostanie oznaczony jako regresja
+REGRESSION_TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", "0.2"))
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(run: Dict[str, Any]) -> Dict[str, Any]:
+    latencies = run["latencies"]
+    return {
+        "requests": run["requests"],
+        "errors": run["errors"],
+        "throughput": round(run["requests"] / run["seconds"], 1) if run["seconds"] else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "db_calls": round(sum(run["db_calls"]) / len(run["db_calls"]), 2) if run["db_calls"] else None
+    }
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], path: str = BASELINE_PATH) -> None:
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump(results, baseline_file, indent=2, ensure_ascii=False)
+
+
+def regressions(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float = REGRESSION_TOLERANCE
+) -> List[str]:
+    """
+    Scenariusze gorsze od baseline: wolniejsze p95, mniejsza przepustowość,
+    więcej zapytań do bazy albo nowe błędy
+    """
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {base['p95_ms']} -> {result['p95_ms']} ms")
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            found.append(f"{name}: przepustowość {base['throughput']} -> {result['throughput']} req/s")
+        if result["db_calls"] is not None and base.get("db_calls") is not None and result["db_calls"] > base["db_calls"]:
+            found.append(f"{name}: zapytania do bazy {base['db_calls']} -> {result['db_calls']} na żądanie")
+        if result["errors"] > base.get("errors", 0):
+            found.append(f"{name}: błędy {base.get('errors', 0)} -> {result['errors']}")
+    return found
+
+
+def format_report(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> str:
+    lines = [
+        f"{'scenariusz':<18}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db/req':>8}{'błędy':>7}{'p95 vs baseline':>18}"
+    ]
+    for name, result in results.items():
+        base = baseline.get(name)
+        change = f"{(result['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%" if base and base["p95_ms"] else "-"
+        db_calls = "-" if result["db_calls"] is None else f"{result['db_calls']:.1f}"
+        lines.append(
+            f"{name:<18}{result['throughput']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+            f"{result['p99_ms']:>10}{db_calls:>8}{result['errors']:>7}{change:>18}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+from typing import Any, Dict
+
+from benchmarks.generator import BENCHMARK_DB_PATH, generate
+
+# Jak w python -m benchmarks - konfiguracja przed importem main
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", BENCHMARK_DB_PATH)
+os.environ.setdefault("SERVER_TIMING", "true")
+os.environ.setdefault("RESPONSE_CACHE_MAX_BYTES", "0")
+
+
+def run(requests: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Scenariusz save z zapisem zapytaniami PostgREST i jednym wywołaniem RPC save_receipt
+    """
+    from fastapi.testclient import TestClient
+
+    from benchmarks.report import summarize
+    from benchmarks.scenarios import BenchmarkContext, run_scenario
+    from main import app
+    from services import paragon_service
+
+    ctx = BenchmarkContext(os.environ["SQLITE_PATH"])
+    results = {}
+    with TestClient(app) as client:
+        for seed, (name, use_rpc) in enumerate((("save", False), ("save_rpc", True))):
+            paragon_service.USE_SAVE_RECEIPT_RPC = use_rpc
+            # inne ziarno - te same paragony drugi raz byłyby duplikatami bez zapisu
+            results[name] = summarize(run_scenario(client, "save", ctx, requests, seed=seed))
+    return results
+
+
+def main() -> int:
+    from benchmarks.report import format_report
+
+    parser = argparse.ArgumentParser(description="Zapis paragonu: osobne zapytania vs RPC save_receipt")
+    parser.add_argument("--requests", type=int, default=200, help="Liczba zapisów na wariant")
+    args = parser.parse_args()
+
+    db_path = os.environ["SQLITE_PATH"]
+    if not os.path.exists(db_path):
+        print(generate(db_path))
+    print(format_report(run(args.requests), {}))
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.save_receipt [--requests N]
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import random
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from benchmarks.generator import MENU_ITEMS, SHOPS, USER_TOKEN_PREFIX, ocr_noise
+
+_SERVER_TIMING_CALLS_RE = re.compile(r'db;[^,]*desc="(\d+) calls"')
+
+# (metoda, ścieżka z parametrami, ciało JSON albo None)
+Request = Tuple[str, str, Optional[Any]]
+
+
+class BenchmarkContext:
+    """
+    Dane potrzebne do budowania żądań: tokeny użytkowników, nazwy produktów, zakres dat
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        try:
+            self.users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            self.products = [row[0] for row in conn.execute("SELECT name FROM product ORDER BY id LIMIT 2000")]
+            first, last = conn.execute("SELECT MIN(date), MAX(date) FROM receipts").fetchone()
+        finally:
+            conn.close()
+        self.first_day = date.fromisoformat(first) if first else date.today() - timedelta(days=365)
+        self.days = max(1, (date.fromisoformat(last) - self.first_day).days) if last else 365
+
+    def token(self, rng: random.Random) -> str:
+        return f"{USER_TOKEN_PREFIX}{rng.randint(1, self.users)}"
+
+    def window(self, rng: random.Random, length: int) -> Tuple[str, str]:
+        start = self.first_day + timedelta(days=rng.randrange(self.days))
+        return start.isoformat(), (start + timedelta(days=length)).isoformat()
+
+    def cursor(self, token: str, offset: int) -> Optional[str]:
+        """
+        next_cursor, który klient dostałby po przejściu offset paragonów (kolejność jak w /paragon/list)
+        """
+        from services.paragon_service import encode_cursor
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute(
+                "SELECT r.date, r.id FROM receipts r JOIN users u ON u.id = r.creator_id WHERE u.token = ? "
+                "ORDER BY r.date DESC NULLS LAST, r.id DESC LIMIT 1 OFFSET ?",
+                (token, offset - 1)
+            ).fetchone()
+        finally:
+            conn.close()
+        return encode_cursor({"date": row[0], "id": row[1]}) if row else None
+
+
+# Paragonów w jednym żądaniu scenariusza bulk_save - przepustowość w paragonach/s to req/s razy tyle
+BULK_RECEIPTS = 100
+
+
+def receipt(rng: random.Random, ctx: BenchmarkContext) -> Dict[str, Any]:
+    items = [
+        {"name": rng.choice(ctx.products), "quantity": rng.choice((1, 1, 2)), "price": round(rng.uniform(1.5, 40.0), 2)}
+        for _ in range(rng.randint(1, 20))
+    ]
+    return {
+        "storeName": rng.choice(SHOPS),
+        "date": ctx.window(rng, 0)[0],
+        "items": items,
+        "total": round(sum(item["price"] * item["quantity"] for item in items), 2),
+        "userId": ctx.token(rng)
+    }
+
+
+def save(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    return "POST", "/receipt/save", receipt(rng, ctx)
+
+
+def bulk_save(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    return "POST", "/receipt/bulk?chunk_size=100", [receipt(rng, ctx) for _ in range(BULK_RECEIPTS)]
+
+
+# Zapisy pozycji z paragon.txt: "1 szt.*39.00", OCR-owe "1 szt,48.00" i "1 szt.x48.00", "2 x 12,50"
+_PARSE_ITEM_FORMATS = ("{qty} szt.*{price}", "{qty} szt,{price}", "{qty} szt.x{price}", "{qty} x {price}")
+
+
+def receipt_text(rng: random.Random, ctx: BenchmarkContext) -> str:
+    """
+    Surowy tekst paragonu jak z OCR: nagłówek, pozycje (czasem nazwa w osobnej linii), SUMA
+    """
+    lines = [rng.choice(SHOPS), "ul. Krakowska 12", ctx.window(rng, 0)[0], "PARAGON FISKALNY"]
+    total = 0.0
+    for _ in range(rng.randint(3, 25)):
+        name = rng.choice(MENU_ITEMS)
+        if rng.random() < 0.3:
+            name = ocr_noise(rng, name)
+        quantity = rng.choice((1, 1, 2))
+        price = round(rng.uniform(4.0, 60.0), 2)
+        total += quantity * price
+        amount = rng.choice(_PARSE_ITEM_FORMATS).format(qty=quantity, price=f"{price:.2f}".replace(".", rng.choice(".,")))
+        if rng.random() < 0.2:
+            lines += [name, amount]
+        else:
+            lines.append(f"{name} {amount}")
+    lines += ["SPRZEDAZ OPODATK. A", f"SUMA PLN {total:.2f}".replace(".", ","), "KARTA"]
+    return "\n".join(lines)
+
+
+def parse(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    return "POST", "/receipt/parse", {"text": receipt_text(rng, ctx), "userId": ctx.token(rng)}
+
+
+def list_first_page(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    return "GET", f"/paragon/list?user_id={ctx.token(rng)}&page=1&page_size=20", None
+
+
+def list_deep(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    return "GET", f"/paragon/list?user_id={ctx.token(rng)}&page={rng.randint(5, 15)}&page_size=20", None
+
+
+def list_deep_cursor(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    # ta sama głębokość co list_deep, ale keyset po kursorze zamiast offsetu
+    token, page = ctx.token(rng), rng.randint(5, 15)
+    cursor = ctx.cursor(token, (page - 1) * 20)
+    url = f"/paragon/list?user_id={token}&page_size=20"
+    return "GET", url + (f"&cursor={cursor}" if cursor else ""), None
+
+
+def date_range(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    start, end = ctx.window(rng, 30)
+    return "GET", f"/paragon/date-range/?user_id={ctx.token(rng)}&start_date={start}&end_date={end}", None
+
+
+def stats(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    start, end = ctx.window(rng, 180)
+    return "GET", f"/api/stats/dashboard?user_id={ctx.token(rng)}&start_date={start}&end_date={end}", None
+
+
+def shops(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    return "GET", "/shops/list", None
+
+
+def shopping_list(rng: random.Random, ctx: BenchmarkContext) -> Request:
+    items = [{"name": name, "quantity": rng.choice((1, 1, 2))} for name in rng.sample(ctx.products, 50)]
+    return "POST", "/lists/optimize", {"items": items, "max_stores": 3}
+
+
+SCENARIOS: Dict[str, Callable[[random.Random, BenchmarkContext], Request]] = {
+    "save": save,
+    "bulk_save": bulk_save,
+    "parse": parse,
+    "list_first_page": list_first_page,
+    "list_deep": list_deep,
+    "list_deep_cursor": list_deep_cursor,
+    "date_range": date_range,
+    "stats": stats,
+    "shops": shops,
+    "shopping_list": shopping_list,
+}
+
+
+def run_scenario(
+    client,
+    name: str,
+    ctx: BenchmarkContext,
+    requests: int,
+    warmup: int = 5,
+    seed: int = 42,
+    concurrency: int = 1
+) -> Dict[str, Any]:
+    """
+    Wykonuje scenariusz przez TestClient i zbiera czasy oraz liczbę zapytań do bazy
+    (z nagłówka Server-Timing). Przy concurrency > 1 żądania wysyła tyle wątków naraz -
+    trasy async dzielą jedną pętlę zdarzeń, a synchroniczne pulę wątków aplikacji.
+    """
+    build = SCENARIOS[name]
+    rng = random.Random(f"{name}:{seed}")
+
+    for _ in range(warmup):
+        method, url, body = build(rng, ctx)
+        client.request(method, url, json=body)
+
+    planned = [build(rng, ctx) for _ in range(requests)]
+
+    def send(request: Request) -> Tuple[float, int, Optional[int]]:
+        method, url, body = request
+        request_started = time.perf_counter()
+        response = client.request(method, url, json=body)
+        latency = time.perf_counter() - request_started
+        match = _SERVER_TIMING_CALLS_RE.search(response.headers.get("server-timing", ""))
+        return latency, response.status_code, int(match.group(1)) if match else None
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            responses = list(executor.map(send, planned))
+    else:
+        responses = [send(request) for request in planned]
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "errors": sum(1 for _, status, _ in responses if status >= 400),
+        "seconds": elapsed,
+        "latencies": [latency for latency, _, _ in responses],
+        "db_calls": [calls for _, _, calls in responses if calls is not None]
+    }
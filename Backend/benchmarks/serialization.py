@@ -0,0 +1,84 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from benchmarks.generator import BENCHMARK_DB_PATH, USER_TOKEN_PREFIX, generate
+
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", BENCHMARK_DB_PATH)
+
+try:
+    import brotli
+except ImportError:  # brotli jest opcjonalny - bez niego porównujemy tylko gzip
+    brotli = None
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(users: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Odpowiedź /paragon/date-range/ (pozycje jako wiersze i kolumnowo) dla kilku użytkowników:
+    serializacja orjson vs json ze standardowej biblioteki i kompresja gzip vs brotli
+    (ustawienia jak w GZipMiddleware i BrotliMiddleware)
+    """
+    from services.paragon_service import get_paragons_in_date_range
+    from services.serialization import _default, orjson
+
+    results = {}
+    for columnar in (False, True):
+        payloads = [
+            get_paragons_in_date_range(f"{USER_TOKEN_PREFIX}{user}", "2000-01-01", "2100-01-01", columnar)
+            for user in range(1, users + 1)
+        ]
+        stdlib = [json.dumps(payload, default=_default, ensure_ascii=False).encode() for payload in payloads]
+        result: Dict[str, Any] = {
+            "bytes": sum(len(body) for body in stdlib),
+            "json_ms": round(_best_of(
+                lambda: [json.dumps(payload, default=_default, ensure_ascii=False).encode() for payload in payloads], repeat
+            ) * 1000, 2)
+        }
+        if orjson is not None:
+            result["orjson_ms"] = round(_best_of(
+                lambda: [orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS) for payload in payloads], repeat
+            ) * 1000, 2)
+
+        result["gzip_bytes"] = sum(len(gzip.compress(body, compresslevel=9)) for body in stdlib)
+        result["gzip_ms"] = round(_best_of(lambda: [gzip.compress(body, compresslevel=9) for body in stdlib], repeat) * 1000, 2)
+        if brotli is not None:
+            result["brotli_bytes"] = sum(len(brotli.compress(body, quality=4)) for body in stdlib)
+            result["brotli_ms"] = round(_best_of(lambda: [brotli.compress(body, quality=4) for body in stdlib], repeat) * 1000, 2)
+
+        results["columnar" if columnar else "rows"] = result
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serializacja JSON i kompresja list paragonów")
+    parser.add_argument("--users", type=int, default=20, help="Liczba użytkowników (odpowiedzi)")
+    parser.add_argument("--repeat", type=int, default=5, help="Powtórzenia - liczy się najlepszy czas")
+    args = parser.parse_args()
+
+    db_path = os.environ["SQLITE_PATH"]
+    if not os.path.exists(db_path):
+        print(generate(db_path))
+    for name, result in run(args.users, args.repeat).items():
+        print(name, result)
+    if brotli is None:
+        print("brotli nie jest zainstalowany - pominięto")
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.serialization [--users N]
+    sys.exit(main())
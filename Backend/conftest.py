@@ -0,0 +1,8 @@
+import os
+
+# Testy korzystają z lokalnej bazy SQLite w pamięci zamiast Supabase
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "memory")
+# Testy dodają sklepy na bieżąco - katalog sklepów dociąga je bez czekania
+os.environ.setdefault("SHOP_CATALOG_REFRESH_INTERVAL", "0")
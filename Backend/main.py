@@ -1,15 +1,81 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routers import paragon_router, home_router, stats_router, receipt_router, user_router
+from fastapi.middleware.gzip import GZipMiddleware
+from routers import paragon_router, home_router, stats_router, receipt_router, user_router, prices_router, metrics_router, shops_router, lists_router
+from services.db import supabase_client, close_async_supabase_client
+from services import aggregates, price_index, price_history, metrics, shop_catalog, receipt_images
+from services.job_queue import job_queue
+from services.serialization import FastJSONResponse, COMPRESSION_MIN_SIZE
 
+try:
+    # brotli dla klientów, którzy go akceptują, w pozostałych przypadkach gzip
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
-app = FastAPI()
+
+app = FastAPI(default_response_class=FastJSONResponse)
+
+@app.on_event("startup")
+def startup():
+    if aggregates.STATS_AGGREGATES:
+        aggregates.rebuild_in_background(supabase_client)
+    if price_index.PRICE_INDEX:
+        # indeks i historia cen z jednego skanu pozycji paragonów
+        price_index.rebuild_in_background(supabase_client, [price_history.price_history])
+    shop_catalog.load_in_background(supabase_client)
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    job_queue.stop()
+    receipt_images.shutdown()
+    await close_async_supabase_client()
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    profiler = metrics.maybe_start_profiler()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.current_request.reset(token)
+        if profiler:
+            profiler.stop()
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    route_path = route.path if route else "unmatched"
+    metrics.request_duration.observe((request.method, route_path, response.status_code), elapsed)
+    metrics.request_db_calls.observe((request.method, route_path), stats.db_calls)
+
+    if profiler and elapsed * 1000 >= metrics.PROFILE_SLOW_REQUESTS_MS:
+        print(f"Wolne żądanie {request.method} {route_path}: {elapsed * 1000:.0f} ms\n{profiler.report()}")
+
+    if metrics.SERVER_TIMING:
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_calls} calls", '
+            f"app;dur={elapsed * 1000:.1f}"
+        )
+    return response
 
 app.include_router(home_router.router)
 app.include_router(paragon_router.router)
 app.include_router(stats_router.router)
 app.include_router(receipt_router.router)
 app.include_router(user_router.router)
+app.include_router(prices_router.router)
+app.include_router(shops_router.router)
+app.include_router(lists_router.router)
+app.include_router(metrics_router.router)
+
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
 
 app.add_middleware(
     CORSMiddleware,
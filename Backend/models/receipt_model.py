@@ -12,7 +12,19 @@ class Receipt(BaseModel):
     items: List[ReceiptItem]
     total: float
     userId: str
+    picPath: Optional[str] = None
+
+class ReceiptTextInput(BaseModel):
+    text: str
+    userId: str = ""
+
+class ParsedReceiptResponse(BaseModel):
+    receipt: Receipt
+    items_total: float
+    total_valid: bool
 
 class ReceiptResponse(BaseModel):
     message: str
-    data: Optional[dict] = None
\ No newline at end of file
+    data: Optional[dict] = None
+    job_id: Optional[str] = None
+    duplicate: bool = False
\ No newline at end of file
@@ -0,0 +1,36 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+# Lekkie wiersze odpowiedzi dla list paragonów - bez walidacji pydantic i bez słowników
+# per pozycja. orjson serializuje je bezpośrednio.
+
+ITEM_COLUMNS = ["indeks", "price", "quantity", "product_id", "shop_id"]
+
+
+@dataclass(slots=True)
+class ParagonItemRow:
+    indeks: str
+    price: float
+    quantity: float
+    product_id: Optional[int]
+    shop_id: Optional[int]
+
+
+@dataclass(slots=True)
+class ColumnarItems:
+    """
+    Pozycje paragonu w układzie kolumnowym: nazwy kolumn raz, potem same wartości
+    """
+    columns: List[str]
+    rows: List[List[Any]]
+
+
+@dataclass(slots=True)
+class ParagonRow:
+    id: int
+    create_date: str
+    date: str
+    sum_price: float
+    shop_name: Optional[str]
+    location: Optional[str]
+    receipt_indekses: Any
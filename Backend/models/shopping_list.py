@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class ShoppingListItem(BaseModel):
+    product_id: Optional[int] = None
+    name: Optional[str] = None
+    quantity: float = Field(1.0, gt=0)
+
+class ShoppingListInput(BaseModel):
+    items: List[ShoppingListItem] = Field(..., min_length=1, max_length=500)
+    max_stores: int = Field(2, ge=1, le=5)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from models.shopping_list import ShoppingListInput
+from services.basket_optimizer import optimize, optimizer_error
+
+router = APIRouter(prefix="/lists", tags=["lists"])
+
+@router.post("/optimize")
+def optimize_shopping_list(shopping_list: ShoppingListInput):
+    """
+    Najtańszy sklep dla całej listy zakupów oraz najtańszy podział na najwyżej max_stores
+    sklepów - z łączną kwotą i pokryciem listy (wg ostatnich cen z paragonów)
+    """
+    error = optimizer_error()
+    if error:
+        raise HTTPException(status_code=503, detail=error)
+
+    if any(item.product_id is None and not item.name for item in shopping_list.items):
+        raise HTTPException(status_code=400, detail="Każda pozycja wymaga product_id albo name")
+
+    return optimize([item.model_dump() for item in shopping_list.items], shopping_list.max_stores)
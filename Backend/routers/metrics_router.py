@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.metrics import render_prometheus
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Metryki w formacie Prometheusa: czasy żądań, zapytania do bazy i cache
+    """
+    return render_prometheus()
@@ -1,48 +1,112 @@
-from fastapi import APIRouter, HTTPException, Query
-from services.paragon_service import (
-    get_paragons_for_user, 
-    get_paragons_in_date_range
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from services.async_paragon_service import (
+    get_paragons_for_user_async, 
+    get_paragons_in_date_range_async,
+    get_paragon_changes_async,
+    get_user_id_by_token_async
 )
+from services.export_service import EXPORT_MEDIA_TYPES, export_format_error, export_stream
+from services.response_cache import cached_json_response
 from typing import Optional
 
 router = APIRouter(prefix="/paragon", tags=["paragon"])
 
 
 @router.get("/list")
-def get_user_paragons(
+async def get_user_paragons(
+    request: Request,
     user_id: str = Query(..., description="Firebase UID użytkownika"),
     page: int = Query(1, ge=1, description="Numer strony"),
     page_size: int = Query(10, ge=1, le=100, description="Liczba elementów na stronie"),
-    store_name: Optional[str] = Query(None, description="Filtr po nazwie sklepu")
+    store_name: Optional[str] = Query(None, description="Filtr po nazwie sklepu"),
+    cursor: Optional[str] = Query(None, description="next_cursor z poprzedniej strony (zastępuje page)"),
+    count: str = Query("exact", pattern="^(exact|estimated|cached|none)$", description="Sposób liczenia total_count"),
+    columnar: bool = Query(False, description="Pozycje paragonów w układzie kolumnowym")
 ):
     """
     Pobiera listę paragonów dla konkretnego użytkownika z informacjami o sklepie i indeksach
     """
-    result = get_paragons_for_user(user_id, page, page_size, store_name)
-    
-    if result["success"]:
-        return {
-            "paragons": result["paragons"],
-            "total_count": result["total_count"],
-            "page": result["page"],
-            "page_size": result["page_size"],
-            "total_pages": result["total_pages"]
-        }
-    else:
-        raise HTTPException(status_code=400, detail=result["error"])
+    async def compute():
+        result = await get_paragons_for_user_async(user_id, page, page_size, store_name, cursor, count, columnar)
+        
+        if result["success"]:
+            return {
+                "paragons": result["paragons"],
+                "total_count": result["total_count"],
+                "page": result["page"],
+                "page_size": result["page_size"],
+                "total_pages": result["total_pages"],
+                "next_cursor": result["next_cursor"]
+            }
+        else:
+            raise HTTPException(status_code=400, detail=result["error"])
+
+    return await cached_json_response(request, user_id, compute)
 
 @router.get("/date-range/")
-def get_paragons_by_date_range(
+async def get_paragons_by_date_range(
+    request: Request,
     user_id: str = Query(..., description="Firebase UID użytkownika"),
     start_date: str = Query(..., description="Data początkowa (YYYY-MM-DD)"),
-    end_date: str = Query(..., description="Data końcowa (YYYY-MM-DD)")
+    end_date: str = Query(..., description="Data końcowa (YYYY-MM-DD)"),
+    columnar: bool = Query(False, description="Pozycje paragonów w układzie kolumnowym")
 ):
     """
     Pobiera paragony użytkownika w określonym zakresie dat
     """
-    result = get_paragons_in_date_range(user_id, start_date, end_date)
-    
+    async def compute():
+        result = await get_paragons_in_date_range_async(user_id, start_date, end_date, columnar)
+        
+        if result["success"]:
+            return result["paragons"]
+        else:
+            raise HTTPException(status_code=400, detail=result["error"])
+
+    return await cached_json_response(request, user_id, compute)
+
+@router.get("/sync")
+async def sync_paragons(
+    user_id: str = Query(..., description="Firebase UID użytkownika"),
+    since: Optional[str] = Query(None, description="Znacznik z poprzedniej synchronizacji"),
+    limit: int = Query(200, ge=1, le=1000, description="Maksymalna liczba paragonów w odpowiedzi")
+):
+    """
+    Zwraca tylko paragony dodane lub usunięte od ostatniej synchronizacji.
+    Bez cache odpowiedzi - usunięcia nie zmieniają wersji użytkownika, a znacznik
+    sam wyznacza, co jest nowe.
+    """
+    result = await get_paragon_changes_async(user_id, since, limit)
+
     if result["success"]:
-        return result["paragons"]
+        return {
+            "receipts": result["receipts"],
+            "item_fields": result["item_fields"],
+            "deleted": result["deleted"],
+            "watermark": result["watermark"],
+            "has_more": result["has_more"]
+        }
     else:
-        raise HTTPException(status_code=400, detail=result["error"])
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=result["error"])
+
+@router.get("/export")
+async def export_paragons(
+    user_id: str = Query(..., description="Firebase UID użytkownika"),
+    format: str = Query("csv", pattern="^(csv|parquet|ndjson)$", description="Format eksportu")
+):
+    """
+    Eksportuje całą historię paragonów użytkownika (jedna pozycja na wiersz) jako strumień
+    """
+    error = export_format_error(format)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    user_result = await get_user_id_by_token_async(user_id)
+    if not user_result["success"]:
+        raise HTTPException(status_code=400, detail=f"Błąd użytkownika: {user_result['error']}")
+
+    return StreamingResponse(
+        export_stream(user_result["user_id"], format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="paragony.{format}"'}
+    )
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Query
+from services.db import supabase_client
+from services.price_index import price_index, refresh_if_stale
+from services.price_history import history_error, price_history, to_day
+from typing import Optional
+
+router = APIRouter(prefix="/api/prices", tags=["Prices"])
+
+@router.get("/compare")
+def compare_prices(
+    product_ids: Optional[str] = Query(None, description="ID produktów rozdzielone przecinkami (domyślnie wszystkie)"),
+    top_n: int = Query(10, ge=1, le=100, description="Liczba produktów z największą oszczędnością")
+):
+    """
+    Porównuje ceny produktów między sklepami - najtańszy i najdroższy sklep oraz możliwa oszczędność
+    """
+    ids = None
+    if product_ids:
+        try:
+            ids = [int(product_id) for product_id in product_ids.split(",") if product_id.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="product_ids musi być listą liczb")
+
+    # indeks i historia cen odświeżane razem - jeden skan pozycji paragonów
+    refresh_if_stale(supabase_client, [price_history])
+    return {
+        "ready": price_index.ready,
+        "products": price_index.compare(ids, top_n)
+    }
+
+@router.get("/history")
+def get_price_history(
+    product_id: int = Query(..., description="ID produktu"),
+    shop_id: Optional[int] = Query(None, description="ID sklepu (domyślnie wszystkie sklepy)"),
+    start_date: Optional[str] = Query(None, description="Data początkowa (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Data końcowa (YYYY-MM-DD)"),
+    bucket: str = Query("day", pattern="^(raw|day|week|month)$", description="Agregacja: raw, day, week albo month")
+):
+    """
+    Zmiany ceny produktu w sklepach - min, średnia i maks. w dniach, tygodniach albo miesiącach
+    """
+    for name, value in (("start_date", start_date), ("end_date", end_date)):
+        if value is not None and to_day(value) is None:
+            raise HTTPException(status_code=400, detail=f"{name} musi być datą w formacie YYYY-MM-DD")
+
+    error = history_error(bucket)
+    if error:
+        raise HTTPException(status_code=503, detail=error)
+
+    refresh_if_stale(supabase_client, [price_history])
+    return {
+        "ready": price_history.ready,
+        "product_id": product_id,
+        "bucket": bucket,
+        "shops": price_history.history(product_id, shop_id, start_date, end_date, bucket)
+    }
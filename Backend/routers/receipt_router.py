@@ -1,21 +1,161 @@
-from fastapi import APIRouter, HTTPException
-from models.receipt_model import Receipt, ReceiptResponse
-from services.receipt_service import save_receipt_to_db
+from fastapi import APIRouter, HTTPException, Request, Query, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse
+from models.receipt_model import Receipt, ReceiptResponse, ReceiptTextInput, ParsedReceiptResponse
+from services.receipt_service import save_receipt_to_db, save_receipts_bulk, link_receipt_image
+from services import receipt_images
+from services.json_stream import iter_json_objects
+from services.text_processing import przetworz_tekst_paragonu
+from services.job_queue import job_queue
+from services.receipt_dedup import idempotent
+from typing import Optional
 
 router = APIRouter(prefix="/receipt", tags=["receipt"])
 
 @router.post("/save", response_model=ReceiptResponse)
-def save_receipt(receipt: Receipt):
+def save_receipt(
+    receipt: Receipt,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Zapisuje paragon. Ponowienie z tym samym Idempotency-Key albo ponowny zapis tego samego
+    paragonu zwraca paragon zapisany za pierwszym razem.
+    """
     try:
-        result = save_receipt_to_db(receipt)
+        result = idempotent(receipt.userId, idempotency_key, lambda: save_receipt_to_db(receipt))
         
         if result["success"]:
             return ReceiptResponse(
-                message="Paragon został zapisany pomyślnie", 
-                data=result["data"]
+                message="Paragon był już zapisany" if result.get("duplicate") else "Paragon został zapisany pomyślnie", 
+                data=result["data"],
+                job_id=result.get("job_id"),
+                duplicate=result.get("duplicate", False)
             )
         else:
             raise HTTPException(status_code=400, detail=result["error"])
             
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Błąd serwera: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Błąd serwera: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """
+    Stan zadania uzupełniania paragonu (pending, running, done albo failed)
+    """
+    status = job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Nie znaleziono zadania")
+    return status
+
+@router.post("/image")
+async def upload_receipt_image(
+    request: Request,
+    user_id: str = Query(..., description="Firebase UID"),
+    receipt_id: Optional[int] = Query(None, description="Paragon, do którego przypisać zdjęcie")
+):
+    """
+    Przyjmuje zdjęcie paragonu (surowe ciało żądania, Content-Type: image/*) i zapisuje je pod
+    skrótem treści. Zwrócony pic_path można podać jako picPath przy zapisie paragonu albo
+    od razu przypisać zdjęcie do zapisanego paragonu przez receipt_id.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Oczekiwano zdjęcia (Content-Type: image/*)")
+
+    try:
+        result = await receipt_images.store_image(request.stream(), content_type.split(";")[0].strip())
+    except receipt_images.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if receipt_id is not None:
+        link_result = await run_in_threadpool(link_receipt_image, user_id, receipt_id, result["pic_path"])
+        if not link_result["success"]:
+            raise HTTPException(status_code=404, detail=link_result["error"])
+        result["receipt_id"] = receipt_id
+
+    return result
+
+@router.get("/image/{pic_path}")
+def get_receipt_image(
+    pic_path: str,
+    variant: str = Query("thumbnail", pattern="^(original|processed|thumbnail)$")
+):
+    """
+    Zdjęcie paragonu: oryginał, wersja po przetworzeniu albo miniatura
+    """
+    path = receipt_images.variant_path(pic_path, variant) if receipt_images.is_digest(pic_path) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Nie znaleziono zdjęcia")
+    media_type = {"processed": "image/png", "thumbnail": "image/webp"}.get(variant)
+    if media_type is None:
+        media_type = receipt_images.original_media_type(pic_path) or "application/octet-stream"
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+@router.post("/parse", response_model=ParsedReceiptResponse)
+def parse_receipt(receipt_text: ReceiptTextInput):
+    """
+    Zamienia surowy tekst z OCR na paragon (bez zapisu do bazy)
+    """
+    result = przetworz_tekst_paragonu(receipt_text.text, receipt_text.userId)
+    return ParsedReceiptResponse(
+        receipt=result["receipt"],
+        items_total=result["items_total"],
+        total_valid=result["total_valid"]
+    )
+
+@router.post("/bulk")
+async def save_receipts_bulk_endpoint(
+    request: Request,
+    chunk_size: int = Query(100, ge=1, le=1000, description="Liczba paragonów zapisywanych jednym insertem")
+):
+    """
+    Zapisuje wiele paragonów z jednego żądania (NDJSON albo tablica JSON).
+    Paragony są walidowane w trakcie odczytu strumienia i zapisywane paczkami.
+    Uszkodzony JSON w środku strumienia kończy odczyt: wcześniejsze paczki są już zapisane,
+    więc odpowiedź 207 zawiera ich wyniki i błąd z indeksem, od którego odczyt przerwano.
+    """
+    results = []
+    chunk = []
+    next_index = 0
+    parse_error = None
+
+    try:
+        async for index, obj in _enumerate(iter_json_objects(request.stream())):
+            next_index = index + 1
+            try:
+                chunk.append((index, Receipt(**obj)))
+            except Exception as e:
+                results.append({"index": index, "success": False, "error": f"Niepoprawny paragon: {str(e)}"})
+                continue
+
+            if len(chunk) >= chunk_size:
+                results.extend(await run_in_threadpool(save_receipts_bulk, chunk))
+                chunk = []
+    except ValueError as e:
+        parse_error = {"index": next_index, "success": False, "error": f"Niepoprawny JSON: {str(e)}"}
+
+    if chunk:
+        results.extend(await run_in_threadpool(save_receipts_bulk, chunk))
+    if parse_error is not None:
+        results.append(parse_error)
+
+    results.sort(key=lambda result: result["index"])
+    saved = sum(1 for result in results if result["success"])
+
+    content = {
+        "saved": saved,
+        "failed": len(results) - saved,
+        "complete": parse_error is None,
+        "results": results
+    }
+    if parse_error is not None:
+        return JSONResponse(status_code=207, content=content)
+    return content
+
+async def _enumerate(objects):
+    index = 0
+    async for obj in objects:
+        yield index, obj
+        index += 1
\ No newline at end of file
@@ -1,11 +1,22 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from services.db import supabase_client
+from services.shop_catalog import load_shop_catalog
 
 router = APIRouter(prefix="/shops", tags=["shops"])
 
 @router.get("/list")
 def get_shops():
-    response = supabase_client.from_("shops").select("name").execute()
-    if response.error:
-        return []
-    return response.data
\ No newline at end of file
+    """
+    Nazwy wszystkich sklepów (z katalogu w pamięci)
+    """
+    return load_shop_catalog(supabase_client).names()
+
+@router.get("/search")
+def search_shops(
+    q: str = Query(..., min_length=1, description="Początek nazwy sklepu"),
+    limit: int = Query(10, ge=1, le=50, description="Maksymalna liczba podpowiedzi")
+):
+    """
+    Podpowiedzi sklepów - bez rozróżniania wielkości liter i polskich znaków, z tolerancją literówek
+    """
+    return load_shop_catalog(supabase_client).search(q, limit)
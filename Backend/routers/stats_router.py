@@ -1,20 +1,28 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from services.stats_service import *
+from services.response_cache import cached_json_response
 
 router = APIRouter(prefix="/api/stats", tags=["Stats"])
 
 @router.get("/categories")
-def stats_by_category(user_id: str, start_date: str, end_date: str):
-    return get_expenses_by_category(user_id, start_date, end_date)
+async def stats_by_category(request: Request, user_id: str, start_date: str, end_date: str):
+    return await cached_json_response(request, user_id, lambda: get_stats_async("expenses_by_category", user_id, start_date, end_date))
 
 @router.get("/shops")
-def stats_by_shop(user_id: str, start_date: str, end_date: str):
-    return get_expenses_by_shop(user_id, start_date, end_date)
+async def stats_by_shop(request: Request, user_id: str, start_date: str, end_date: str):
+    return await cached_json_response(request, user_id, lambda: get_stats_async("expenses_by_shop", user_id, start_date, end_date))
 
 @router.get("/months")
-def stats_by_month(user_id: str, start_date: str, end_date: str):
-    return get_expenses_by_month(user_id, start_date, end_date)
+async def stats_by_month(request: Request, user_id: str, start_date: str, end_date: str):
+    return await cached_json_response(request, user_id, lambda: get_stats_async("expenses_by_month", user_id, start_date, end_date))
 
 @router.get("/summary")
-def total_expense_summary(user_id: str, start_date: str, end_date: str):
-    return get_total_expense_summary(user_id, start_date, end_date)
\ No newline at end of file
+async def total_expense_summary(request: Request, user_id: str, start_date: str, end_date: str):
+    return await cached_json_response(request, user_id, lambda: get_stats_async("total_expense_summary", user_id, start_date, end_date))
+
+@router.get("/dashboard")
+async def dashboard_stats(request: Request, user_id: str, start_date: str, end_date: str):
+    """
+    Wszystkie statystyki dashboardu w jednym żądaniu
+    """
+    return await cached_json_response(request, user_id, lambda: get_dashboard_stats_async(user_id, start_date, end_date))
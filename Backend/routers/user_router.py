@@ -2,6 +2,8 @@ import datetime
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from services.db import supabase_client
+from services.cache import user_cache
+from services.response_cache import response_cache_backend
 
 class UserInput(BaseModel):
     token: str
@@ -23,5 +25,7 @@ def add_user(user: UserInput):
         "token": user.token,
         "name": user.name,
     }).execute()
+    user_cache.invalidate(user.token)
+    response_cache_backend.bump_version(response.data[0]["id"])
 
     return {"message": "User created", "user": response.data[0]}
\ No newline at end of file
@@ -0,0 +1,304 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date as date_type
+from typing import Any, Callable, Dict, List, Optional
+
+from services.paragon_service import get_shop_name
+from services.receipt_events import on_receipt_saved
+from services.shop_catalog import shop_catalog
+
+# Statystyki z prekomputowanych agregatów zamiast RPC (agregaty budowane przy starcie)
+STATS_AGGREGATES = os.getenv("STATS_AGGREGATES", "false").lower() == "true"
+
+# Agregaty są w pamięci procesu - paragony zapisane przez inne procesy (workery) trafiają
+# do nich dopiero przy odbudowie, wykonywanej w tle najwyżej co tyle sekund
+STATS_AGGREGATES_MAX_AGE = float(os.getenv("STATS_AGGREGATES_MAX_AGE", "300"))
+
+
+def _new_bucket() -> Dict[str, Any]:
+    return {"total": 0.0, "receipt_count": 0, "categories": {}, "shops": {}}
+
+
+def _add_to(group: Dict[Any, List[float]], key: Any, total: float) -> None:
+    entry = group.get(key)
+    if entry is None:
+        group[key] = [total, 1]
+    else:
+        entry[0] += total
+        entry[1] += 1
+
+
+class AggregateStore:
+    """
+    Dzienne sumy wydatków użytkownika z podziałem na kategorie i sklepy.
+    Zapytanie o zakres dat sumuje tylko dni z tego zakresu zamiast całej historii.
+    Sklepy są kluczowane po ID sklepu, a nazwa jest ustalana przy odczycie.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.built_at = 0.0
+        self._days: Dict[int, List[str]] = {}
+        self._buckets: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._product_categories: Dict[int, Optional[str]] = {}
+        # nazwy sklepów z bazy (odbudowa), a dla nowych sklepów - z paragonu
+        self._shop_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending: List[Dict[str, Any]] = []
+
+    def set_product_category(self, product_id: int, category_name: Optional[str]) -> None:
+        with self._lock:
+            self._product_categories[product_id] = category_name
+
+    def add_receipt(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append(event)
+            self._add_receipt(event)
+
+    def _add_receipt(self, event: Dict[str, Any]) -> None:
+        user_id = event["user_id"]
+        day = event["date"] or date_type.today().isoformat()
+        day = day[:10]
+
+        buckets = self._buckets.setdefault(user_id, {})
+        bucket = buckets.get(day)
+        if bucket is None:
+            bucket = buckets[day] = _new_bucket()
+            insort(self._days.setdefault(user_id, []), day)
+
+        bucket["total"] += event["sum_price"] or 0.0
+        bucket["receipt_count"] += 1
+        shop_id = event.get("shop_id")
+        if shop_id is not None and event.get("shop_name"):
+            self._shop_names.setdefault(shop_id, event["shop_name"])
+        _add_to(bucket["shops"], shop_id, event["sum_price"] or 0.0)
+
+        # Kategoria liczy paragon raz, niezależnie od liczby pozycji w tej kategorii
+        category_totals: Dict[Optional[str], float] = {}
+        for item in event["items"]:
+            category = self._product_categories.get(item.get("product_id"))
+            category_totals[category] = category_totals.get(category, 0.0) + (item["price"] or 0.0)
+        for category, total in category_totals.items():
+            _add_to(bucket["categories"], category, total)
+
+    def _range(self, user_id: int, start_date: str, end_date: str) -> List[tuple]:
+        days = self._days.get(user_id, [])
+        buckets = self._buckets.get(user_id, {})
+        lo = bisect_left(days, start_date[:10])
+        hi = bisect_right(days, end_date[:10])
+        return [(day, buckets[day]) for day in days[lo:hi]]
+
+    def _grouped(
+        self,
+        user_id: int,
+        start_date: str,
+        end_date: str,
+        group: str,
+        label: str,
+        key_label: Callable[[Any], Any] = lambda key: key
+    ) -> List[Dict[str, Any]]:
+        totals: Dict[Any, List[float]] = {}
+        with self._lock:
+            for _, bucket in self._range(user_id, start_date, end_date):
+                for key, (total, count) in bucket[group].items():
+                    entry = totals.setdefault(key_label(key), [0.0, 0])
+                    entry[0] += total
+                    entry[1] += count
+        rows = [
+            {label: key, "total": round(total, 2), "receipt_count": count}
+            for key, (total, count) in totals.items()
+        ]
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+
+    def expenses_by_category(self, user_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        return self._grouped(user_id, start_date, end_date, "categories", "category")
+
+    def expenses_by_shop(self, user_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        # jak RPC expenses_by_shop: grupowanie po aktualnej nazwie sklepu z bazy
+        return self._grouped(user_id, start_date, end_date, "shops", "shop", self.shop_name)
+
+    def shop_name(self, shop_id: Optional[int]) -> Optional[str]:
+        if shop_id is None:
+            return None
+        return shop_catalog.name(shop_id) or self._shop_names.get(shop_id)
+
+    def expenses_by_month(self, user_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        months: Dict[str, List[float]] = {}
+        with self._lock:
+            for day, bucket in self._range(user_id, start_date, end_date):
+                entry = months.setdefault(day[:7], [0.0, 0])
+                entry[0] += bucket["total"]
+                entry[1] += bucket["receipt_count"]
+        return [
+            {"month": month, "total": round(total, 2), "receipt_count": count}
+            for month, (total, count) in sorted(months.items())
+        ]
+
+    def total_expense_summary(self, user_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        total = 0.0
+        count = 0
+        with self._lock:
+            for _, bucket in self._range(user_id, start_date, end_date):
+                total += bucket["total"]
+                count += bucket["receipt_count"]
+        return [{
+            "total": round(total, 2),
+            "receipt_count": count,
+            "average": round(total / count, 2) if count else 0.0
+        }]
+
+    def query(self, function_name: str, user_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        return getattr(self, function_name)(user_id, start_date, end_date)
+
+    def rebuild(self, client, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Odbudowuje agregaty od zera na podstawie receipts i receipt_connect_indekses.
+        Paragony zapisane w trakcie odbudowy są dokładane po jej zakończeniu.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._rebuilding = True
+            self._pending = []
+
+        try:
+            fresh = AggregateStore()
+            fresh._product_categories = _load_product_categories(client, page_size)
+
+            last_id = None
+            receipts = 0
+            while True:
+                query = client.table("receipts")\
+                    .select("""
+                        id,
+                        creator_id,
+                        date,
+                        sum_price,
+                        shops_parcels!left(
+                            shops_id,
+                            shops!inner(name)
+                        ),
+                        receipt_connect_indekses(
+                            receipt_indekses!inner(price, product_id)
+                        )
+                    """)\
+                    .order("id")\
+                    .limit(page_size)
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+                rows = query.execute().data or []
+
+                for row in rows:
+                    fresh._add_receipt({
+                        "user_id": row["creator_id"],
+                        "receipt_id": row["id"],
+                        "date": row["date"],
+                        "shop_id": (row.get("shops_parcels") or {}).get("shops_id"),
+                        "shop_name": get_shop_name(row),
+                        "sum_price": row["sum_price"],
+                        "items": [
+                            idx["receipt_indekses"]
+                            for idx in row.get("receipt_connect_indekses") or []
+                        ]
+                    })
+                receipts += len(rows)
+
+                if rows:
+                    last_id = rows[-1]["id"]
+                if len(rows) < page_size:
+                    break
+
+            with self._lock:
+                for event in self._pending:
+                    if last_id is None or event["receipt_id"] > last_id:
+                        fresh._add_receipt(event)
+                self._days = fresh._days
+                self._buckets = fresh._buckets
+                self._product_categories.update(fresh._product_categories)
+                self._shop_names.update(fresh._shop_names)
+                self.built_at = time.monotonic()
+                self.ready = True
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._pending = []
+
+        return {
+            "receipts": receipts,
+            "users": len(self._buckets),
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+
+def _load_product_categories(client, page_size: int) -> Dict[int, Optional[str]]:
+    categories: Dict[int, Optional[str]] = {}
+    last_id = None
+    while True:
+        query = client.table("product")\
+            .select("id, categories(name)")\
+            .order("id")\
+            .limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        for row in rows:
+            categories[row["id"]] = (row.get("categories") or {}).get("name")
+        if len(rows) < page_size:
+            break
+        last_id = rows[-1]["id"]
+    return categories
+
+
+aggregate_store = AggregateStore()
+
+
+@on_receipt_saved
+def update_aggregates(event: Dict[str, Any]) -> None:
+    # bez STATS_AGGREGATES statystyki idą przez RPC - agregaty tylko zajmowałyby pamięć
+    if not STATS_AGGREGATES:
+        return
+    aggregate_store.add_receipt(event)
+
+
+def rebuild_in_background(client) -> threading.Thread:
+    thread = threading.Thread(target=aggregate_store.rebuild, args=(client,), daemon=True)
+    thread.start()
+    return thread
+
+
+_refresh_lock = threading.Lock()
+_refreshing = False
+
+
+def refresh_if_stale(client) -> bool:
+    """
+    Odbudowa w tle, gdy agregaty są starsze niż STATS_AGGREGATES_MAX_AGE.
+    Do jej końca zapytania dostają dotychczasowe agregaty.
+    """
+    global _refreshing
+    if time.monotonic() - aggregate_store.built_at < STATS_AGGREGATES_MAX_AGE:
+        return False
+    with _refresh_lock:
+        if _refreshing:
+            return False
+        _refreshing = True
+    threading.Thread(target=_refresh, args=(client,), daemon=True).start()
+    return True
+
+
+def _refresh(client) -> None:
+    global _refreshing
+    try:
+        aggregate_store.rebuild(client)
+    finally:
+        _refreshing = False
+
+
+if __name__ == "__main__":
+    # python -m services.aggregates - odbudowa agregatów i podsumowanie
+    from services.db import supabase_client
+    print(aggregate_store.rebuild(supabase_client))
@@ -0,0 +1,125 @@
+from services.db import get_async_supabase_client
+from services.cache import user_cache
+from services.single_flight import user_lookups
+from services.paragon_service import (
+    build_paragon,
+    user_id_query,
+    user_id_result,
+    paragons_page_query,
+    paragons_count_query,
+    paragons_date_range_query,
+    paragons_page_result,
+    cached_paragon_count,
+    cache_paragon_count,
+    decode_watermark,
+    sync_cutoff,
+    paragons_changed_query,
+    tombstones_query,
+    sync_result
+)
+from typing import Dict, Any, Optional
+import asyncio
+
+async def get_user_id_by_token_async(firebase_uid: str) -> Dict[str, Any]:
+    """
+    Asynchroniczna wersja get_user_id_by_token
+    """
+    cached_user_id = user_cache.get(firebase_uid)
+    if cached_user_id is not None:
+        return {"success": True, "user_id": cached_user_id}
+
+    async def fetch():
+        client = await get_async_supabase_client()
+        result = await user_id_query(client, firebase_uid).execute()
+        return user_id_result(firebase_uid, result.data)
+
+    try:
+        return await user_lookups.do_async(firebase_uid, fetch)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+async def get_paragons_for_user_async(
+    firebase_uid: str,
+    page: int = 1,
+    page_size: int = 10,
+    store_name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: str = "exact",
+    columnar: bool = False
+) -> Dict[str, Any]:
+    """
+    Asynchroniczna wersja get_paragons_for_user - strona i licznik pobierane równolegle
+    """
+    try:
+        user_result = await get_user_id_by_token_async(firebase_uid)
+        if not user_result["success"]:
+            return {"success": False, "error": f"Błąd użytkownika: {user_result['error']}"}
+
+        user_id = user_result["user_id"]
+        offset = (page - 1) * page_size
+        client = await get_async_supabase_client()
+
+        page_query = paragons_page_query(client, user_id, offset, page_size, store_name, cursor)
+
+        total_count = cached_paragon_count(user_id, store_name) if count == "cached" else None
+        if total_count is None and count != "none":
+            count_method = "estimated" if count == "estimated" else "exact"
+            result, count_response = await asyncio.gather(
+                page_query.execute(),
+                paragons_count_query(client, user_id, store_name, count_method).execute()
+            )
+            total_count = count_response.count
+            if count == "cached":
+                cache_paragon_count(user_id, store_name, total_count)
+        else:
+            result = await page_query.execute()
+
+        return paragons_page_result(result.data, total_count, None if cursor else page, page_size, columnar)
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+async def get_paragons_in_date_range_async(firebase_uid: str, start_date: str, end_date: str, columnar: bool = False) -> Dict[str, Any]:
+    """
+    Asynchroniczna wersja get_paragons_in_date_range
+    """
+    try:
+        user_result = await get_user_id_by_token_async(firebase_uid)
+        if not user_result["success"]:
+            return {"success": False, "error": f"Błąd użytkownika: {user_result['error']}"}
+
+        user_id = user_result["user_id"]
+        client = await get_async_supabase_client()
+
+        result = await paragons_date_range_query(client, user_id, start_date, end_date).execute()
+        paragons = [build_paragon(item, columnar) for item in result.data] if result.data else []
+
+        return {"success": True, "paragons": paragons}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+async def get_paragon_changes_async(firebase_uid: str, since: Optional[str] = None, limit: int = 200) -> Dict[str, Any]:
+    """
+    Paragony dodane i usunięte od znacznika since (brak znacznika - pełna synchronizacja).
+    Zwraca nowy znacznik; przy has_more klient powinien od razu pobrać kolejną porcję.
+    """
+    try:
+        user_result = await get_user_id_by_token_async(firebase_uid)
+        if not user_result["success"]:
+            return {"success": False, "error": f"Błąd użytkownika: {user_result['error']}"}
+
+        user_id = user_result["user_id"]
+        sync_seq, tombstone_id = decode_watermark(since)
+        cutoff = sync_cutoff()
+        client = await get_async_supabase_client()
+
+        receipts, tombstones = await asyncio.gather(
+            paragons_changed_query(client, user_id, sync_seq, limit, cutoff).execute(),
+            tombstones_query(client, user_id, tombstone_id, limit, cutoff).execute()
+        )
+
+        return sync_result(receipts.data, tombstones.data, sync_seq, tombstone_id, limit)
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # bez numpy /lists/optimize odpowiada 503, reszta API działa
+    np = None
+
+from services.db import supabase_client
+from services.price_history import price_history
+from services.price_index import price_index, refresh_if_stale
+from services.product_index import load_product_index
+
+# Macierz cen jest przebudowywana po zmianie indeksu cen, ale nie częściej niż co tyle sekund
+BASKET_MATRIX_MAX_AGE = float(os.getenv("BASKET_MATRIX_MAX_AGE", "30"))
+
+# Ilu najtańszych (po odrzuceniu zdominowanych) sklepów rozważamy przy podziale zakupów
+BASKET_MAX_CANDIDATES = int(os.getenv("BASKET_MAX_CANDIDATES", "40"))
+
+
+class PriceMatrix:
+    """
+    Ostatnie ceny produkt x sklep w formacie CSR (indptr, indices, data) - w pamięci tylko
+    istniejące obserwacje. Dla listy zakupów wycinamy gęstą podmacierz (produkty x sklepy),
+    w której brak ceny to inf.
+    """
+
+    def __init__(self, snapshot: Dict[str, Any]):
+        self.version = snapshot["version"]
+        self.built_at = time.monotonic()
+        self.product_names: Dict[int, str] = snapshot["product_names"]
+
+        prices = snapshot["prices"]
+        self.shop_ids = np.asarray(sorted({shop_id for shops in prices.values() for shop_id in shops}), dtype=np.int64)
+        column = {int(shop_id): i for i, shop_id in enumerate(self.shop_ids)}
+
+        self._rows: Dict[int, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for row, (product_id, shops) in enumerate(prices.items()):
+            self._rows[product_id] = row
+            indices.extend(column[shop_id] for shop_id in shops)
+            data.extend(shops.values())
+            indptr.append(len(indices))
+
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=np.float64)
+
+    def dense(self, product_ids: Sequence[int]) -> "np.ndarray":
+        """
+        Ceny wybranych produktów we wszystkich sklepach (inf - brak ceny)
+        """
+        result = np.full((len(product_ids), len(self.shop_ids)), np.inf)
+        for i, product_id in enumerate(product_ids):
+            row = self._rows.get(product_id)
+            if row is not None:
+                start, end = self.indptr[row], self.indptr[row + 1]
+                result[i, self.indices[start:end]] = self.data[start:end]
+        return result
+
+
+_matrix: Optional[PriceMatrix] = None
+_matrix_lock = threading.Lock()
+_rebuilding = False
+
+
+def get_price_matrix() -> PriceMatrix:
+    """
+    Aktualna macierz cen. Pierwsze wywołanie buduje ją od razu; później nieaktualna macierz
+    jest przebudowywana w tle, a do tego czasu zapytania dostają poprzednią.
+    """
+    global _matrix, _rebuilding
+    matrix = _matrix
+    if matrix is None:
+        with _matrix_lock:
+            if _matrix is None:
+                _matrix = PriceMatrix(price_index.latest_prices())
+            return _matrix
+
+    if matrix.version != price_index.version and time.monotonic() - matrix.built_at >= BASKET_MATRIX_MAX_AGE:
+        with _matrix_lock:
+            if not _rebuilding:
+                _rebuilding = True
+                threading.Thread(target=_rebuild_matrix, daemon=True).start()
+    return matrix
+
+
+def _rebuild_matrix() -> None:
+    global _matrix, _rebuilding
+    try:
+        _matrix = PriceMatrix(price_index.latest_prices())
+    finally:
+        _rebuilding = False
+
+
+def optimizer_error() -> Optional[str]:
+    """
+    Komunikat błędu, gdy optymalizacja listy zakupów jest niedostępna, albo None
+    """
+    if np is None:
+        return "Optymalizacja listy zakupów wymaga pakietu numpy"
+    return None
+
+
+def resolve_items(items: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Pozycje listy zakupów -> (produkty z product_id, pozycje bez dopasowanego produktu).
+    Nazwy są dopasowywane do produktów tak jak pozycje paragonów.
+    """
+    resolved = []
+    unmatched = []
+    index = None
+    for item in items:
+        product_id = item.get("product_id")
+        if product_id is None and item.get("name"):
+            if index is None:
+                index = load_product_index(supabase_client)
+            match = index.match(item["name"])
+            product_id = match[0] if match else None
+        if product_id is None:
+            unmatched.append(item)
+        else:
+            resolved.append({**item, "product_id": product_id})
+    return resolved, unmatched
+
+
+def undominated(cost: "np.ndarray", order: "np.ndarray", limit: int, chunk: int = 256) -> "np.ndarray":
+    """
+    Pierwsze limit kolumn z order (sklepy od najtańszego), których nie dominuje żaden
+    wcześniejszy sklep - nie droższy dla żadnej pozycji. Sklep dominujący ma sumę nie większą,
+    więc zawsze jest wcześniej na liście i wystarczy porównywać z poprzednikami.
+    Porównujemy blokami po chunk kolumn z zachowanymi sklepami i początkiem bloku:
+    pamięć to pozycje x (limit + chunk) x chunk zamiast pozycje x sklepy x sklepy.
+    """
+    kept: List[int] = []
+    for start in range(0, len(order), chunk):
+        block = order[start:start + chunk]
+        earlier = np.concatenate([np.asarray(kept, dtype=np.int64), block])
+        # not_worse[b, a] - sklep b (wcześniejszy) nie jest droższy od a dla żadnej pozycji
+        not_worse = (cost[:, earlier][:, :, None] <= cost[:, block][:, None, :]).all(axis=0)
+        # w obrębie bloku liczą się tylko sklepy przed a
+        not_worse[len(kept):] &= np.triu(np.ones((len(block), len(block)), dtype=bool), k=1)
+        for column, dominated in zip(block, not_worse.any(axis=0)):
+            if not dominated:
+                kept.append(int(column))
+                if len(kept) >= limit:
+                    return np.asarray(kept, dtype=np.int64)
+    return np.asarray(kept, dtype=np.int64)
+
+
+def best_split(cost: "np.ndarray", max_stores: int, max_candidates: int = BASKET_MAX_CANDIDATES) -> List[int]:
+    """
+    Kolumny (sklepy), które razem dają najmniejszą sumę min(cena) po wierszach, najwyżej
+    max_stores sklepów. Sklepy zdominowane (nigdzie tańsze od innego) są odrzucane,
+    a przeszukiwanie z ograniczeniem odcina gałęzie, które nie mogą poprawić wyniku.
+    """
+    singles = cost.sum(axis=0)
+    candidates = undominated(cost, np.argsort(singles, kind="stable"), max_candidates)
+
+    matrix = cost[:, candidates]
+    # suffix[:, j] - najniższa cena wśród kandydatów j, j+1, ... (dolne ograniczenie)
+    suffix = np.minimum.accumulate(matrix[:, ::-1], axis=1)[:, ::-1]
+
+    best_total = float(singles[candidates[0]])
+    best = [0]
+
+    def search(start: int, current: "np.ndarray", chosen: List[int]) -> None:
+        nonlocal best_total, best
+        if start >= len(candidates) or np.minimum(current, suffix[:, start]).sum() >= best_total:
+            return
+
+        # Ostatni sklep wybieramy od razu dla wszystkich kandydatów - sumy kolumn
+        totals = np.minimum(current[:, None], matrix[:, start:]).sum(axis=0)
+        j = int(totals.argmin())
+        if totals[j] < best_total:
+            best_total = float(totals[j])
+            best = chosen + [start + j]
+
+        if len(chosen) + 2 > max_stores:
+            return
+        for j in range(start, len(candidates) - 1):
+            search(j + 1, np.minimum(current, matrix[:, j]), chosen + [j])
+
+    search(0, np.full(cost.shape[0], np.inf), [])
+    return [int(candidates[j]) for j in best]
+
+
+def optimize(items: Sequence[Dict[str, Any]], max_stores: int = 2) -> Dict[str, Any]:
+    """
+    Najtańszy pojedynczy sklep i najtańszy podział listy zakupów na najwyżej max_stores
+    sklepów (wg ostatnich cen z paragonów). Pierwszeństwo ma pokrycie listy, potem koszt.
+    """
+    refresh_if_stale(supabase_client, [price_history])
+    resolved, unmatched = resolve_items(items)
+    result: Dict[str, Any] = {
+        "ready": price_index.ready,
+        "unmatched": [item.get("name") or item.get("product_id") for item in unmatched],
+        "single_store": None,
+        "split": None,
+        "savings": None
+    }
+
+    matrix = get_price_matrix()
+    if not resolved or not len(matrix.shop_ids):
+        return result
+
+    product_ids = [item["product_id"] for item in resolved]
+    quantities = np.asarray([item.get("quantity") or 1.0 for item in resolved], dtype=np.float64)
+    prices = matrix.dense(product_ids) * quantities[:, None]
+    available = np.isfinite(prices)
+
+    # Brak produktu w sklepie kosztuje więcej niż cała lista - pokrycie jest ważniejsze od ceny
+    finite = np.where(available, prices, 0.0)
+    penalty = finite.max(axis=1).sum() + 1.0
+    cost = np.where(available, prices, penalty)
+
+    coverage = available.sum(axis=0)
+    totals = finite.sum(axis=0)
+    single = int(np.lexsort((totals, -coverage))[0])
+    result["single_store"] = _basket(matrix, resolved, prices, [single], np.full(len(resolved), single))
+
+    shops = best_split(cost, max_stores)
+    assignment = np.asarray(shops)[cost[:, shops].argmin(axis=1)]
+    result["split"] = _basket(matrix, resolved, prices, shops, assignment)
+
+    if result["split"]["covered"] == result["single_store"]["covered"]:
+        result["savings"] = round(result["single_store"]["total"] - result["split"]["total"], 2)
+    return result
+
+
+def _basket(
+    matrix: PriceMatrix,
+    items: List[Dict[str, Any]],
+    prices: "np.ndarray",
+    columns: List[int],
+    assignment: "np.ndarray"
+) -> Dict[str, Any]:
+    shops = {}
+    missing = []
+    for i, (item, column) in enumerate(zip(items, assignment)):
+        price = prices[i, column]
+        if not np.isfinite(price):
+            missing.append(item["product_id"])
+            continue
+        shop_id = int(matrix.shop_ids[column])
+        shop = shops.setdefault(shop_id, {
+            "shop_id": shop_id,
+            "shop_name": price_index.shop_name(shop_id),
+            "total": 0.0,
+            "items": []
+        })
+        shop["total"] += float(price)
+        shop["items"].append({
+            "product_id": item["product_id"],
+            "product_name": matrix.product_names.get(item["product_id"]),
+            "quantity": item.get("quantity") or 1.0,
+            "price": round(float(price), 2)
+        })
+
+    ordered = [shops[int(matrix.shop_ids[column])] for column in columns if int(matrix.shop_ids[column]) in shops]
+    for shop in ordered:
+        shop["total"] = round(shop["total"], 2)
+    covered = len(items) - len(missing)
+    return {
+        "total": round(sum(shop["total"] for shop in ordered), 2),
+        "covered": covered,
+        "coverage": round(covered / len(items), 3),
+        "missing": missing,
+        "shops": ordered
+    }
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Ograniczony cache LRU z czasem życia wpisów. Bezpieczny dla wielu wątków.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Firebase UID -> ID użytkownika
+user_cache = TTLCache("users", maxsize=10_000, ttl=3600)
+
+# (nazwa sklepu, lokalizacja) -> {"shop_parcel_id", "shop_id"}
+shop_cache = TTLCache("shops", maxsize=1_000, ttl=600)
+
+# nazwa produktu -> ID produktu
+product_cache = TTLCache("products", maxsize=50_000, ttl=3600)
+
+# nazwa kategorii -> ID kategorii
+category_cache = TTLCache("categories", maxsize=1_000, ttl=3600)
+
+# ID użytkownika -> {filtr sklepu: liczba paragonów}, unieważniane przy zapisie paragonu
+paragon_count_cache = TTLCache("paragon_counts", maxsize=10_000, ttl=300)
+
+_caches = [user_cache, shop_cache, product_cache, category_cache, paragon_count_cache]
+
+
+def shop_cache_key(shop_name: str, location: Optional[str]) -> tuple:
+    # Sklepy wyszukujemy przez ilike, więc klucz nie zależy od wielkości liter
+    return (shop_name.lower(), location)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Zwraca liczniki trafień i chybień dla wszystkich cache'y
+    """
+    return {cache.name: cache.stats() for cache in _caches}
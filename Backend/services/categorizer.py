@@ -0,0 +1,270 @@
+import csv
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from scipy import sparse
+except ImportError:  # bez scipy iloczyn liczymy w numpy (np.add.reduceat)
+    sparse = None
+
+from services.product_index import normalize_name
+
+# Minimalne podobieństwo kosinusowe do centroidu kategorii - poniżej produkt zostaje bez kategorii
+CATEGORY_MIN_SCORE = float(os.getenv("CATEGORY_MIN_SCORE", "0.2"))
+
+# Minimalna przewaga najlepszej kategorii nad drugą - przy mniejszej model nie jest pewny
+# i produkt zostaje bez kategorii
+CATEGORY_MIN_MARGIN = float(os.getenv("CATEGORY_MIN_MARGIN", "0.03"))
+
+# Kategorie produktów (te same co w aplikacji - stats/store_comparison.dart)
+CATEGORIES = ("Nabiał", "Owoce", "Warzywa", "Słodycze", "Pieczywo", "Napoje", "Mięso", "Ryby", "Przekąski", "Inne")
+
+# Oznaczone nazwy produktów (name,category), na których uczony jest model
+CATEGORY_SEED_PATH = os.getenv(
+    "CATEGORY_SEED_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "product_categories.csv")
+)
+
+N_FEATURES = 2 ** 17
+_NGRAM_SIZES = (2, 3, 4)
+
+
+def _hash(token: str) -> int:
+    # crc32 zamiast hash() - wynik nie zależy od PYTHONHASHSEED
+    return zlib.crc32(token.encode()) % N_FEATURES
+
+
+def features(name: str) -> Dict[int, float]:
+    """
+    Cechy nazwy: haszowane n-gramy znakowe (2-4) i całe słowa, znormalizowane do długości 1
+    """
+    normalized = normalize_name(name)
+    if not normalized:
+        return {}
+
+    counts: Dict[int, float] = {}
+    padded = f" {normalized} "
+    for n in _NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            index = _hash(padded[i:i + n])
+            counts[index] = counts.get(index, 0.0) + 1.0
+    for word in normalized.split():
+        # cyfry (gramatury, ilości) nie mówią nic o kategorii
+        if not word.isdigit():
+            index = _hash(f"w:{word}")
+            counts[index] = counts.get(index, 0.0) + 2.0
+
+    norm = sum(value * value for value in counts.values()) ** 0.5
+    return {index: value / norm for index, value in counts.items()}
+
+
+def vectorize(names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Macierz cech w formacie CSR: (indptr, indices, data)
+    """
+    indptr = np.zeros(len(names) + 1, dtype=np.int64)
+    indices: List[int] = []
+    data: List[float] = []
+    for row, name in enumerate(names):
+        row_features = features(name)
+        indices.extend(row_features.keys())
+        data.extend(row_features.values())
+        indptr[row + 1] = len(indices)
+    return indptr, np.asarray(indices, dtype=np.int64), np.asarray(data, dtype=np.float32)
+
+
+class Categorizer:
+    """
+    Klasyfikator najbliższego centroidu: kategoria, której średni wektor cech
+    jest najbliższy (kosinusowo) wektorowi nazwy produktu
+    """
+
+    def __init__(self, min_score: float = CATEGORY_MIN_SCORE, min_margin: float = CATEGORY_MIN_MARGIN):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.categories: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+
+    def fit(self, names: Sequence[str], labels: Sequence[str]) -> "Categorizer":
+        unknown = set(labels) - set(CATEGORIES)
+        if unknown:
+            raise ValueError(f"Nieznane kategorie: {', '.join(sorted(unknown))}")
+        self.categories = sorted(set(labels))
+        label_index = {category: i for i, category in enumerate(self.categories)}
+
+        indptr, indices, data = vectorize(names)
+        rows = np.repeat(
+            np.asarray([label_index[label] for label in labels], dtype=np.int64),
+            np.diff(indptr)
+        )
+        centroids = np.zeros((len(self.categories), N_FEATURES), dtype=np.float32)
+        np.add.at(centroids, (rows, indices), data)
+
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._centroids = centroids / norms
+        return self
+
+    def scores(self, names: Sequence[str]) -> np.ndarray:
+        """
+        Podobieństwo każdej nazwy do każdej kategorii - macierz (nazwy x kategorie)
+        """
+        indptr, indices, data = vectorize(names)
+        if sparse is not None:
+            matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(names), N_FEATURES))
+            return np.asarray(matrix @ self._centroids.T)
+
+        # Bez scipy: wartości centroidów dla niezerowych cech, zsumowane w obrębie wierszy.
+        # Dodatkowa zerowa kolumna pozwala użyć reduceat także dla pustych wierszy na końcu.
+        weighted = np.zeros((len(self.categories), len(indices) + 1), dtype=np.float32)
+        weighted[:, :-1] = self._centroids[:, indices] * data
+        result = np.add.reduceat(weighted, indptr[:-1], axis=1).T
+        result[np.diff(indptr) == 0] = 0.0
+        return result
+
+    def predict(self, names: Sequence[str]) -> List[Optional[str]]:
+        """
+        Kategorie dla wielu nazw jednym przebiegiem; None, gdy żadna kategoria nie pasuje
+        albo dwie najlepsze są zbyt blisko siebie
+        """
+        if not names or self._centroids is None:
+            return [None] * len(names)
+        scores = self.scores(names)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(names)), best]
+        if scores.shape[1] > 1:
+            margins = best_scores - np.partition(scores, -2, axis=1)[:, -2]
+        else:
+            margins = best_scores
+        return [
+            self.categories[category] if score >= self.min_score and margin >= self.min_margin else None
+            for category, score, margin in zip(best, best_scores, margins)
+        ]
+
+
+def load_seed(path: str = CATEGORY_SEED_PATH) -> Tuple[List[str], List[str]]:
+    """
+    Nazwy i kategorie z pliku CSV. ValueError dla kategorii spoza CATEGORIES - zwykle
+    to niezacytowana nazwa z przecinkiem ("MLEKO 3,2%" daje kategorię "2%").
+    """
+    with open(path, encoding="utf-8") as seed_file:
+        rows = list(csv.DictReader(seed_file))
+    for line, row in enumerate(rows, start=2):
+        if row["category"] not in CATEGORIES or None in row:
+            raise ValueError(f"{path}:{line}: niepoprawna kategoria {row['category']!r} dla {row['name']!r}")
+    return [row["name"] for row in rows], [row["category"] for row in rows]
+
+
+categorizer: Optional[Categorizer] = None
+_load_lock = threading.Lock()
+
+
+def load_categorizer() -> Categorizer:
+    """
+    Uczy model na danych z CATEGORY_SEED_PATH przy pierwszym użyciu
+    """
+    global categorizer
+    if categorizer is not None:
+        return categorizer
+
+    with _load_lock:
+        if categorizer is None:
+            names, labels = load_seed()
+            categorizer = Categorizer().fit(names, labels)
+
+    return categorizer
+
+
+def categorize(names: Sequence[str]) -> List[Optional[str]]:
+    return load_categorizer().predict(names)
+
+
+def evaluate(holdout: int = 5) -> Dict[str, float]:
+    """
+    Trafność na danych startowych (co holdout-ta nazwa odłożona do testu) bez progów,
+    a z progami CATEGORY_MIN_SCORE/CATEGORY_MIN_MARGIN - odsetek przypisanych kategorii
+    i trafność wśród przypisanych; do tego przepustowość
+    """
+    names, labels = load_seed()
+    train = [i for i in range(len(names)) if i % holdout]
+    test = [i for i in range(len(names)) if not i % holdout]
+    train_names, train_labels = [names[i] for i in train], [labels[i] for i in train]
+    test_names = [names[i] for i in test]
+
+    model = Categorizer(min_score=0.0, min_margin=0.0).fit(train_names, train_labels)
+    predicted = model.predict(test_names)
+    correct = sum(1 for i, category in zip(test, predicted) if labels[i] == category)
+
+    gated = Categorizer().fit(train_names, train_labels).predict(test_names)
+    assigned = [(i, category) for i, category in zip(test, gated) if category is not None]
+    assigned_correct = sum(1 for i, category in assigned if labels[i] == category)
+
+    batch = names * max(1, 10_000 // len(names))
+    started = time.perf_counter()
+    model.predict(batch)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "accuracy": round(correct / len(test), 3),
+        "coverage": round(len(assigned) / len(test), 3),
+        "precision": round(assigned_correct / len(assigned), 3) if assigned else None,
+        "test_size": len(test),
+        "names_per_second": round(len(batch) / elapsed)
+    }
+
+
+def backfill(client, page_size: int = 1000) -> Dict[str, int]:
+    """
+    Przypisuje kategorie istniejącym produktom bez kategorii (stronicowanie po id)
+    """
+    from services.paragon_service import get_category_ids, remember_product_category
+
+    model = load_categorizer()
+    last_id = 0
+    scanned = 0
+    updated = 0
+    while True:
+        rows = client.table("product")\
+            .select("id, name")\
+            .is_("categorie_id", "null")\
+            .gt("id", last_id)\
+            .order("id")\
+            .limit(page_size)\
+            .execute().data or []
+
+        predicted = model.predict([row["name"] for row in rows])
+        category_ids = get_category_ids([category for category in predicted if category])
+        updates = [
+            {"id": row["id"], "name": row["name"], "categorie_id": category_ids[category]}
+            for row, category in zip(rows, predicted)
+            if category in category_ids
+        ]
+        if updates:
+            client.table("product").upsert(updates).execute()
+            for row, category in zip(rows, predicted):
+                if category in category_ids:
+                    remember_product_category(row["id"], category)
+
+        scanned += len(rows)
+        updated += len(updates)
+        if len(rows) < page_size:
+            break
+        last_id = rows[-1]["id"]
+
+    return {"scanned": scanned, "updated": updated}
+
+
+if __name__ == "__main__":
+    # python -m services.categorizer [--evaluate]
+    import sys
+
+    if "--evaluate" in sys.argv:
+        print(evaluate())
+    else:
+        from services.db import supabase_client
+        print(backfill(supabase_client))
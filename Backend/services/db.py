@@ -1,10 +1,58 @@
-from supabase import create_client, Client
+import asyncio
 import os
+from typing import Any, Optional
 from dotenv import load_dotenv
+from services.metrics import InstrumentedClient
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase_client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# supabase (domyślnie) albo sqlite - lokalna baza do benchmarków i profilowania (services/sqlite_backend.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "scannsave.db")
+
+# Zapis paragonu jednym wywołaniem RPC save_receipt (patrz sql/save_receipt.sql)
+USE_SAVE_RECEIPT_RPC = os.getenv("USE_SAVE_RECEIPT_RPC", "false").lower() == "true"
+
+def _create_client() -> Any:
+    if DB_BACKEND == "sqlite":
+        from services.sqlite_backend import SQLiteClient
+        return SQLiteClient(SQLITE_PATH)
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+async def _create_async_client() -> Any:
+    if DB_BACKEND == "sqlite":
+        return supabase_client.async_client()
+    from supabase import acreate_client
+    return await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Klienci są opakowani w InstrumentedClient - każde zapytanie trafia do /metrics
+supabase_client = InstrumentedClient(_create_client())
+
+# Jeden współdzielony klient asynchroniczny - trzyma pulę połączeń keep-alive (httpx)
+_async_supabase_client: Optional[Any] = None
+_async_client_lock = asyncio.Lock()
+
+async def get_async_supabase_client() -> Any:
+    """
+    Zwraca współdzielonego asynchronicznego klienta Supabase, tworząc go przy pierwszym użyciu
+    """
+    global _async_supabase_client
+    if _async_supabase_client is None:
+        async with _async_client_lock:
+            if _async_supabase_client is None:
+                _async_supabase_client = InstrumentedClient(await _create_async_client())
+    return _async_supabase_client
+
+async def close_async_supabase_client() -> None:
+    """
+    Zamyka pulę połączeń klienta asynchronicznego (przy wyłączaniu aplikacji)
+    """
+    global _async_supabase_client
+    if _async_supabase_client is not None:
+        if DB_BACKEND != "sqlite":
+            await _async_supabase_client.postgrest.aclose()
+        _async_supabase_client = None
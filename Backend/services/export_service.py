@@ -0,0 +1,166 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from services.db import get_async_supabase_client
+from services.paragon_service import PARAGON_SELECT, get_shop_name
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow jest potrzebny tylko do eksportu Parquet
+    pa = None
+    pq = None
+
+EXPORT_PAGE_SIZE = 500
+
+# Jeden wiersz eksportu = jedna pozycja paragonu (paragon bez pozycji daje wiersz z pustymi polami)
+EXPORT_COLUMNS = [
+    "receipt_id", "date", "create_date", "shop_name", "location", "sum_price",
+    "indeks", "price", "quantity", "product_id"
+]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+
+def paragons_export_query(client, user_id: int, last_id: int, page_size: int):
+    """
+    Kolejna strona paragonów do eksportu - keyset po id, bez offsetu
+    """
+    return client.table("receipts")\
+        .select(PARAGON_SELECT)\
+        .eq("creator_id", user_id)\
+        .gt("id", last_id)\
+        .order("id")\
+        .limit(page_size)
+
+
+def export_rows(item: Dict[str, Any]) -> List[list]:
+    receipt = [
+        item["id"],
+        item["date"],
+        item["create_date"],
+        get_shop_name(item),
+        item["shops_parcels"]["location"] if item["shops_parcels"] else None,
+        item["sum_price"]
+    ]
+    connects = item.get("receipt_connect_indekses") or []
+    if not connects:
+        return [receipt + [None, None, None, None]]
+    return [
+        receipt + [
+            idx["receipt_indekses"]["indeks"],
+            idx["receipt_indekses"]["price"],
+            idx["quantity"],
+            idx["receipt_indekses"]["product_id"]
+        ]
+        for idx in connects
+    ]
+
+
+async def iter_export_pages(user_id: int, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[list]]:
+    """
+    Kolejne strony wierszy eksportu. W pamięci jest tylko jedna strona paragonów naraz.
+    """
+    client = await get_async_supabase_client()
+    last_id = 0
+    while True:
+        result = await paragons_export_query(client, user_id, last_id, page_size).execute()
+        data = result.data or []
+
+        rows: List[list] = []
+        for item in data:
+            rows.extend(export_rows(item))
+        if rows:
+            yield rows
+
+        if len(data) < page_size:
+            break
+        last_id = data[-1]["id"]
+
+
+async def export_csv(pages: AsyncIterator[List[list]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # sam nagłówek, gdy użytkownik nie ma paragonów
+        yield buffer.getvalue().encode()
+
+
+async def export_ndjson(pages: AsyncIterator[List[list]]) -> AsyncIterator[bytes]:
+    async for rows in pages:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+
+
+async def export_parquet(pages: AsyncIterator[List[list]]) -> AsyncIterator[bytes]:
+    """
+    Każda strona to osobna grupa wierszy; zapisane bajty wysyłamy od razu i czyścimy bufor
+    """
+    schema = pa.schema([
+        ("receipt_id", pa.int64()),
+        ("date", pa.string()),
+        ("create_date", pa.string()),
+        ("shop_name", pa.string()),
+        ("location", pa.string()),
+        ("sum_price", pa.float64()),
+        ("indeks", pa.string()),
+        ("price", pa.float64()),
+        ("quantity", pa.float64()),
+        ("product_id", pa.int64())
+    ])
+    sink = io.BytesIO()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for rows in pages:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield _drain(sink)
+    finally:
+        writer.close()
+    yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+_EXPORTERS = {
+    "csv": export_csv,
+    "ndjson": export_ndjson,
+    "parquet": export_parquet
+}
+
+
+def export_stream(user_id: int, export_format: str) -> AsyncIterator[bytes]:
+    return _EXPORTERS[export_format](iter_export_pages(user_id))
+
+
+def export_format_error(export_format: str) -> Optional[str]:
+    """
+    Komunikat błędu dla nieobsługiwanego formatu albo None
+    """
+    if export_format not in _EXPORTERS:
+        return f"Nieobsługiwany format eksportu: {export_format}"
+    if export_format == "parquet" and pa is None:
+        return "Eksport do Parquet wymaga pakietu pyarrow"
+    return None
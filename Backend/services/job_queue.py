@@ -0,0 +1,266 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from services.cache import TTLCache
+
+# Liczba wątków roboczych i maksymalna liczba zadań przetwarzanych jedną paczką
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "50"))
+
+# Nieudane zadanie jest ponawiane do JOB_MAX_ATTEMPTS razy, z rosnącym opóźnieniem
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "2"))
+
+# Ścieżka do pliku SQLite - zadania przetrwają restart procesu. Puste = tylko w pamięci:
+# zadania czekające w kolejce (np. pozycje paragonów przy RECEIPT_SAVE_MODE=queue) giną
+# przy restarcie, a paragon zostaje bez pozycji. Na produkcji z trybem queue ustawić.
+JOB_QUEUE_SQLITE_PATH = os.getenv("JOB_QUEUE_SQLITE_PATH", "")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Handler dostaje listę payloadów jednego rodzaju i zwraca listę wyników w tej samej kolejności.
+# Wyjątek oznacza nieudaną całą paczkę - każde z jej zadań zostanie ponowione.
+JobHandler = Callable[[List[Dict[str, Any]]], List[Any]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """
+    Rejestruje handler dla zadań danego rodzaju (dekorator)
+    """
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+    return register
+
+
+def _new_job(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "payload": payload,
+        "status": PENDING,
+        "attempts": 0,
+        "error": None,
+        "result": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+class MemoryJobStore:
+    """
+    Statusy zadań w pamięci procesu - zakończone zadania wygasają po godzinie.
+    Nic nie przetrwa restartu: zadania jeszcze niewykonane przepadają (unfinished jest puste).
+    """
+
+    def __init__(self):
+        self._jobs = TTLCache("jobs", maxsize=100_000, ttl=3600)
+
+    def save(self, job: Dict[str, Any]) -> None:
+        self._jobs.set(job["id"], job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        return []
+
+
+class SQLiteJobStore:
+    """
+    Zadania w pliku SQLite. Po restarcie niedokończone zadania wracają do kolejki.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def save(self, job: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["id"], job["kind"], json.dumps(job["payload"], default=str), job["status"],
+                    job["attempts"], job["error"], json.dumps(job["result"], default=str),
+                    job["created_at"], job["updated_at"]
+                )
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (PENDING, RUNNING)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    @staticmethod
+    def _job(row: tuple) -> Dict[str, Any]:
+        job_id, kind, payload, status, attempts, error, result, created_at, updated_at = row
+        return {
+            "id": job_id,
+            "kind": kind,
+            "payload": json.loads(payload),
+            "status": status,
+            "attempts": attempts,
+            "error": error,
+            "result": json.loads(result) if result else None,
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+
+
+class JobQueue:
+    """
+    Kolejka zadań przetwarzanych w tle przez pulę wątków. Wątek bierze z kolejki paczkę
+    zadań jednego rodzaju i przekazuje ją do handlera jednym wywołaniem.
+    """
+
+    def __init__(self, store, workers: int = JOB_WORKERS, batch_size: int = JOB_BATCH_SIZE):
+        self.store = store
+        self.workers = workers
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        # zadania niedokończone przed restartem (tylko w trybie SQLite)
+        queued = {job["id"] for job in list(self._queue.queue) if job is not None}
+        for job in self.store.unfinished():
+            if job["id"] not in queued:
+                job["status"] = PENDING
+                self._queue.put(job)
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind not in _handlers:
+            raise ValueError(f"Brak handlera dla zadań typu {kind}")
+        job = _new_job(kind, payload)
+        self.store.save(job)
+        self._queue.put(job)
+        return job["id"]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key != "payload"}
+
+    def _take_batch(self) -> Optional[List[Dict[str, Any]]]:
+        job = self._queue.get()
+        if job is None:
+            return None
+        batch = [job]
+        while len(batch) < self.batch_size:
+            try:
+                other = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if other is None or other["kind"] != job["kind"]:
+                # inny rodzaj (albo sygnał stopu) wraca na koniec kolejki
+                self._queue.put(other)
+                break
+            batch.append(other)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._process(batch)
+
+    def _process(self, batch: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        for job in batch:
+            job["status"] = RUNNING
+            job["attempts"] += 1
+            job["updated_at"] = now
+            self.store.save(job)
+
+        try:
+            results = _handlers[batch[0]["kind"]]([job["payload"] for job in batch])
+            # zip po krótszej liście zostawiłby resztę zadań na zawsze w stanie RUNNING
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise Exception(f"Handler {batch[0]['kind']} nie zwrócił wyniku dla każdego z {len(batch)} zadań")
+        except Exception as e:
+            for job in batch:
+                self._fail(job, str(e))
+            return
+
+        now = time.time()
+        for job, result in zip(batch, results):
+            job["status"] = DONE
+            job["result"] = result
+            job["error"] = None
+            job["updated_at"] = now
+            self.store.save(job)
+
+    def _fail(self, job: Dict[str, Any], error: str) -> None:
+        job["error"] = error
+        job["updated_at"] = time.time()
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            job["status"] = FAILED
+            self.store.save(job)
+            print(f"Zadanie {job['kind']} {job['id']} nieudane: {error}")
+            return
+
+        job["status"] = PENDING
+        self.store.save(job)
+        delay = JOB_RETRY_DELAY * 2 ** (job["attempts"] - 1)
+        timer = threading.Timer(delay, self._queue.put, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+
+def _create_store():
+    if JOB_QUEUE_SQLITE_PATH:
+        return SQLiteJobStore(JOB_QUEUE_SQLITE_PATH)
+    return MemoryJobStore()
+
+
+job_queue = JobQueue(_create_store())
@@ -0,0 +1,45 @@
+import codecs
+import json
+from typing import Any, AsyncIterator
+
+_decoder = json.JSONDecoder()
+
+# Znaki oddzielające obiekty w NDJSON i w tablicy JSON
+_SEPARATORY = " \t\r\n,[]"
+
+# Limit rozmiaru pojedynczego obiektu - chroni przed buforowaniem uszkodzonego strumienia
+MAX_OBJECT_SIZE = 1024 * 1024
+
+
+async def iter_json_objects(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Odczytuje kolejne obiekty JSON ze strumienia bajtów - NDJSON albo tablicę JSON.
+    W pamięci trzymany jest tylko bieżący, jeszcze niekompletny obiekt.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+
+    async for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        while True:
+            start = 0
+            while start < len(buffer) and buffer[start] in _SEPARATORY:
+                start += 1
+            buffer = buffer[start:]
+            if not buffer:
+                break
+            try:
+                obj, end = _decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Obiekt jeszcze niekompletny - czekamy na kolejny fragment
+                if len(buffer) > MAX_OBJECT_SIZE:
+                    raise ValueError("Obiekt JSON przekracza dopuszczalny rozmiar")
+                break
+            buffer = buffer[end:]
+            yield obj
+
+    buffer = (buffer + utf8.decode(b"", final=True)).strip(_SEPARATORY)
+    if buffer:
+        # Resztka po zakończeniu strumienia - zgłaszamy błąd parsowania
+        obj, _ = _decoder.raw_decode(buffer)
+        yield obj
@@ -0,0 +1,253 @@
+import contextvars
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.cache import cache_stats
+
+# Nagłówek Server-Timing z czasem bazy i liczbą zapytań w każdej odpowiedzi
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# Profiler próbkujący dla wolnych żądań: próg w ms i odsetek profilowanych żądań
+PROFILE_SLOW_REQUESTS_MS = float(os.getenv("PROFILE_SLOW_REQUESTS_MS", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Histogram w formacie Prometheusa z etykietami
+    """
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._series: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # liczniki kubełków, suma, liczba obserwacji
+                series = self._series[labels] = [0] * len(_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(_BUCKETS):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = _labels(self.label_names, labels)
+                for bound, count in zip(_BUCKETS, series):
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+                lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, value: float = 1) -> None:
+        with self._lock:
+            self._values[labels] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Czas obsługi żądania", ("method", "route", "status")
+)
+request_db_calls = Histogram(
+    "http_request_db_calls", "Liczba zapytań do bazy na żądanie", ("method", "route")
+)
+db_call_duration = Histogram(
+    "db_call_duration_seconds", "Czas zapytania do Supabase", ("target",)
+)
+db_call_errors = CounterMetric(
+    "db_call_errors_total", "Zapytania do Supabase zakończone wyjątkiem", ("target",)
+)
+single_flight_calls = CounterMetric(
+    "single_flight_calls_total", "Wywołania wykonane (leader) i dołączone do trwających (coalesced)", ("group", "role")
+)
+
+
+class RequestStats:
+    __slots__ = ("db_calls", "db_seconds")
+
+    def __init__(self):
+        self.db_calls = 0
+        self.db_seconds = 0.0
+
+
+# Statystyki bieżącego żądania (ustawiane przez middleware w main.py)
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def _record_db_call(target: str, seconds: float) -> None:
+    db_call_duration.observe((target,), seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_calls += 1
+        stats.db_seconds += seconds
+
+
+class _InstrumentedQuery:
+    """
+    Opakowanie buildera zapytań PostgREST - mierzy czas każdego execute()
+    """
+
+    def __init__(self, builder: Any, target: str):
+        self._builder = builder
+        self._target = target
+
+    def execute(self):
+        started = time.perf_counter()
+        try:
+            result = self._builder.execute()
+        except Exception:
+            db_call_errors.inc((self._target,))
+            raise
+
+        if inspect.isawaitable(result):
+            return self._await(result, started)
+
+        _record_db_call(self._target, time.perf_counter() - started)
+        return result
+
+    async def _await(self, pending, started: float):
+        try:
+            return await pending
+        except Exception:
+            db_call_errors.inc((self._target,))
+            raise
+        finally:
+            _record_db_call(self._target, time.perf_counter() - started)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # np. właściwość not_ zwraca builder
+            return _InstrumentedQuery(attr, self._target) if hasattr(attr, "execute") else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _InstrumentedQuery(result, self._target)
+            return result
+
+        return call
+
+
+class InstrumentedClient:
+    """
+    Klient Supabase liczący zapytania i czas per tabela / funkcja RPC
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    def table(self, table_name: str) -> _InstrumentedQuery:
+        return _InstrumentedQuery(self._client.table(table_name), table_name)
+
+    def from_(self, table_name: str) -> _InstrumentedQuery:
+        return _InstrumentedQuery(self._client.from_(table_name), table_name)
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None, *args, **kwargs) -> _InstrumentedQuery:
+        return _InstrumentedQuery(self._client.rpc(fn, params or {}, *args, **kwargs), f"rpc:{fn}")
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+class SamplingProfiler:
+    """
+    Prosty profiler próbkujący: co interval sekund zapisuje stosy wszystkich wątków
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = traceback.extract_stack(frame, limit=12)
+                self.samples[" <- ".join(
+                    f"{os.path.basename(entry.filename)}:{entry.lineno}:{entry.name}"
+                    for entry in reversed(stack)
+                )] += 1
+
+    def report(self, top: int = 10) -> str:
+        return "\n".join(f"{count:5d}  {stack}" for stack, count in self.samples.most_common(top))
+
+
+def maybe_start_profiler() -> Optional[SamplingProfiler]:
+    if PROFILE_SLOW_REQUESTS_MS <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    return SamplingProfiler().start()
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in (request_duration, request_db_calls, db_call_duration, db_call_errors, single_flight_calls):
+        lines.extend(metric.render())
+
+    lines.append("# HELP cache_hits_total Trafienia cache")
+    lines.append("# TYPE cache_hits_total counter")
+    caches = cache_stats()
+    for name, stats in caches.items():
+        lines.append(f'cache_hits_total{{cache="{name}"}} {stats["hits"]}')
+    lines.append("# HELP cache_misses_total Chybienia cache")
+    lines.append("# TYPE cache_misses_total counter")
+    for name, stats in caches.items():
+        lines.append(f'cache_misses_total{{cache="{name}"}} {stats["misses"]}')
+    lines.append("# HELP cache_size Liczba wpisów w cache")
+    lines.append("# TYPE cache_size gauge")
+    for name, stats in caches.items():
+        lines.append(f'cache_size{{cache="{name}"}} {stats["size"]}')
+
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,26 @@
-from services.db import supabase_client
+from services.db import supabase_client, USE_SAVE_RECEIPT_RPC
+from services.cache import user_cache, shop_cache, product_cache, category_cache, paragon_count_cache, shop_cache_key
+from services.product_index import load_product_index
+from services.shop_catalog import shop_catalog, load_shop_catalog
+from services.receipt_events import on_receipt_saved, publish_receipt_saved, receipt_saved_event
+from services.single_flight import user_lookups
 from models.paragon import ParagonInput
-from typing import Dict, Any, Optional
+from models.rows import ParagonRow, ParagonItemRow, ColumnarItems, ITEM_COLUMNS
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime, timedelta, timezone
+import base64
+import os
+import re
+
+try:
+    from services.categorizer import categorize
+except ImportError:  # bez numpy nowe produkty zapisujemy bez kategorii
+    categorize = None
+
+_CURSOR_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}:\d{2}(\.\d+)?)?")
+
+# Ile sekund zmiana musi odczekać, zanim trafi do /paragon/sync (patrz sync_cutoff)
+SYNC_SAFETY_LAG = float(os.getenv("SYNC_SAFETY_LAG", "5"))
 
 def get_shop_name(item: Dict[str, Any]) -> str:
     try:
@@ -8,20 +28,35 @@ def get_shop_name(item: Dict[str, Any]) -> str:
     except (TypeError, KeyError):
         return None
     
+def user_id_query(client, firebase_uid: str):
+    """
+    Zapytanie o ID użytkownika. Przyjmuje klienta synchronicznego lub asynchronicznego.
+    """
+    return client.table("users")\
+        .select("id")\
+        .eq("token", firebase_uid)
+
+def user_id_result(firebase_uid: str, data: list) -> Dict[str, Any]:
+    if data and len(data) > 0:
+        user_cache.set(firebase_uid, data[0]["id"])
+        return {"success": True, "user_id": data[0]["id"]}
+    else:
+        return {"success": False, "error": "Użytkownik nie został znaleziony"}
+
 def get_user_id_by_token(firebase_uid: str) -> Dict[str, Any]:
     """
     Pobiera ID użytkownika na podstawie Firebase UID (token)
     """
+    cached_user_id = user_cache.get(firebase_uid)
+    if cached_user_id is not None:
+        return {"success": True, "user_id": cached_user_id}
+
     try:
-        result = supabase_client.table("users")\
-            .select("id")\
-            .eq("token", firebase_uid)\
-            .execute()
-        
-        if result.data and len(result.data) > 0:
-            return {"success": True, "user_id": result.data[0]["id"]}
-        else:
-            return {"success": False, "error": "Użytkownik nie został znaleziony"}
+        # Równoczesne żądania tego samego użytkownika czekają na jedno zapytanie
+        return user_lookups.do(
+            firebase_uid,
+            lambda: user_id_result(firebase_uid, user_id_query(supabase_client, firebase_uid).execute().data)
+        )
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -29,38 +64,34 @@ def get_existing_shop_parcel(shop_name: str, location: str = None) -> Dict[str,
     """
     Pobiera istniejący shop_parcel na podstawie nazwy sklepu
     """
+    cache_key = shop_cache_key(shop_name, location)
+    cached_shop = shop_cache.get(cache_key)
+    if cached_shop is not None:
+        return {"success": True, **cached_shop}
+
     try:
-        # Sprawdzamy czy sklep istnieje w tabeli shops (case-insensitive)
-        shop_result = supabase_client.table("shops")\
-            .select("id, name")\
-            .ilike("name", shop_name)\
-            .execute()
+        # Sklepy i lokalizacje są w katalogu w pamięci; nieznaną nazwę sprawdzamy
+        # jeszcze raz po dociągnięciu nowych sklepów z bazy
+        catalog = load_shop_catalog(supabase_client)
+        shop = catalog.resolve(shop_name, location)
+        if (shop is None or shop["shop_parcel_id"] is None) and catalog.refresh_if_stale(supabase_client):
+            shop = catalog.resolve(shop_name, location)
         
-        if not shop_result.data:
+        if shop is None:
             return {
                 "success": False, 
                 "error": f"Sklep o nazwie '{shop_name}' nie istnieje w bazie danych"
             }
         
-        shop_id = shop_result.data[0]["id"]
-        
-        # Sprawdzamy czy istnieje shop_parcel dla tego sklepu
-        parcel_query = supabase_client.table("shops_parcels")\
-            .select("id")\
-            .eq("shops_id", shop_id)
-        
-        if location:
-            parcel_query = parcel_query.eq("location", location)
-        
-        parcel_result = parcel_query.execute()
-        
-        if not parcel_result.data:
+        if shop["shop_parcel_id"] is None:
             return {
                 "success": False, 
                 "error": f"Nie znaleziono lokalizacji dla sklepu '{shop_name}'"
             }
         
-        parcel_id = parcel_result.data[0]["id"]
+        parcel_id = shop["shop_parcel_id"]
+        shop_id = shop["shop_id"]
+        shop_cache.set(cache_key, {"shop_parcel_id": parcel_id, "shop_id": shop_id})
         
         return {"success": True, "shop_parcel_id": parcel_id, "shop_id": shop_id}
         
@@ -68,10 +99,66 @@ def get_existing_shop_parcel(shop_name: str, location: str = None) -> Dict[str,
         return {"success": False, "error": str(e)}
 
 
+def categorize_products(product_names: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Kategorie dla nazw produktów jednym przebiegiem klasyfikatora. Błąd klasyfikatora
+    nie blokuje zapisu - produkty zostają wtedy bez kategorii.
+    """
+    if categorize is None or not product_names:
+        return {}
+    try:
+        return dict(zip(product_names, categorize(product_names)))
+    except Exception as e:
+        print(f"Ostrzeżenie: klasyfikacja produktów: {e}")
+        return {}
+
+def get_category_ids(category_names: List[str]) -> Dict[str, int]:
+    """
+    ID kategorii dla nazw - brakujące kategorie są tworzone jednym insertem
+    """
+    category_ids = {}
+    missing_names = []
+    for name in dict.fromkeys(category_names):
+        cached_category_id = category_cache.get(name)
+        if cached_category_id is not None:
+            category_ids[name] = cached_category_id
+        else:
+            missing_names.append(name)
+
+    if missing_names:
+        category_result = supabase_client.table("categories")\
+            .select("id, name")\
+            .in_("name", missing_names)\
+            .execute()
+        rows = category_result.data or []
+
+        found = {row["name"] for row in rows}
+        new_names = [name for name in missing_names if name not in found]
+        if new_names:
+            new_categories = supabase_client.table("categories")\
+                .insert([{"name": name} for name in new_names])\
+                .execute()
+            rows += new_categories.data or []
+
+        for row in rows:
+            category_ids[row["name"]] = row["id"]
+            category_cache.set(row["name"], row["id"])
+
+    return category_ids
+
+def remember_product_category(product_id: int, category_name: Optional[str]) -> None:
+    # Import w funkcji - services.aggregates importuje ten moduł
+    from services.aggregates import aggregate_store
+    aggregate_store.set_product_category(product_id, category_name)
+
 def get_or_create_product(product_name: str, category_name: str = None) -> Dict[str, Any]:
     """
     Znajduje lub tworzy produkt na podstawie nazwy
     """
+    cached_product_id = product_cache.get(product_name)
+    if cached_product_id is not None:
+        return {"success": True, "product_id": cached_product_id}
+
     try:
         # Sprawdzamy czy produkt istnieje
         product_result = supabase_client.table("product")\
@@ -80,24 +167,16 @@ def get_or_create_product(product_name: str, category_name: str = None) -> Dict[
             .execute()
         
         if not product_result.data:
-            # Jeśli podano kategorię, próbujemy ją znaleźć lub utworzyć
-            category_id = None
-            if category_name:
-                category_result = supabase_client.table("categories")\
-                    .select("id")\
-                    .eq("name", category_name)\
-                    .execute()
-                
-                if not category_result.data:
-                    # Tworzymy nową kategorię
-                    new_category = supabase_client.table("categories")\
-                        .insert({"name": category_name})\
-                        .execute()
-                    
-                    if new_category.data:
-                        category_id = new_category.data[0]["id"]
-                else:
-                    category_id = category_result.data[0]["id"]
+            # Wariant nazwy z OCR może pasować do istniejącego produktu
+            match = load_product_index(supabase_client).match(product_name)
+            if match:
+                product_cache.set(product_name, match[0])
+                return {"success": True, "product_id": match[0]}
+
+            # Bez podanej kategorii przypisujemy ją klasyfikatorem
+            if not category_name:
+                category_name = categorize_products([product_name]).get(product_name)
+            category_id = get_category_ids([category_name]).get(category_name) if category_name else None
             
             # Tworzymy nowy produkt
             product_data = {
@@ -112,14 +191,221 @@ def get_or_create_product(product_name: str, category_name: str = None) -> Dict[
                 return {"success": False, "error": f"Nie udało się utworzyć produktu: {product_name}"}
             
             product_id = new_product.data[0]["id"]
+            load_product_index(supabase_client).add(product_id, product_name)
+            remember_product_category(product_id, category_name)
         else:
             product_id = product_result.data[0]["id"]
         
+        product_cache.set(product_name, product_id)
         return {"success": True, "product_id": product_id}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def get_or_create_products(product_names: List[str]) -> Dict[str, Any]:
+    """
+    Znajduje lub tworzy produkty dla wielu nazw naraz - jedno zapytanie in_() i jeden zbiorczy insert
+    """
+    try:
+        product_ids = {}
+        uncached_names = []
+        for name in dict.fromkeys(product_names):
+            cached_product_id = product_cache.get(name)
+            if cached_product_id is not None:
+                product_ids[name] = cached_product_id
+            else:
+                uncached_names.append(name)
+
+        if not uncached_names:
+            return {"success": True, "product_ids": product_ids}
+
+        product_result = supabase_client.table("product")\
+            .select("id, name")\
+            .in_("name", uncached_names)\
+            .execute()
+
+        for row in product_result.data or []:
+            product_ids[row["name"]] = row["id"]
+            product_cache.set(row["name"], row["id"])
+
+        # Warianty z OCR dopasowujemy do istniejących produktów zanim cokolwiek utworzymy
+        missing_names = [name for name in uncached_names if name not in product_ids]
+        if missing_names:
+            index = load_product_index(supabase_client)
+            for name in missing_names:
+                match = index.match(name)
+                if match:
+                    product_ids[name] = match[0]
+                    product_cache.set(name, match[0])
+
+        # Tworzymy wszystkie brakujące produkty jednym zapytaniem
+        missing_names = [name for name in missing_names if name not in product_ids]
+        if missing_names:
+            categories = categorize_products(missing_names)
+            category_ids = get_category_ids([category for category in categories.values() if category])
+
+            new_products = supabase_client.table("product")\
+                .insert([
+                    {"name": name, "categorie_id": category_ids.get(categories.get(name))}
+                    for name in missing_names
+                ])\
+                .execute()
+
+            for row in new_products.data or []:
+                product_ids[row["name"]] = row["id"]
+                product_cache.set(row["name"], row["id"])
+                index.add(row["id"], row["name"])
+                remember_product_category(row["id"], categories.get(row["name"]))
+
+        return {"success": True, "product_ids": product_ids}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def save_receipt_items(receipt_id: int, shop_id: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Zapisuje pozycje paragonu zbiorczo: produkty, receipt_indekses i receipt_connect_indekses.
+    Każda pozycja to słownik z kluczami indeks, price i quantity.
+    """
+    return save_receipts_items([(receipt_id, shop_id, items)])
+
+def save_receipts_items(receipts_items: List[Tuple[int, int, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    """
+    Zapisuje pozycje wielu paragonów naraz. Każdy element to (receipt_id, shop_id, pozycje);
+    niezależnie od liczby paragonów wykonywane są te same trzy-pięć zapytań.
+    Do każdej pozycji dopisywane jest rozwiązane product_id.
+    Można ponowić po błędzie (kolejka zadań): paragony, które mają już powiązane pozycje,
+    są pomijane, a po nieudanym wiązaniu wstawione receipt_indekses są usuwane.
+    """
+    receipt_ids = [receipt_id for receipt_id, _, _ in receipts_items]
+    if not receipt_ids:
+        return {"success": True}
+
+    existing = supabase_client.table("receipt_connect_indekses")\
+        .select("receipt_id")\
+        .in_("receipt_id", receipt_ids)\
+        .execute().data or []
+    complete = {row["receipt_id"] for row in existing}
+
+    rows = [
+        (receipt_id, shop_id, item)
+        for receipt_id, shop_id, items in receipts_items
+        if receipt_id not in complete
+        for item in items
+    ]
+    if not rows:
+        return mark_items_saved(receipt_ids)
+
+    products_result = get_or_create_products([item["indeks"] for _, _, item in rows])
+    if not products_result["success"]:
+        print(f"Ostrzeżenie: {products_result['error']}")
+        product_ids = {}
+    else:
+        product_ids = products_result["product_ids"]
+
+    for _, _, item in rows:
+        item["product_id"] = product_ids.get(item["indeks"])
+
+    indeks_rows = [
+        {
+            "indeks": item["indeks"],
+            "price": item["price"],
+            "product_id": item["product_id"],
+            "shop_id": shop_id
+        }
+        for _, shop_id, item in rows
+    ]
+
+    # PostgREST zwraca wstawione wiersze w kolejności wejściowej
+    indeks_result = supabase_client.table("receipt_indekses").insert(indeks_rows).execute()
+
+    if not indeks_result.data:
+        return {"success": False, "error": "Nie udało się zapisać indeksów paragonu"}
+
+    connect_rows = [
+        {
+            "receipt_id": receipt_id,
+            "receipt_indeks_id": indeks_row["id"],
+            "quantity": item["quantity"]
+        }
+        for indeks_row, (receipt_id, _, item) in zip(indeks_result.data, rows)
+    ]
+
+    try:
+        connect_result = supabase_client.table("receipt_connect_indekses").insert(connect_rows).execute()
+        error = None if connect_result.data else "Nie udało się powiązać pozycji z paragonem"
+    except Exception as e:
+        error = str(e)
+
+    if error:
+        # bez powiązań te indeksy byłyby osierocone, a ponowienie wstawiłoby je drugi raz
+        supabase_client.table("receipt_indekses")\
+            .delete()\
+            .in_("id", [indeks_row["id"] for indeks_row in indeks_result.data])\
+            .execute()
+        return {"success": False, "error": error}
+
+    # id powiązania identyfikuje obserwację ceny (indeks cen pomija ją przy odbudowie)
+    for connect_row, (_, _, item) in zip(connect_result.data, rows):
+        item["connect_id"] = connect_row["id"]
+
+    return mark_items_saved(receipt_ids)
+
+def mark_items_saved(receipt_ids: List[int]) -> Dict[str, Any]:
+    """
+    Oznacza paragony jako kompletne - dopiero wtedy trafiają do /paragon/sync
+    (trigger nadaje im sync_seq, patrz sql/receipt_sync.sql)
+    """
+    if receipt_ids:
+        supabase_client.table("receipts")\
+            .update({"items_saved": True})\
+            .in_("id", receipt_ids)\
+            .execute()
+    return {"success": True}
+
+def insert_receipt_with_items(
+    receipt_data: Dict[str, Any],
+    shop_id: int,
+    items: List[Dict[str, Any]],
+    shop_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Zapisuje paragon razem z pozycjami. Przy USE_SAVE_RECEIPT_RPC cały zapis idzie
+    jednym wywołaniem funkcji save_receipt (sql/save_receipt.sql) w jednej transakcji.
+    """
+    if USE_SAVE_RECEIPT_RPC:
+        rpc_result = supabase_client.rpc("save_receipt", {
+            "receipt": receipt_data,
+            "shop_id": shop_id,
+            "items": items
+        }).execute()
+
+        if not rpc_result.data:
+            return {"success": False, "error": "Nie udało się zapisać paragonu"}
+
+        # jak w save_receipts_items: pozycje dostają product_id i id powiązania
+        for item, saved_item in zip(items, rpc_result.data["items"]):
+            item["product_id"] = saved_item["product_id"]
+            item["connect_id"] = saved_item["connect_id"]
+
+        receipt_row = rpc_result.data["receipt"]
+        publish_receipt_saved(receipt_saved_event(receipt_row, shop_id, shop_name, items))
+        return {"success": True, "data": receipt_row}
+
+    receipt_result = supabase_client.table("receipts").insert(receipt_data).execute()
+
+    if not receipt_result.data:
+        return {"success": False, "error": "Nie udało się zapisać paragonu"}
+
+    receipt_row = receipt_result.data[0]
+
+    items_result = save_receipt_items(receipt_row["id"], shop_id, items)
+    if not items_result["success"]:
+        print(f"Ostrzeżenie: {items_result['error']}")
+
+    publish_receipt_saved(receipt_saved_event(receipt_row, shop_id, shop_name, items))
+    return {"success": True, "data": receipt_row}
+
 def save_paragon_to_db(paragon_data: ParagonInput) -> Dict[str, Any]:
     """
     Zapisuje paragon do bazy danych wraz z indeksami
@@ -149,80 +435,234 @@ def save_paragon_to_db(paragon_data: ParagonInput) -> Dict[str, Any]:
             "pic_path": paragon_data.pic_path
         }
         
-        # Zapisujemy paragon
-        receipt_result = supabase_client.table("receipts").insert(receipt_data).execute()
-        
-        if not receipt_result.data:
-            return {"success": False, "error": "Nie udało się zapisać paragonu"}
+        items = [
+            {"indeks": indeks_item.indeks, "price": indeks_item.price, "quantity": 1}
+            for indeks_item in paragon_data.receipt_indekses
+        ]
         
-        receipt_id = receipt_result.data[0]["id"]
-        
-        # Zapisujemy indeksy do tabeli receipt_indekses
-        for indeks_item in paragon_data.receipt_indekses:
-            # Pobieramy lub tworzymy produkt na podstawie nazwy (indeks)
-            product_result = get_or_create_product(indeks_item.indeks)
-            if not product_result["success"]:
-                print(f"Ostrzeżenie: {product_result['error']}")
-                product_id = None
-            else:
-                product_id = product_result["product_id"]
-            
-            indeks_data = {
-                "indeks": indeks_item.indeks,
-                "price": indeks_item.price,
-                "product_id": product_id,
-                "shop_id": shop_id  
-            }
-            
-            # Zapisujemy indeks
-            indeks_result = supabase_client.table("receipt_indekses").insert(indeks_data).execute()
-            
-            if indeks_result.data:
-                indeks_id = indeks_result.data[0]["id"]
-                
-                # Łączymy paragon z indeksem w tabeli receipt_connect_indekses
-                connect_data = {
-                    "receipt_id": receipt_id,
-                    "receipt_indeks_id": indeks_id,
-                    "quantity": 1  
-                }
-                
-                supabase_client.table("receipt_connect_indekses").insert(connect_data).execute()
-        
-        return {"success": True, "data": receipt_result.data[0]}
+        return insert_receipt_with_items(receipt_data, shop_id, items, paragon_data.shop_name)
             
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def build_paragon(item: dict) -> dict:
+# Paragon razem ze sklepem i pozycjami - jedno zapytanie na całą stronę wyników
+PARAGON_SELECT = """
+    *,
+    shops_parcels!left(
+        id,
+        location,
+        shops_id,
+        shops!inner(
+            id,
+            name
+        )
+    ),
+    receipt_connect_indekses(
+        quantity,
+        receipt_indekses!inner(
+            id,
+            indeks,
+            price,
+            product_id,
+            shop_id
+        )
+    )
+"""
+
+def build_paragon(item: dict, columnar: bool = False) -> ParagonRow:
     """
     Buduje obiekt paragonu z dodatkowymi informacjami o indeksach i sklepie.
+    Indeksy przychodzą zagnieżdżone w wierszu paragonu (PARAGON_SELECT), bez osobnego zapytania.
+    Przy columnar pozycje są zwracane jako kolumny i wiersze zamiast listy obiektów.
     """
-    indekses_result = supabase_client.table("receipt_connect_indekses")\
-        .select("""
-            quantity,
-            receipt_indekses!inner(
-                id,
-                indeks,
-                price,
-                product_id,
-                shop_id
+    connects = item.get("receipt_connect_indekses") or []
+
+    if columnar:
+        receipt_indekses = ColumnarItems(ITEM_COLUMNS, [
+            [
+                idx["receipt_indekses"]["indeks"],
+                idx["receipt_indekses"]["price"],
+                idx["quantity"],
+                idx["receipt_indekses"]["product_id"],
+                idx["receipt_indekses"]["shop_id"]
+            ]
+            for idx in connects
+        ])
+    else:
+        receipt_indekses = [
+            ParagonItemRow(
+                idx["receipt_indekses"]["indeks"],
+                idx["receipt_indekses"]["price"],
+                idx["quantity"],
+                idx["receipt_indekses"]["product_id"],
+                idx["receipt_indekses"]["shop_id"]
             )
-        """)\
-        .eq("receipt_id", item["id"])\
-        .execute()
-    
-    receipt_indekses = []
-    if indekses_result.data:
-        for idx in indekses_result.data:
-            receipt_indekses.append({
-                "indeks": idx["receipt_indekses"]["indeks"],
-                "price": idx["receipt_indekses"]["price"],
-                "quantity": idx["quantity"],
-                "product_id": idx["receipt_indekses"]["product_id"],
-                "shop_id": idx["receipt_indekses"]["shop_id"]
-            })
+            for idx in connects
+        ]
+
+    return ParagonRow(
+        item["id"],
+        item["create_date"],
+        item["date"],
+        item["sum_price"],
+        get_shop_name(item),
+        item["shops_parcels"]["location"] if item["shops_parcels"] else None,
+        receipt_indekses
+    )
+
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    """
+    Nieprzezroczysty kursor stronicowania z pary (date, id) ostatniego paragonu.
+    Paragon bez daty ma pustą datę w kursorze.
+    """
+    raw = f"{item['date'] or ''}|{item['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    date, receipt_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    # data trafia do filtra or_ - cała wartość musi być datą, bez przecinków i nawiasów
+    if date and not _CURSOR_DATE_RE.fullmatch(date):
+        raise ValueError("Niepoprawna data w kursorze")
+    return date or None, int(receipt_id)
+
+def paragons_page_query(
+    client,
+    user_id: int,
+    offset: int,
+    page_size: int,
+    store_name: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Zapytanie o stronę paragonów użytkownika. Przyjmuje klienta synchronicznego lub asynchronicznego.
+    Z kursorem strona zaczyna się za ostatnim paragonem poprzedniej strony (keyset) i offset
+    jest pomijany. Pobieramy jeden wiersz więcej, żeby wiedzieć, czy jest następna strona.
+    """
+    query = client.table("receipts")\
+        .select(PARAGON_SELECT)\
+        .eq("creator_id", user_id)\
+        .order("date", desc=True, nullsfirst=False)\
+        .order("id", desc=True)
+
+    if cursor:
+        # Paragony bez daty są na końcu listy (nulls last)
+        date, receipt_id = decode_cursor(cursor)
+        if date is None:
+            keyset = f"and(date.is.null,id.lt.{receipt_id})"
+        else:
+            keyset = f"date.lt.{date},and(date.eq.{date},id.lt.{receipt_id}),date.is.null"
+        query = query.or_(keyset).limit(page_size + 1)
+    else:
+        query = query.range(offset, offset + page_size)
+
+    if store_name:
+        query = store_name_filter(query, store_name)
+
+    return query
+
+def store_name_filter(query, store_name: str):
+    """
+    Filtr paragonów po fragmencie nazwy sklepu. Z wczytanym katalogiem sklepów to zwykłe
+    in_ po ID lokalizacji zamiast ilike po złączonych tabelach. Gdy nic nie pasuje, katalog
+    jest wczytywany ponownie (sklep mógł zostać dodany albo przemianowany w innym procesie).
+    """
+    if shop_catalog.loaded:
+        parcel_ids = shop_catalog.parcel_ids_matching(store_name)
+        if not parcel_ids and shop_catalog.refresh_if_stale(supabase_client):
+            parcel_ids = shop_catalog.parcel_ids_matching(store_name)
+        return query.in_("shop_id", parcel_ids)
+    return query.ilike("shops_parcels.shops.name", f"%{store_name}%")
 
+def paragons_count_query(client, user_id: int, store_name: Optional[str] = None, count_method: str = "exact"):
+    """
+    Zapytanie do licznika paragonów użytkownika (count_method: exact albo estimated)
+    """
+    count_query = client.table("receipts")\
+        .select("id", count=count_method)\
+        .eq("creator_id", user_id)
+
+    if store_name and shop_catalog.loaded:
+        count_query = store_name_filter(count_query, store_name)
+    elif store_name:
+        count_query = count_query.select("""
+            id,
+            shops_parcels!inner(
+                shops!inner(name)
+            )
+        """, count=count_method).ilike("shops_parcels.shops.name", f"%{store_name}%")
+
+    return count_query
+
+def cached_paragon_count(user_id: int, store_name: Optional[str]) -> Optional[int]:
+    return (paragon_count_cache.get(user_id) or {}).get(store_name or "")
+
+def cache_paragon_count(user_id: int, store_name: Optional[str], total_count: int) -> None:
+    counts = dict(paragon_count_cache.get(user_id) or {})
+    counts[store_name or ""] = total_count
+    paragon_count_cache.set(user_id, counts)
+
+@on_receipt_saved
+def invalidate_paragon_count(event: Dict[str, Any]) -> None:
+    paragon_count_cache.invalidate(event["user_id"])
+
+def encode_watermark(sync_seq: int, tombstone_id: int) -> str:
+    """
+    Znacznik synchronizacji: ostatni zsynchronizowany paragon (sync_seq) i ostatni nagrobek
+    """
+    raw = f"{sync_seq}|{tombstone_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_watermark(watermark: Optional[str]) -> Tuple[int, int]:
+    if not watermark:
+        return 0, 0
+    padded = watermark + "=" * (-len(watermark) % 4)
+    parts = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    if len(parts) == 3:
+        # znacznik sprzed sync_seq (create_date|id|nagrobek) - paragony od początku
+        return 0, int(parts[2])
+    sync_seq, tombstone_id = parts
+    return int(sync_seq), int(tombstone_id)
+
+def sync_cutoff() -> str:
+    """
+    Zmiany młodsze niż SYNC_SAFETY_LAG czekają na następną synchronizację - transakcja
+    z wcześniejszym sync_seq może jeszcze nie być zatwierdzona. Czas UTC w formacie kolumn
+    synced_at/deleted_at.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SYNC_SAFETY_LAG)
+    return cutoff.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+
+def paragons_changed_query(client, user_id: int, sync_seq: int, limit: int, cutoff: str):
+    """
+    Paragony z kompletnymi pozycjami oznaczone po znaczniku sync_seq, w kolejności oznaczania.
+    Pobieramy jeden wiersz więcej, żeby wiedzieć, czy zostało coś do pobrania.
+    """
+    return client.table("receipts")\
+        .select(PARAGON_SELECT)\
+        .eq("creator_id", user_id)\
+        .gt("sync_seq", sync_seq)\
+        .lte("synced_at", cutoff)\
+        .order("sync_seq")\
+        .limit(limit + 1)
+
+def tombstones_query(client, user_id: int, tombstone_id: int, limit: int, cutoff: str):
+    """
+    Usunięte paragony (tabela receipt_tombstones, patrz sql/receipt_tombstones.sql)
+    """
+    return client.table("receipt_tombstones")\
+        .select("id, receipt_id")\
+        .eq("creator_id", user_id)\
+        .gt("id", tombstone_id)\
+        .lte("deleted_at", cutoff)\
+        .order("id")\
+        .limit(limit + 1)
+
+def compact_paragon(item: dict) -> dict:
+    """
+    Zwięzła postać paragonu do synchronizacji - pozycje jako listy w kolejności SYNC_ITEM_FIELDS
+    """
     return {
         "id": item["id"],
         "create_date": item["create_date"],
@@ -230,7 +670,76 @@ def build_paragon(item: dict) -> dict:
         "sum_price": item["sum_price"],
         "shop_name": get_shop_name(item),
         "location": item["shops_parcels"]["location"] if item["shops_parcels"] else None,
-        "receipt_indekses": receipt_indekses
+        "items": [
+            [
+                idx["receipt_indekses"]["indeks"],
+                idx["receipt_indekses"]["price"],
+                idx["quantity"],
+                idx["receipt_indekses"]["product_id"]
+            ]
+            for idx in item.get("receipt_connect_indekses") or []
+        ]
+    }
+
+SYNC_ITEM_FIELDS = ["indeks", "price", "quantity", "product_id"]
+
+def sync_result(
+    receipts: list,
+    tombstones: list,
+    sync_seq: int,
+    tombstone_id: int,
+    limit: int
+) -> Dict[str, Any]:
+    receipts = receipts or []
+    tombstones = tombstones or []
+    has_more = len(receipts) > limit or len(tombstones) > limit
+    receipts = receipts[:limit]
+    tombstones = tombstones[:limit]
+
+    if receipts:
+        sync_seq = receipts[-1]["sync_seq"]
+    if tombstones:
+        tombstone_id = tombstones[-1]["id"]
+
+    return {
+        "success": True,
+        "receipts": [compact_paragon(item) for item in receipts],
+        "item_fields": SYNC_ITEM_FIELDS,
+        "deleted": [tombstone["receipt_id"] for tombstone in tombstones],
+        "watermark": encode_watermark(sync_seq, tombstone_id),
+        "has_more": has_more
+    }
+
+def paragons_date_range_query(client, user_id: int, start_date: str, end_date: str):
+    """
+    Zapytanie o paragony użytkownika w zakresie dat
+    """
+    return client.table("receipts")\
+        .select(PARAGON_SELECT)\
+        .eq("creator_id", user_id)\
+        .gte("date", start_date)\
+        .lte("date", end_date)\
+        .order("date", desc=True)
+
+def paragons_page_result(
+    data: list,
+    total_count: Optional[int],
+    page: Optional[int],
+    page_size: int,
+    columnar: bool = False
+) -> Dict[str, Any]:
+    data = data or []
+    next_cursor = encode_cursor(data[page_size - 1]) if len(data) > page_size else None
+    paragons = [build_paragon(item, columnar) for item in data[:page_size]]
+
+    return {
+        "success": True,
+        "paragons": paragons,
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total_count + page_size - 1) // page_size if total_count is not None else None,
+        "next_cursor": next_cursor
     }
 
 
@@ -238,10 +747,15 @@ def get_paragons_for_user(
     firebase_uid: str,
     page: int = 1,
     page_size: int = 10,
-    store_name: Optional[str] = None
+    store_name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: str = "exact",
+    columnar: bool = False
 ) -> Dict[str, Any]:
     """
     Pobiera paragony dla konkretnego użytkownika z paginacją i opcjonalnym filtrowaniem po nazwie sklepu.
+    Z kursorem (next_cursor z poprzedniej strony) używa paginacji keyset po (date, id).
+    count: exact, estimated, cached (licznik z cache do następnego zapisu) albo none.
     """
     try:
         user_result = get_user_id_by_token(firebase_uid)
@@ -252,60 +766,23 @@ def get_paragons_for_user(
         offset = (page - 1) * page_size
 
         # Główne zapytanie
-        query = supabase_client.table("receipts")\
-            .select("""
-                *,
-                shops_parcels!left(
-                    id,
-                    location,
-                    shops_id,
-                    shops!inner(
-                        id,
-                        name
-                    )
-                )
-            """)\
-            .eq("creator_id", user_id)\
-            .order("date", desc=True)\
-            .range(offset, offset + page_size - 1)
-
-        if store_name:
-            query = query.ilike("shops_parcels.shops.name", f"%{store_name}%")
-
-        result = query.execute()
+        result = paragons_page_query(supabase_client, user_id, offset, page_size, store_name, cursor).execute()
 
         # Zapytanie do licznika
-        count_query = supabase_client.table("receipts")\
-            .select("id", count="exact")\
-            .eq("creator_id", user_id)
-
-        if store_name:
-            count_query = count_query.select("""
-                id,
-                shops_parcels!inner(
-                    shops!inner(name)
-                )
-            """, count="exact").ilike("shops_parcels.shops.name", f"%{store_name}%")
-        
-        count_response = count_query.execute()
-        total_count = count_response.count
-
-        paragons = [build_paragon(item) for item in result.data] if result.data else []
-
-        return {
-            "success": True,
-            "paragons": paragons,
-            "total_count": total_count,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total_count + page_size - 1) // page_size
-        }
+        total_count = cached_paragon_count(user_id, store_name) if count == "cached" else None
+        if total_count is None and count != "none":
+            count_method = "estimated" if count == "estimated" else "exact"
+            total_count = paragons_count_query(supabase_client, user_id, store_name, count_method).execute().count
+            if count == "cached":
+                cache_paragon_count(user_id, store_name, total_count)
+
+        return paragons_page_result(result.data, total_count, None if cursor else page, page_size, columnar)
 
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-def get_paragons_in_date_range(firebase_uid: str, start_date: str, end_date: str) -> Dict[str, Any]:
+def get_paragons_in_date_range(firebase_uid: str, start_date: str, end_date: str, columnar: bool = False) -> Dict[str, Any]:
     """
     Pobiera paragony użytkownika w określonym zakresie dat z nazwą sklepu i indeksem.
     """
@@ -316,26 +793,8 @@ def get_paragons_in_date_range(firebase_uid: str, start_date: str, end_date: str
         
         user_id = user_result["user_id"]
 
-        query = supabase_client.table("receipts")\
-            .select("""
-                *,
-                shops_parcels!left(
-                    id,
-                    location,
-                    shops_id,
-                    shops!inner(
-                        id,
-                        name
-                    )
-                )
-            """)\
-            .eq("creator_id", user_id)\
-            .gte("date", start_date)\
-            .lte("date", end_date)\
-            .order("date", desc=True)
-
-        result = query.execute()
-        paragons = [build_paragon(item) for item in result.data] if result.data else []
+        result = paragons_date_range_query(supabase_client, user_id, start_date, end_date).execute()
+        paragons = [build_paragon(item, columnar) for item in result.data] if result.data else []
 
         return {"success": True, "paragons": paragons}
 
@@ -0,0 +1,237 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date as date_type, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # bez numpy historia zbiera ceny, ale zwraca tylko surowe punkty (bucket=raw)
+    np = None
+
+from services.price_index import rebuild_indexes, unit_price, was_scanned
+from services.receipt_events import on_receipt_saved
+from services.shop_catalog import shop_catalog
+
+_EPOCH = date_type(1970, 1, 1)
+
+BUCKETS = ("raw", "day", "week", "month")
+
+
+def to_day(date: Optional[str]) -> Optional[int]:
+    """
+    Data (YYYY-MM-DD, także z czasem) jako liczba dni od 1970-01-01
+    """
+    if not date:
+        return None
+    try:
+        return (date_type.fromisoformat(date[:10]) - _EPOCH).days
+    except ValueError:
+        return None
+
+
+def from_day(day: int) -> str:
+    return (_EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def history_error(bucket: str) -> Optional[str]:
+    """
+    Komunikat błędu, gdy agregacja historii jest niedostępna, albo None
+    """
+    if np is None and bucket != "raw":
+        return "Agregacja historii cen wymaga pakietu numpy (dostępny jest bucket=raw)"
+    return None
+
+
+class PriceSeries:
+    """
+    Ceny jednego produktu w jednym sklepie posortowane po dacie - dwie tablice typowane
+    (dni int32 i ceny float64), czyli 12 bajtów na obserwację
+    """
+    __slots__ = ("days", "prices")
+
+    def __init__(self):
+        self.days = array("i")
+        self.prices = array("d")
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def add(self, day: int, price: float) -> None:
+        # paragony przychodzą zwykle w kolejności dat - wtedy to zwykłe dopisanie na końcu
+        if not self.days or day >= self.days[-1]:
+            self.days.append(day)
+            self.prices.append(price)
+            return
+        i = bisect_right(self.days, day)
+        self.days.insert(i, day)
+        self.prices.insert(i, price)
+
+    def slice(self, start: Optional[int], end: Optional[int]) -> Tuple[array, array]:
+        lo = bisect_left(self.days, start) if start is not None else 0
+        hi = bisect_right(self.days, end) if end is not None else len(self.days)
+        return self.days[lo:hi], self.prices[lo:hi]
+
+
+def downsample(days: "np.ndarray", prices: "np.ndarray", bucket: str) -> List[Dict[str, Any]]:
+    """
+    Min, średnia i maks. ceny w przedziałach (dzień, tydzień od poniedziałku, miesiąc)
+    """
+    if bucket == "raw":
+        return [{"date": from_day(day), "price": round(float(price), 2)} for day, price in zip(days, prices)]
+    if not len(days):
+        return []
+
+    if bucket == "week":
+        # 1970-01-01 to czwartek - (dzień + 3) % 7 to liczba dni od poniedziałku
+        keys = days - (days + 3) % 7
+    elif bucket == "month":
+        keys = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    else:
+        keys = days
+
+    # dni są posortowane, więc przedziały to ciągłe fragmenty tablicy
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    minimums = np.minimum.reduceat(prices, starts)
+    maximums = np.maximum.reduceat(prices, starts)
+    averages = np.add.reduceat(prices, starts) / counts
+
+    return [
+        {
+            "date": from_day(keys[start]),
+            "min": round(float(low), 2),
+            "avg": round(float(average), 2),
+            "max": round(float(high), 2),
+            "count": int(count)
+        }
+        for start, low, average, high, count in zip(starts, minimums, averages, maximums, counts)
+    ]
+
+
+class PriceHistory:
+    """
+    Historia cen (produkt, sklep) ze wszystkich paragonów. Serie danego produktu są
+    w jednym słowniku, więc zapytanie o produkt nie przegląda innych produktów.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._series: Dict[int, Dict[int, PriceSeries]] = {}
+        self._shop_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending: List[tuple] = []
+
+    def add(self, product_id: int, shop_id: int, date: Optional[str], price: float,
+            shop_name: Optional[str] = None, connect_id: Optional[int] = None) -> None:
+        day = to_day(date)
+        if product_id is None or shop_id is None or day is None:
+            return
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((connect_id, (product_id, shop_id, day, price, shop_name)))
+            self._add(product_id, shop_id, day, price, shop_name)
+
+    def _add(self, product_id: int, shop_id: int, day: int, price: float, shop_name: Optional[str]) -> None:
+        shops = self._series.setdefault(product_id, {})
+        series = shops.get(shop_id)
+        if series is None:
+            series = shops[shop_id] = PriceSeries()
+        series.add(day, price)
+        # nazwa z paragonu (storeName) to tylko zapas, gdy sklepu nie ma w katalogu - patrz shop_name
+        if shop_name and shop_id not in self._shop_names:
+            self._shop_names[shop_id] = shop_name
+
+    def shop_name(self, shop_id: int) -> Optional[str]:
+        return shop_catalog.name(shop_id) or self._shop_names.get(shop_id)
+
+    def observations(self) -> int:
+        with self._lock:
+            return sum(len(series) for shops in self._series.values() for series in shops.values())
+
+    def history(
+        self,
+        product_id: int,
+        shop_id: Optional[int] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        bucket: str = "day"
+    ) -> List[Dict[str, Any]]:
+        """
+        Przebieg ceny produktu w każdym sklepie (albo w jednym) w zakresie dat
+        """
+        start, end = to_day(start_date), to_day(end_date)
+        with self._lock:
+            shops = self._series.get(product_id, {})
+            selected = [
+                (sid, shops[sid].slice(start, end), self.shop_name(sid))
+                for sid in sorted(shops)
+                if shop_id is None or sid == shop_id
+            ]
+
+        return [
+            {
+                "shop_id": sid,
+                "shop_name": shop_name,
+                "points": downsample(days, prices, bucket) if np is None else downsample(
+                    np.frombuffer(days, dtype=np.int32).astype(np.int64),
+                    np.frombuffer(prices, dtype=np.float64),
+                    bucket
+                )
+            }
+            for sid, (days, prices), shop_name in selected
+            if len(days)
+        ]
+
+    def rebuild(self, client, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Odbudowuje historię ze wszystkich paragonów
+        """
+        result = rebuild_indexes(client, [self], page_size)
+        return {"observations": self.observations(), "seconds": result["seconds"]}
+
+    # --- odbudowa (rebuild_indexes) ---
+
+    def begin_rebuild(self) -> None:
+        with self._lock:
+            self._rebuilding = True
+            self._pending = []
+
+    def add_scanned(self, connect_id, product_id, shop_id, date, price, product_name, shop_name) -> None:
+        day = to_day(date)
+        if day is not None:
+            self._add(product_id, shop_id, day, price, shop_name)
+
+    def finish_rebuild(self, fresh: "PriceHistory", scanned) -> None:
+        # Obserwacje zapisane w trakcie odbudowy, których skan nie wczytał. Porównujemy id
+        # pozycji, a nie (dzień, cena) - dwa takie same zakupy tego samego dnia to dwie obserwacje.
+        with self._lock:
+            for connect_id, observation in self._pending:
+                if not was_scanned(scanned, connect_id):
+                    fresh._add(*observation)
+            self._series = fresh._series
+            self._shop_names.update(fresh._shop_names)
+            self.ready = True
+
+    def end_rebuild(self) -> None:
+        with self._lock:
+            self._rebuilding = False
+            self._pending = []
+
+
+price_history = PriceHistory()
+
+
+@on_receipt_saved
+def update_price_history(event: Dict[str, Any]) -> None:
+    date = event["date"] or date_type.today().isoformat()
+    for item in event["items"]:
+        price_history.add(
+            item.get("product_id"),
+            event["shop_id"],
+            date,
+            unit_price(item["price"], item["quantity"]),
+            event["shop_name"],
+            item.get("connect_id")
+        )
@@ -0,0 +1,355 @@
+import heapq
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+from datetime import date as date_type
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from services.receipt_events import on_receipt_saved
+from services.shop_catalog import shop_catalog
+
+# Budowa indeksu cen (i historii cen) pełnym skanem pozycji paragonów przy starcie. Bez tego
+# indeks zawiera tylko paragony zapisane od startu procesu i zgłasza ready=False.
+PRICE_INDEX = os.getenv("PRICE_INDEX", "false").lower() == "true"
+
+# Bez PRICE_INDEX indeks buduje pierwsze zapytanie (refresh_if_stale). Po zbudowaniu jest
+# odbudowywany w tle, gdy jest starszy niż tyle sekund - paragony z innych procesów
+# (workerów) trafiają do niego tylko przez odbudowę.
+PRICE_INDEX_MAX_AGE = float(os.getenv("PRICE_INDEX_MAX_AGE", "600"))
+
+# Mediana liczona z tylu ostatnich cen produktu w sklepie - pamięć na parę (produkt, sklep)
+# nie rośnie z liczbą paragonów, a mediana śledzi aktualne ceny zamiast całej historii
+PRICE_INDEX_MEDIAN_WINDOW = int(os.getenv("PRICE_INDEX_MEDIAN_WINDOW", "101"))
+
+
+class PriceStats:
+    """
+    Ceny jednego produktu w jednym sklepie: ostatnia, minimalna, maksymalna i mediana
+    z ostatnich PRICE_INDEX_MEDIAN_WINDOW obserwacji
+    """
+    __slots__ = ("latest_date", "latest", "min", "max", "count", "_recent")
+
+    def __init__(self):
+        self.latest_date = ""
+        self.latest = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.count = 0
+        self._recent = deque(maxlen=PRICE_INDEX_MEDIAN_WINDOW)
+
+    def add(self, date: str, price: float) -> None:
+        if date >= self.latest_date:
+            self.latest_date = date
+            self.latest = price
+        self.min = min(self.min, price)
+        self.max = max(self.max, price)
+        self.count += 1
+        self._recent.append(price)
+
+    @property
+    def median(self) -> float:
+        # sortowanie okna przy odczycie - porównanie czyta kilka sklepów dla top-N produktów
+        ordered = sorted(self._recent)
+        n = len(ordered)
+        mid = n // 2
+        return ordered[mid] if n % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latest": round(self.latest, 2),
+            "latest_date": self.latest_date,
+            "min": round(self.min, 2),
+            "max": round(self.max, 2),
+            "median": round(self.median, 2),
+            "observations": self.count
+        }
+
+
+class PriceIndex:
+    """
+    Indeks cen (produkt, sklep) ze wszystkich paragonów. Dla każdego produktu trzymamy
+    od razu różnicę między najdroższym a najtańszym sklepem (wg ostatniej ceny),
+    więc ranking oszczędności to tylko wybór top-N z kopca.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.built_at = 0.0
+        self._prices: Dict[int, Dict[int, PriceStats]] = {}
+        self._savings: Dict[int, float] = {}
+        self._product_names: Dict[int, str] = {}
+        self._shop_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending: List[tuple] = []
+        # rośnie przy każdej zmianie - pozwala odświeżać struktury pochodne (macierz cen)
+        self.version = 0
+
+    def add(self, product_id: int, shop_id: int, date: str, price: float,
+            product_name: Optional[str] = None, shop_name: Optional[str] = None,
+            connect_id: Optional[int] = None) -> None:
+        """
+        connect_id (id receipt_connect_indekses) pozwala pominąć obserwację, jeśli trwająca
+        odbudowa już ją wczytała
+        """
+        if product_id is None or shop_id is None:
+            return
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((connect_id, (product_id, shop_id, date, price, product_name, shop_name)))
+            self._add(product_id, shop_id, date, price, product_name, shop_name)
+
+    def _add(self, product_id, shop_id, date, price, product_name, shop_name) -> None:
+        self.version += 1
+        shops = self._prices.setdefault(product_id, {})
+        stats = shops.get(shop_id)
+        if stats is None:
+            stats = shops[shop_id] = PriceStats()
+        stats.add(date or "", price)
+
+        if product_name and product_id not in self._product_names:
+            self._product_names[product_id] = product_name
+        # nazwa z paragonu (storeName) to tylko zapas, gdy sklepu nie ma w katalogu - patrz shop_name
+        if shop_name and shop_id not in self._shop_names:
+            self._shop_names[shop_id] = shop_name
+
+        if len(shops) > 1:
+            latest = [s.latest for s in shops.values()]
+            self._savings[product_id] = max(latest) - min(latest)
+
+    def shop_name(self, shop_id: int) -> Optional[str]:
+        return shop_catalog.name(shop_id) or self._shop_names.get(shop_id)
+
+    def _comparison(self, product_id: int) -> Dict[str, Any]:
+        shops = self._prices[product_id]
+        ranked = sorted(shops.items(), key=lambda entry: entry[1].latest)
+        cheapest_id, cheapest = ranked[0]
+        priciest_id, priciest = ranked[-1]
+        return {
+            "product_id": product_id,
+            "product_name": self._product_names.get(product_id),
+            "cheapest": {"shop_id": cheapest_id, "shop_name": self.shop_name(cheapest_id), "price": round(cheapest.latest, 2)},
+            "most_expensive": {"shop_id": priciest_id, "shop_name": self.shop_name(priciest_id), "price": round(priciest.latest, 2)},
+            "savings": round(priciest.latest - cheapest.latest, 2),
+            "shops": [
+                {"shop_id": shop_id, "shop_name": self.shop_name(shop_id), **stats.to_dict()}
+                for shop_id, stats in ranked
+            ]
+        }
+
+    def compare(self, product_ids: Optional[Iterable[int]] = None, top_n: int = 10) -> List[Dict[str, Any]]:
+        """
+        Porównanie cen między sklepami: top-N produktów z największą możliwą oszczędnością
+        """
+        with self._lock:
+            if product_ids is None:
+                candidates = self._savings.items()
+            else:
+                candidates = [(pid, self._savings[pid]) for pid in product_ids if pid in self._savings]
+            top = heapq.nlargest(top_n, candidates, key=lambda entry: entry[1])
+            return [self._comparison(product_id) for product_id, _ in top]
+
+    def latest_prices(self) -> Dict[str, Any]:
+        """
+        Migawka ostatnich cen do budowy macierzy produkt x sklep:
+        {"version", "prices": {product_id: {shop_id: cena}}, "product_names"}
+        """
+        with self._lock:
+            return {
+                "version": self.version,
+                "prices": {
+                    product_id: {shop_id: stats.latest for shop_id, stats in shops.items()}
+                    for product_id, shops in self._prices.items()
+                },
+                "product_names": dict(self._product_names)
+            }
+
+    def rebuild(self, client, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Odbudowuje indeks na podstawie receipt_connect_indekses z datą paragonu
+        """
+        result = rebuild_indexes(client, [self], page_size)
+        return {"products": len(self._prices), "seconds": result["seconds"]}
+
+    # --- odbudowa (rebuild_indexes) ---
+
+    def begin_rebuild(self) -> None:
+        with self._lock:
+            self._rebuilding = True
+            self._pending = []
+
+    def add_scanned(self, connect_id, product_id, shop_id, date, price, product_name, shop_name) -> None:
+        """
+        Obserwacja ze skanu - wywoływane na świeżym indeksie, bez blokady
+        """
+        self._add(product_id, shop_id, date, price, product_name, shop_name)
+
+    def finish_rebuild(self, fresh: "PriceIndex", scanned: array) -> None:
+        # Obserwacje zapisane w trakcie odbudowy - te, które skan już wczytał, pominięte,
+        # żeby nie liczyć ich dwa razy w medianie i liczbie obserwacji
+        with self._lock:
+            for connect_id, observation in self._pending:
+                if not was_scanned(scanned, connect_id):
+                    fresh._add(*observation)
+            self._prices = fresh._prices
+            self._savings = fresh._savings
+            self._product_names.update(fresh._product_names)
+            self._shop_names.update(fresh._shop_names)
+            self.version += 1
+            self.built_at = time.monotonic()
+            self.ready = True
+
+    def end_rebuild(self) -> None:
+        with self._lock:
+            self._rebuilding = False
+            self._pending = []
+
+
+def rebuild_indexes(client, indexes: List[Any], page_size: int = 1000) -> Dict[str, Any]:
+    """
+    Odbudowuje kilka indeksów (PriceIndex, PriceHistory) jednym skanem pozycji paragonów.
+    Każdy indeks buduje świeżą kopię (add_scanned), a na końcu podmienia dane
+    i dokłada obserwacje zapisane w trakcie skanu (finish_rebuild).
+    """
+    started = time.perf_counter()
+    for index in indexes:
+        index.begin_rebuild()
+
+    try:
+        fresh = [type(index)() for index in indexes]
+        scanned = array("q")
+        for observation in iter_price_observations(client, page_size):
+            scanned.append(observation[0])
+            for index in fresh:
+                index.add_scanned(*observation)
+
+        for index, built in zip(indexes, fresh):
+            index.finish_rebuild(built, scanned)
+    finally:
+        for index in indexes:
+            index.end_rebuild()
+
+    return {
+        "observations": len(scanned),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def was_scanned(scanned: array, connect_id: Optional[int]) -> bool:
+    """
+    Czy skan (id rosnąco) zawierał tę pozycję paragonu
+    """
+    if connect_id is None:
+        return False
+    i = bisect_left(scanned, connect_id)
+    return i < len(scanned) and scanned[i] == connect_id
+
+
+def iter_price_observations(client, page_size: int = 1000) -> Iterator[tuple]:
+    """
+    Wszystkie ceny z paragonów jako (id receipt_connect_indekses, product_id, shop_id, data,
+    cena jednostkowa, nazwa produktu, nazwa sklepu) - stronicowanie po id, rosnąco
+    """
+    last_id = None
+    while True:
+        query = client.table("receipt_connect_indekses")\
+            .select("""
+                id,
+                quantity,
+                receipts!inner(date),
+                receipt_indekses!inner(
+                    indeks,
+                    price,
+                    product_id,
+                    shop_id,
+                    shops(name)
+                )
+            """)\
+            .order("id")\
+            .limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+
+        for row in rows:
+            indeks = row["receipt_indekses"]
+            if indeks["product_id"] is None or indeks["shop_id"] is None:
+                continue
+            yield (
+                row["id"],
+                indeks["product_id"],
+                indeks["shop_id"],
+                row["receipts"]["date"],
+                unit_price(indeks["price"], row["quantity"]),
+                indeks["indeks"],
+                (indeks.get("shops") or {}).get("name")
+            )
+
+        if rows:
+            last_id = rows[-1]["id"]
+        if len(rows) < page_size:
+            break
+
+
+def unit_price(price: float, quantity: float) -> float:
+    # receipt_indekses.price to cena za całą pozycję (cena * ilość)
+    return price / quantity if quantity else price
+
+
+price_index = PriceIndex()
+
+
+@on_receipt_saved
+def update_price_index(event: Dict[str, Any]) -> None:
+    date = event["date"] or date_type.today().isoformat()
+    for item in event["items"]:
+        price_index.add(
+            item.get("product_id"),
+            event["shop_id"],
+            date,
+            unit_price(item["price"], item["quantity"]),
+            item["indeks"],
+            event["shop_name"],
+            item.get("connect_id")
+        )
+
+
+_refresh_lock = threading.Lock()
+_refreshing = False
+
+
+def rebuild_in_background(client, indexes: Optional[List[Any]] = None) -> Optional[threading.Thread]:
+    """
+    Odbudowa w tle - price_index i podane indeksy (np. historia cen) jednym skanem.
+    Gdy odbudowa już trwa, druga nie jest uruchamiana (zwraca None).
+    """
+    global _refreshing
+    with _refresh_lock:
+        if _refreshing:
+            return None
+        _refreshing = True
+    thread = threading.Thread(target=_refresh, args=(client, [price_index] + (indexes or [])), daemon=True)
+    thread.start()
+    return thread
+
+
+def refresh_if_stale(client, indexes: Optional[List[Any]] = None) -> bool:
+    """
+    Odbudowa w tle, gdy indeks nie był jeszcze zbudowany albo jest starszy niż
+    PRICE_INDEX_MAX_AGE. Do jej końca zapytania dostają dotychczasowe dane, a przed
+    pierwszą odbudową odpowiedzi mają ready=False.
+    """
+    if price_index.built_at and time.monotonic() - price_index.built_at < PRICE_INDEX_MAX_AGE:
+        return False
+    return rebuild_in_background(client, indexes) is not None
+
+
+def _refresh(client, indexes: List[Any]) -> None:
+    global _refreshing
+    try:
+        rebuild_indexes(client, indexes)
+    finally:
+        _refreshing = False
@@ -0,0 +1,194 @@
+import heapq
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+# Minimalne podobieństwo (1 - odległość Levenshteina / długość), przy którym nazwa
+# z OCR jest uznawana za istniejący produkt
+PRODUCT_MATCH_THRESHOLD = float(os.getenv("PRODUCT_MATCH_THRESHOLD", "0.85"))
+
+# Ile najlepszych kandydatów z indeksu trigramów sprawdzamy odległością edycyjną
+_CANDIDATES = 5
+
+# Trigramy występujące w większej liczbie produktów nie niosą informacji (np. " PO")
+_MAX_POSTING = 5_000
+
+_NIEALFANUMERYCZNE_RE = re.compile(r"[^0-9A-Z]+")
+_ZNAKI_SPOZA_NFKD = str.maketrans({"Ł": "L", "ł": "l"})
+
+# Oznaczenia rozmiaru/klasy (np. jajka "M" i "L") - muszą się zgadzać dokładnie
+_GRADE_TOKENS = frozenset({"XS", "S", "M", "L", "XL", "XXL"})
+# Jednostka oddzielona od liczby spacją ("500 G") - sklejana, żeby "500 G" == "500G"
+_UNIT_RE = re.compile(r"(\d) (?=(?:KG|G|DAG|ML|L|SZT)\b)")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizuje nazwę produktu: wielkie litery, bez polskich znaków i interpunkcji
+    """
+    name = unicodedata.normalize("NFKD", name.translate(_ZNAKI_SPOZA_NFKD))
+    name = "".join(c for c in name if not unicodedata.combining(c)).upper()
+    return _NIEALFANUMERYCZNE_RE.sub(" ", name).strip()
+
+
+def attributes(normalized: str) -> Tuple[str, ...]:
+    """
+    Liczby, pojemności i oznaczenia klasy z nazwy ("MLEKO 3 2" -> ("2", "3")). Nazwy
+    różniące się nimi to różne produkty, nawet gdy są prawie identyczne. Słowa z cyfrą
+    w środku ("MLEK0" z OCR) nie są liczbami.
+    """
+    return tuple(sorted(
+        token for token in _UNIT_RE.sub(r"\1", normalized).split()
+        if token in _GRADE_TOKENS or token[0].isdigit()
+    ))
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def levenshtein(a: str, b: str, max_distance: int) -> int:
+    """
+    Odległość Levenshteina liczona tylko w pasie szerokości max_distance wokół przekątnej.
+    Wynik większy niż max_distance oznacza "za daleko".
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) < len(b):
+        a, b = b, a
+    too_far = max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= max_distance else too_far
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return too_far
+        previous = current
+    return min(previous[-1], too_far)
+
+
+class ProductIndex:
+    """
+    Indeks nazw produktów w pamięci: odwrócony indeks trigramów wybiera kandydatów,
+    a odległość Levenshteina decyduje o dopasowaniu. Kandydat musi mieć dokładnie te same
+    liczby, pojemności i oznaczenia klasy co szukana nazwa (attributes).
+    """
+
+    def __init__(self, threshold: float = PRODUCT_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.loaded = False
+        self._exact: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._attributes: Dict[int, Tuple[str, ...]] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, product_id: int, name: str) -> None:
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        with self._lock:
+            if product_id in self._names:
+                return
+            self._names[product_id] = normalized
+            self._attributes[product_id] = attributes(normalized)
+            self._exact.setdefault(normalized, product_id)
+            for trigram in trigrams(normalized):
+                self._postings.setdefault(trigram, []).append(product_id)
+
+    def match(self, name: str) -> Optional[Tuple[int, float]]:
+        """
+        Zwraca (product_id, podobieństwo) najbliższego produktu albo None poniżej progu
+        """
+        normalized = normalize_name(name)
+        if not normalized:
+            return None
+
+        product_id = self._exact.get(normalized)
+        if product_id is not None:
+            return product_id, 1.0
+
+        # Filtrowanie prefiksowe: każda edycja psuje najwyżej 3 trigramy, więc produkt
+        # powyżej progu musi mieć co najmniej jeden z (3 * edycje + 1) najrzadszych trigramów
+        max_edits = int((1.0 - self.threshold) * len(normalized) / self.threshold)
+        postings = sorted(
+            (self._postings.get(trigram, []) for trigram in trigrams(normalized)),
+            key=len
+        )
+        shared: Counter = Counter()
+        for posting in postings[:3 * max_edits + 1]:
+            if len(posting) <= _MAX_POSTING:
+                shared.update(posting)
+
+        # "MLEKO 3%" i "MLEKO 2%" dzieli jedna edycja - liczby porównujemy przed odległością
+        wanted = attributes(normalized)
+        candidates = heapq.nlargest(
+            _CANDIDATES,
+            (candidate_id for candidate_id in shared if self._attributes[candidate_id] == wanted),
+            key=shared.__getitem__
+        )
+
+        best = None
+        for candidate_id in candidates:
+            candidate = self._names[candidate_id]
+            longest = max(len(normalized), len(candidate))
+            allowed = int((1.0 - self.threshold) * longest)
+            distance = levenshtein(normalized, candidate, allowed)
+            if distance > allowed:
+                continue
+            score = 1.0 - distance / longest
+            if best is None or score > best[1]:
+                best = (candidate_id, score)
+        return best
+
+
+product_index = ProductIndex()
+_load_lock = threading.Lock()
+
+
+def load_product_index(client, page_size: int = 1000) -> ProductIndex:
+    """
+    Wczytuje wszystkie produkty do indeksu przy pierwszym użyciu (stronicowanie po id)
+    """
+    if product_index.loaded:
+        return product_index
+
+    with _load_lock:
+        if product_index.loaded:
+            return product_index
+
+        last_id = None
+        while True:
+            query = client.table("product").select("id, name").order("id").limit(page_size)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            rows = query.execute().data or []
+            for row in rows:
+                product_index.add(row["id"], row["name"])
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]["id"]
+
+        product_index.loaded = True
+
+    return product_index
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from services.cache import TTLCache
+from services.product_index import normalize_name
+from services.receipt_events import on_receipt_saved
+
+# odcisk treści paragonu -> zapisany paragon {"id", "creator_id", "date", "sum_price"}
+fingerprint_cache = TTLCache("receipt_fingerprints", maxsize=200_000, ttl=7 * 24 * 3600)
+
+# (Firebase UID, Idempotency-Key) -> wynik pierwszego zapisu
+idempotency_cache = TTLCache("idempotency_keys", maxsize=50_000, ttl=24 * 3600)
+
+# Blokady paskowe - równoległe zapisy z tym samym kluczem lub odciskiem czekają na siebie.
+# Zapis z Idempotency-Key trzyma blokadę klucza, a w środku bierze blokadę odcisku, więc
+# każdy rodzaj ma osobną pulę (wspólna pula = zakleszczenie, gdy oba trafią w ten sam pasek).
+_fingerprint_locks = [threading.Lock() for _ in range(64)]
+_idempotency_locks = [threading.Lock() for _ in range(64)]
+
+
+def key_lock(fingerprint: str) -> threading.Lock:
+    return _fingerprint_locks[hash(fingerprint) % len(_fingerprint_locks)]
+
+
+@contextmanager
+def key_locks(fingerprints: List[str]):
+    """
+    Blokady odcisków całej paczki. Każdy pasek brany raz i zawsze w tej samej kolejności,
+    więc dwie równoległe paczki (ani paczka i pojedynczy zapis) się nie zakleszczą.
+    """
+    stripes = sorted({hash(fingerprint) % len(_fingerprint_locks) for fingerprint in fingerprints})
+    with ExitStack() as stack:
+        for stripe in stripes:
+            stack.enter_context(_fingerprint_locks[stripe])
+        yield
+
+
+def idempotency_lock(key: Any) -> threading.Lock:
+    return _idempotency_locks[hash(key) % len(_idempotency_locks)]
+
+
+def receipt_fingerprint(
+    user_id: int,
+    shop_id: Optional[int],
+    date: Optional[str],
+    total: Optional[float],
+    items: List[Dict[str, Any]]
+) -> str:
+    """
+    Odcisk treści paragonu: użytkownik, sklep, data, suma i pozycje (bez kolejności,
+    nazwy znormalizowane jak w indeksie produktów)
+    """
+    # liczby w stałym formacie - baza może zwrócić 5 zamiast 5.0
+    lines = sorted(
+        f"{normalize_name(item['indeks'])}:{float(item['price'] or 0.0):.2f}:{float(item['quantity']):g}"
+        for item in items
+    )
+    raw = "|".join([str(user_id), str(shop_id), (date or "")[:10], f"{float(total or 0.0):.2f}", *lines])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def find_duplicate(fingerprint: str) -> Optional[Dict[str, Any]]:
+    return fingerprint_cache.get(fingerprint)
+
+
+def remember_receipt(fingerprint: str, receipt_row: Dict[str, Any]) -> None:
+    fingerprint_cache.set(fingerprint, {
+        "id": receipt_row["id"],
+        "creator_id": receipt_row["creator_id"],
+        "date": receipt_row["date"],
+        "sum_price": receipt_row["sum_price"]
+    })
+
+
+@on_receipt_saved
+def remember_saved_receipt(event: Dict[str, Any]) -> None:
+    fingerprint = receipt_fingerprint(
+        event["user_id"], event["shop_id"], event["date"], event["sum_price"], event["items"]
+    )
+    remember_receipt(fingerprint, {
+        "id": event["receipt_id"],
+        "creator_id": event["user_id"],
+        "date": event["date"],
+        "sum_price": event["sum_price"]
+    })
+
+
+def idempotent(firebase_uid: str, idempotency_key: Optional[str], save: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Wykonuje zapis raz dla danego Idempotency-Key - powtórzenie zwraca wynik pierwszego
+    udanego zapisu. Bez klucza zapis jest wykonywany zawsze.
+    """
+    if not idempotency_key:
+        return save()
+
+    key = (firebase_uid, idempotency_key)
+    with idempotency_lock(key):
+        result = idempotency_cache.get(key)
+        if result is not None:
+            return result
+        result = save()
+        if result["success"]:
+            idempotency_cache.set(key, result)
+        return result
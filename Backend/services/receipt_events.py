@@ -0,0 +1,39 @@
+from typing import Any, Callable, Dict, List
+
+# Zdarzenie "paragon zapisany":
+# {"user_id", "receipt_id", "date", "shop_id", "shop_name", "sum_price",
+#  "items": [{"indeks", "price", "quantity", "product_id"}]}
+ReceiptSavedListener = Callable[[Dict[str, Any]], None]
+
+_listeners: List[ReceiptSavedListener] = []
+
+
+def on_receipt_saved(listener: ReceiptSavedListener) -> ReceiptSavedListener:
+    """
+    Rejestruje funkcję wywoływaną po każdym zapisanym paragonie (można użyć jako dekorator)
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def publish_receipt_saved(event: Dict[str, Any]) -> None:
+    """
+    Powiadamia wszystkich słuchaczy. Błąd słuchacza nie przerywa zapisu paragonu.
+    """
+    for listener in _listeners:
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"Ostrzeżenie: {listener.__name__}: {e}")
+
+
+def receipt_saved_event(receipt_row: Dict[str, Any], shop_id: int, shop_name: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "user_id": receipt_row["creator_id"],
+        "receipt_id": receipt_row["id"],
+        "date": receipt_row["date"],
+        "shop_id": shop_id,
+        "shop_name": shop_name,
+        "sum_price": receipt_row["sum_price"],
+        "items": items
+    }
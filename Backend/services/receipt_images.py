@@ -0,0 +1,309 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, Optional
+
+try:
+    import numpy as np
+    from PIL import Image, ImageOps
+except ImportError:  # bez Pillow/numpy zdjęcie jest tylko zapisywane, bez przetwarzania
+    np = None
+    Image = None
+
+# Katalog zdjęć paragonów - pliki są nazwane skrótem SHA-256 treści
+RECEIPT_IMAGES_DIR = os.getenv(
+    "RECEIPT_IMAGES_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "receipt_images")
+)
+
+# Maksymalny rozmiar przesyłanego zdjęcia
+RECEIPT_IMAGE_MAX_BYTES = int(os.getenv("RECEIPT_IMAGE_MAX_BYTES", str(15 * 1024 * 1024)))
+
+# Liczba procesów przetwarzających zdjęcia
+RECEIPT_IMAGE_WORKERS = int(os.getenv("RECEIPT_IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+THUMBNAIL_SIZE = (320, 320)
+
+# Zakres (w stopniach) i krok szukania kąta prostowania
+_DESKEW_MAX_ANGLE = 5.0
+_DESKEW_STEP = 0.5
+# Prostowanie liczymy na pomniejszonym obrazie
+_DESKEW_WIDTH = 600
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+VARIANTS = {
+    "original": "original",
+    "processed": "processed.png",
+    "thumbnail": "thumbnail.webp",
+}
+
+
+def is_digest(value: str) -> bool:
+    return bool(_DIGEST_RE.fullmatch(value))
+
+
+def image_dir(digest: str) -> str:
+    return os.path.join(RECEIPT_IMAGES_DIR, digest[:2], digest)
+
+
+def has_original(pic_path: Optional[str]) -> bool:
+    """
+    Czy pic_path wskazuje zapisane zdjęcie (picPath paragonu musi pochodzić z /receipt/image)
+    """
+    return bool(pic_path) and is_digest(pic_path) and os.path.exists(os.path.join(image_dir(pic_path), VARIANTS["original"]))
+
+
+def original_media_type(digest: str) -> Optional[str]:
+    """
+    Content-Type, z którym przesłano oryginał (meta.json), albo None dla starszych zdjęć
+    """
+    try:
+        with open(os.path.join(image_dir(digest), "meta.json"), encoding="utf-8") as meta_file:
+            return json.load(meta_file).get("content_type")
+    except (OSError, ValueError):
+        return None
+
+
+def variant_path(digest: str, variant: str) -> Optional[str]:
+    """
+    Ścieżka do pliku danego wariantu zdjęcia albo None, gdy nie istnieje
+    """
+    path = os.path.join(image_dir(digest), VARIANTS[variant])
+    return path if os.path.exists(path) else None
+
+
+# --- przetwarzanie (w procesach roboczych) ---
+
+def otsu_threshold(gray: "np.ndarray") -> int:
+    """
+    Próg binaryzacji Otsu - maksymalizuje wariancję międzyklasową histogramu jasności
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    weight = hist.cumsum()
+    mass = (hist * np.arange(256)).cumsum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_dark = mass / weight
+        mean_light = (mass[-1] - mass) / (total - weight)
+        between = weight * (total - weight) * (mean_dark - mean_light) ** 2
+    return int(np.nanargmax(between))
+
+
+def skew_angle(gray: "Image.Image") -> float:
+    """
+    Kąt, o który trzeba obrócić zdjęcie, żeby wiersze tekstu były poziome - ten, przy którym
+    profil rzutu poziomego (liczba ciemnych pikseli w wierszach) jest najbardziej "schodkowy"
+    """
+    if gray.width > _DESKEW_WIDTH:
+        gray = gray.resize((_DESKEW_WIDTH, max(1, gray.height * _DESKEW_WIDTH // gray.width)))
+    pixels = np.asarray(gray)
+    ink = Image.fromarray(((pixels < otsu_threshold(pixels)) * 255).astype(np.uint8))
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-_DESKEW_MAX_ANGLE, _DESKEW_MAX_ANGLE + _DESKEW_STEP / 2, _DESKEW_STEP):
+        profile = np.asarray(ink.rotate(float(angle), expand=True), dtype=np.float64).sum(axis=1)
+        score = float(np.square(np.diff(profile)).sum())
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def process_image(source: str, target_dir: str) -> Dict[str, Any]:
+    """
+    Obrót wg EXIF, skala szarości, wyprostowanie i binaryzacja (processed.png) oraz
+    miniatura WebP. Uruchamiane w procesie roboczym.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    thumbnail = image.convert("RGB")
+    thumbnail.thumbnail(THUMBNAIL_SIZE)
+    _save_atomic(thumbnail, os.path.join(target_dir, VARIANTS["thumbnail"]), "WEBP", quality=70)
+
+    gray = ImageOps.grayscale(image)
+    angle = skew_angle(gray)
+    if angle:
+        gray = gray.rotate(angle, expand=True, fillcolor=255, resample=Image.BICUBIC)
+    pixels = np.asarray(gray)
+    binary = Image.fromarray(pixels >= otsu_threshold(pixels))
+    _save_atomic(binary, os.path.join(target_dir, VARIANTS["processed"]), "PNG", optimize=True)
+
+    return {"width": binary.width, "height": binary.height, "angle": angle, "processed": True}
+
+
+def _save_atomic(image: "Image.Image", path: str, image_format: str, **options) -> None:
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    image.save(temp_path, image_format, **options)
+    os.replace(temp_path, path)
+
+
+# --- zapis ---
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# skrót -> przetwarzanie w toku (równoległe przesłanie tego samego zdjęcia czeka na nie)
+_in_flight: Dict[str, "asyncio.Future"] = {}
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn - procesy robocze nie dziedziczą wątków i połączeń serwera
+                _executor = ProcessPoolExecutor(
+                    max_workers=RECEIPT_IMAGE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    """
+    Pula po nagłym końcu procesu roboczego (np. OOM killer) odrzuca wszystkie kolejne
+    zadania - porzucamy ją, a get_executor utworzy nową
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def store_image(chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Zapisuje przesyłane zdjęcie kawałkami (bez trzymania całego pliku w pamięci) pod skrótem
+    treści i przetwarza je w puli procesów. Ponowne przesłanie tego samego zdjęcia zwraca
+    zapisany wynik bez przetwarzania. ValueError dla pustego lub za dużego pliku.
+    Operacje na plikach idą przez pulę wątków, żeby nie blokować pętli zdarzeń.
+    """
+    await asyncio.to_thread(os.makedirs, RECEIPT_IMAGES_DIR, exist_ok=True)
+    temp_path = os.path.join(RECEIPT_IMAGES_DIR, f"upload-{uuid.uuid4().hex}.tmp")
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        temp_file = await asyncio.to_thread(open, temp_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > RECEIPT_IMAGE_MAX_BYTES:
+                    raise ImageTooLarge(f"Zdjęcie większe niż {RECEIPT_IMAGE_MAX_BYTES} bajtów")
+                sha256.update(chunk)
+                await asyncio.to_thread(temp_file.write, chunk)
+        finally:
+            await asyncio.to_thread(temp_file.close)
+        if not size:
+            raise ValueError("Puste zdjęcie")
+
+        digest = sha256.hexdigest()
+        target_dir = image_dir(digest)
+        original = os.path.join(target_dir, VARIANTS["original"])
+        duplicate = await asyncio.to_thread(_move_original, temp_path, target_dir, original)
+    except BaseException:
+        await asyncio.to_thread(_remove_if_exists, temp_path)
+        raise
+
+    info = await _processed(digest, original, target_dir, content_type)
+    return {"pic_path": digest, "size": size, "duplicate": duplicate, **info}
+
+
+def _move_original(temp_path: str, target_dir: str, original: str) -> bool:
+    """
+    Przenosi przesłany plik na miejsce oryginału; True, gdy to zdjęcie już było zapisane
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    if os.path.exists(original):
+        os.remove(temp_path)
+        return True
+    os.replace(temp_path, original)
+    return False
+
+
+def _remove_if_exists(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _read_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as meta_file:
+        return json.load(meta_file)
+
+
+def _write_meta(meta_path: str, info: Dict[str, Any]) -> None:
+    with open(meta_path, "w", encoding="utf-8") as meta_file:
+        json.dump(info, meta_file)
+
+
+async def _processed(digest: str, original: str, target_dir: str, content_type: Optional[str]) -> Dict[str, Any]:
+    meta_path = os.path.join(target_dir, "meta.json")
+    meta = await asyncio.to_thread(_read_meta, meta_path)
+    if meta is not None:
+        return meta
+
+    if Image is None:
+        info = {"processed": False, "content_type": content_type}
+        await asyncio.to_thread(_write_meta, meta_path, info)
+        return info
+
+    pending = _in_flight.get(digest)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except Exception:
+            return {"processed": False, "content_type": content_type}
+
+    future = asyncio.ensure_future(_process(original, target_dir))
+    _in_flight[digest] = future
+    try:
+        info = await future
+    except BrokenProcessPool as e:
+        # także nowa pula nie dała rady - bez meta.json, kolejne przesłanie spróbuje znowu
+        print(f"Nie udało się przetworzyć zdjęcia {digest}: {e}")
+        return {"processed": False, "content_type": content_type}
+    except Exception as e:
+        # uszkodzony plik albo nie-obraz - zostaje oryginał, bez wariantów
+        print(f"Nie udało się przetworzyć zdjęcia {digest}: {e}")
+        info = {"processed": False}
+    finally:
+        _in_flight.pop(digest, None)
+
+    info["content_type"] = content_type
+    await asyncio.to_thread(_write_meta, meta_path, info)
+    return info
+
+
+async def _process(original: str, target_dir: str) -> Dict[str, Any]:
+    """
+    process_image w puli procesów; po zepsuciu puli jedna próba na nowej
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    try:
+        return await loop.run_in_executor(executor, process_image, original, target_dir)
+    except BrokenProcessPool:
+        _reset_executor(executor)
+    return await loop.run_in_executor(get_executor(), process_image, original, target_dir)
@@ -1,17 +1,43 @@
+import os
 from services.db import supabase_client
 from models.receipt_model import Receipt, ReceiptItem
+from services.receipt_events import publish_receipt_saved, receipt_saved_event
+from services.receipt_images import has_original
+from services.job_queue import job_queue, job_handler
+from services.receipt_dedup import receipt_fingerprint, find_duplicate, remember_receipt, key_lock, key_locks
+from services.response_cache import response_cache_backend
 from services.paragon_service import (
     get_user_id_by_token, 
     get_existing_shop_parcel, 
-    get_or_create_product
+    insert_receipt_with_items,
+    save_receipts_items
 )
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+
+PIC_PATH_ERROR = "Nieznane zdjęcie paragonu - picPath musi pochodzić z /receipt/image"
+
+# inline - pozycje zapisywane w żądaniu, queue - żądanie zapisuje sam paragon,
+# a produkty i pozycje uzupełnia kolejka zadań w tle
+RECEIPT_SAVE_MODE = os.getenv("RECEIPT_SAVE_MODE", "inline")
+
+def receipt_items(receipt: Receipt) -> List[Dict[str, Any]]:
+    """
+    Items jako receipt_indekses - używamy całkowitej ceny za item (price * quantity)
+    """
+    return [
+        {"indeks": item.name, "price": item.price * item.quantity, "quantity": item.quantity}
+        for item in receipt.items
+        if item.quantity != 0
+    ]
 
 def save_receipt_to_db(receipt: Receipt) -> Dict[str, Any]:
     """
     Konwertuje Receipt na format bazy danych i zapisuje jako paragon
     """
     try:
+        if receipt.picPath and not has_original(receipt.picPath):
+            return {"success": False, "error": PIC_PATH_ERROR}
+
         # Pobierz ID użytkownika na podstawie userId (Firebase UID)
         user_result = get_user_id_by_token(receipt.userId)
         if not user_result["success"]:
@@ -32,56 +58,213 @@ def save_receipt_to_db(receipt: Receipt) -> Dict[str, Any]:
             "date": receipt.date,
             "shop_id": shop_parcel_id,
             "sum_price": receipt.total,
-            "pic_path": None  # Możesz rozszerzyć później
+            "pic_path": receipt.picPath
         }
         
-        # Zapisz paragon
-        receipt_result = supabase_client.table("receipts").insert(receipt_data).execute()
-        
-        if not receipt_result.data:
-            return {"success": False, "error": "Nie udało się zapisać paragonu"}
-        
-        receipt_id = receipt_result.data[0]["id"]
-        
-        # Zapisz items jako receipt_indekses
-        for item in receipt.items:
-            if item.quantity == 0:
-                continue 
-
-            # Pobierz lub utwórz produkt na podstawie nazwy
-            product_result = get_or_create_product(item.name)
-            if not product_result["success"]:
-                print(f"Ostrzeżenie: {product_result['error']}")
-                product_id = None
+        items = receipt_items(receipt)
+
+        # Ten sam paragon zeskanowany drugi raz - zwracamy zapisany wcześniej, bez zapytań do bazy
+        fingerprint = receipt_fingerprint(user_id, shop_id, receipt.date, receipt.total, items)
+        with key_lock(fingerprint):
+            duplicate = find_duplicate(fingerprint)
+            if duplicate is not None:
+                return {"success": True, "data": duplicate, "duplicate": True}
+
+            if RECEIPT_SAVE_MODE == "queue":
+                result = save_receipt_deferred(receipt_data, shop_id, items, receipt.storeName)
             else:
-                product_id = product_result["product_id"]
-            
-            # Zapisz indeks - używamy całkowitej ceny za item (price * quantity)
-            total_item_price = item.price * item.quantity
-            
-            indeks_data = {
-                "indeks": item.name,
-                "price": total_item_price,
-                "product_id": product_id,
-                "shop_id": shop_id  
-            }
-            
-            # Zapisz indeks
-            indeks_result = supabase_client.table("receipt_indekses").insert(indeks_data).execute()
-            
-            if indeks_result.data:
-                indeks_id = indeks_result.data[0]["id"]
-                
-                # Połącz paragon z indeksem
-                connect_data = {
-                    "receipt_id": receipt_id,
-                    "receipt_indeks_id": indeks_id,
-                    "quantity": item.quantity
-                }
-                
-                supabase_client.table("receipt_connect_indekses").insert(connect_data).execute()
-        
-        return {"success": True, "data": receipt_result.data[0]}
+                result = insert_receipt_with_items(receipt_data, shop_id, items, receipt.storeName)
+
+            if result["success"]:
+                remember_receipt(fingerprint, result["data"])
+            return result
             
     except Exception as e:
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+
+def save_receipt_deferred(
+    receipt_data: Dict[str, Any],
+    shop_id: int,
+    items: List[Dict[str, Any]],
+    shop_name: str
+) -> Dict[str, Any]:
+    """
+    Zapisuje sam paragon i zleca zapis pozycji kolejce zadań. Czas odpowiedzi nie zależy
+    od liczby pozycji; stan uzupełniania można sprawdzić po job_id.
+    """
+    receipt_result = supabase_client.table("receipts").insert(receipt_data).execute()
+
+    if not receipt_result.data:
+        return {"success": False, "error": "Nie udało się zapisać paragonu"}
+
+    receipt_row = receipt_result.data[0]
+    job_id = job_queue.enqueue("enrich_receipt", {
+        "receipt": receipt_row,
+        "shop_id": shop_id,
+        "shop_name": shop_name,
+        "items": items
+    })
+    return {"success": True, "data": receipt_row, "job_id": job_id}
+
+@job_handler("enrich_receipt")
+def enrich_receipts(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Uzupełnia paczkę paragonów: dopasowanie produktów, zapis pozycji i powiadomienie
+    słuchaczy (agregaty, indeks cen, cache odpowiedzi)
+    """
+    items_result = save_receipts_items([
+        (payload["receipt"]["id"], payload["shop_id"], payload["items"])
+        for payload in payloads
+    ])
+    if not items_result["success"]:
+        raise Exception(items_result["error"])
+
+    for payload in payloads:
+        publish_receipt_saved(receipt_saved_event(
+            payload["receipt"], payload["shop_id"], payload["shop_name"], payload["items"]
+        ))
+
+    return [
+        {"receipt_id": payload["receipt"]["id"], "items": len(payload["items"])}
+        for payload in payloads
+    ]
+
+def save_receipts_bulk(receipts: List[Tuple[int, Receipt]]) -> List[Dict[str, Any]]:
+    """
+    Zapisuje paczkę paragonów (indeks w żądaniu, Receipt). Użytkownicy i sklepy są
+    rozwiązywane raz na paczkę, a paragony i pozycje zapisywane zbiorczymi insertami.
+    Zwraca wynik dla każdego paragonu.
+    """
+    results = []
+    users: Dict[str, Dict[str, Any]] = {}
+    shops: Dict[str, Dict[str, Any]] = {}
+    candidates = []
+
+    for index, receipt in receipts:
+        if receipt.picPath and not has_original(receipt.picPath):
+            results.append({"index": index, "success": False, "error": PIC_PATH_ERROR})
+            continue
+
+        if receipt.userId not in users:
+            users[receipt.userId] = get_user_id_by_token(receipt.userId)
+        user_result = users[receipt.userId]
+        if not user_result["success"]:
+            results.append({"index": index, "success": False, "error": f"Błąd użytkownika: {user_result['error']}"})
+            continue
+
+        if receipt.storeName not in shops:
+            shops[receipt.storeName] = get_existing_shop_parcel(receipt.storeName, location=None)
+        shop_result = shops[receipt.storeName]
+        if not shop_result["success"]:
+            results.append({"index": index, "success": False, "error": f"Błąd sklepu: {shop_result['error']}"})
+            continue
+
+        fingerprint = receipt_fingerprint(
+            user_result["user_id"], shop_result["shop_id"], receipt.date, receipt.total, receipt_items(receipt)
+        )
+        receipt_data = {
+            "creator_id": user_result["user_id"],
+            "date": receipt.date,
+            "shop_id": shop_result["shop_parcel_id"],
+            "sum_price": receipt.total,
+            "pic_path": receipt.picPath
+        }
+        candidates.append((index, receipt, receipt_data, shop_result["shop_id"], fingerprint))
+
+    fingerprints: Dict[str, int] = {}
+    batch_duplicates: List[Tuple[int, int]] = []
+    to_insert = []
+
+    # jak w save_receipt_to_db: sprawdzenie duplikatu i zapis pod blokadą odcisku, żeby
+    # równoległy zapis tego samego paragonu nie przeszedł między nimi
+    with key_locks([candidate[4] for candidate in candidates]):
+        for index, receipt, receipt_data, shop_id, fingerprint in candidates:
+            duplicate = find_duplicate(fingerprint)
+            if duplicate is not None:
+                results.append({"index": index, "success": True, "receipt_id": duplicate["id"], "duplicate": True})
+                continue
+            if fingerprint in fingerprints:
+                # powtórzony w tej samej paczce - zapisujemy tylko pierwszy, a powtórzenie dostaje
+                # jego wynik (tak jak duplikat paragonu zapisanego wcześniej)
+                batch_duplicates.append((index, fingerprints[fingerprint]))
+                continue
+            fingerprints[fingerprint] = index
+            to_insert.append((index, receipt, receipt_data, shop_id))
+
+        if to_insert:
+            results.extend(_insert_receipts_bulk(to_insert))
+
+    saved = {result["index"]: result for result in results}
+    for index, first_index in batch_duplicates:
+        first = saved[first_index]
+        if first["success"]:
+            results.append({"index": index, "success": True, "receipt_id": first["receipt_id"], "duplicate": True})
+        else:
+            results.append({"index": index, "success": False, "error": first["error"]})
+
+    return results
+
+def _insert_receipts_bulk(to_insert: List[Tuple[int, Receipt, Dict[str, Any], int]]) -> List[Dict[str, Any]]:
+    """
+    Zapisuje paragony paczki zbiorczymi insertami i zwraca wynik dla każdego z nich
+    """
+    results = []
+    try:
+        receipt_result = supabase_client.table("receipts")\
+            .insert([receipt_data for _, _, receipt_data, _ in to_insert])\
+            .execute()
+
+        if not receipt_result.data:
+            raise Exception("Nie udało się zapisać paragonów")
+
+        saved = [
+            (receipt_row, index, receipt, shop_id, receipt_items(receipt))
+            for receipt_row, (index, receipt, _, shop_id) in zip(receipt_result.data, to_insert)
+        ]
+
+        items_result = save_receipts_items([
+            (receipt_row["id"], shop_id, items)
+            for receipt_row, _, _, shop_id, items in saved
+        ])
+        if not items_result["success"]:
+            # save_receipts_items usunął już swoje indeksy - bez pozycji paragony byłyby
+            # puste, więc je też usuwamy, a klient może wysłać paczkę ponownie
+            supabase_client.table("receipts")\
+                .delete()\
+                .in_("id", [receipt_row["id"] for receipt_row, _, _, _, _ in saved])\
+                .execute()
+            raise Exception(items_result["error"])
+
+        for receipt_row, index, receipt, shop_id, items in saved:
+            publish_receipt_saved(receipt_saved_event(receipt_row, shop_id, receipt.storeName, items))
+            results.append({"index": index, "success": True, "receipt_id": receipt_row["id"]})
+
+    except Exception as e:
+        for index, _, _, _ in to_insert:
+            results.append({"index": index, "success": False, "error": str(e)})
+
+    return results
+
+def link_receipt_image(firebase_uid: str, receipt_id: int, pic_path: str) -> Dict[str, Any]:
+    """
+    Przypisuje zapisane zdjęcie do paragonu użytkownika
+    """
+    try:
+        user_result = get_user_id_by_token(firebase_uid)
+        if not user_result["success"]:
+            return {"success": False, "error": f"Błąd użytkownika: {user_result['error']}"}
+
+        result = supabase_client.table("receipts")\
+            .update({"pic_path": pic_path})\
+            .eq("id", receipt_id)\
+            .eq("creator_id", user_result["user_id"])\
+            .execute()
+
+        if not result.data:
+            return {"success": False, "error": "Nie znaleziono paragonu"}
+
+        response_cache_backend.bump_version(user_result["user_id"])
+        return {"success": True, "data": result.data[0]}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
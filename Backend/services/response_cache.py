@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from services.async_paragon_service import get_user_id_by_token_async
+from services.receipt_events import on_receipt_saved
+from services.serialization import dumps_json
+from services.single_flight import responses
+
+# memory (domyślnie) albo redis
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# W pamięci procesu podbicie wersji nie dociera do innych procesów API - przy kilku
+# procesach odpowiedź może być nieaktualna najwyżej tyle sekund (wtedy lepiej redis)
+RESPONSE_CACHE_MEMORY_TTL = int(os.getenv("RESPONSE_CACHE_MEMORY_TTL", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class InProcessBackend:
+    """
+    Wersje użytkowników i odpowiedzi w pamięci procesu, odpowiedzi w LRU z limitem bajtów.
+    Wersja zawiera numer okna czasowego długości ttl, więc ETag i zapisana odpowiedź
+    wygasają po ttl także wtedy, gdy zapis paragonu obsłużył inny proces.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttl: int = RESPONSE_CACHE_MEMORY_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        # Po restarcie liczniki startują od zera - epoka odróżnia je od wersji sprzed restartu
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions: Dict[Any, int] = {}
+        # klucz -> (odpowiedź, czas wygaśnięcia wg time.monotonic)
+        self._bodies: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_version(self, user_id: Any) -> str:
+        window = int(time.time() // self.ttl) if self.ttl > 0 else 0
+        with self._lock:
+            return f"{self._epoch}:{window}:{self._versions.get(user_id, 0)}"
+
+    def bump_version(self, user_id: Any) -> None:
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._bodies.get(key)
+            if entry is None:
+                return None
+            body, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._bodies[key]
+                self.size -= len(body)
+                return None
+            self._bodies.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._bodies.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self._bodies[key] = (body, time.monotonic() + self.ttl)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._bodies.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class RedisBackend:
+    """
+    Wersje i odpowiedzi w Redisie - wspólne dla wszystkich procesów API.
+    Przyjmuje dowolnego klienta zgodnego z redis.Redis (np. fakeredis).
+    """
+
+    def __init__(self, client, ttl: int = RESPONSE_CACHE_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def get_version(self, user_id: Any) -> str:
+        """
+        Wersja to losowy identyfikator, a nie licznik - po FLUSHALL albo wyrzuceniu klucza
+        dostajemy nową wartość zamiast powrotu do 0 i ETagów sprzed czyszczenia
+        """
+        key = f"response_cache:version:{user_id}"
+        version = self.client.get(key)
+        if version is None:
+            self.client.set(key, uuid.uuid4().hex, nx=True)
+            version = self.client.get(key)
+        return version.decode() if isinstance(version, bytes) else str(version)
+
+    def bump_version(self, user_id: Any) -> None:
+        self.client.set(f"response_cache:version:{user_id}", uuid.uuid4().hex)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(f"response_cache:body:{key}")
+
+    def set(self, key: str, body: bytes) -> None:
+        self.client.set(f"response_cache:body:{key}", body, ex=self.ttl)
+
+
+def _create_backend():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        import redis
+        return RedisBackend(redis.Redis.from_url(REDIS_URL))
+    return InProcessBackend()
+
+
+response_cache_backend = _create_backend()
+
+
+@on_receipt_saved
+def bump_user_version(event: Dict[str, Any]) -> None:
+    response_cache_backend.bump_version(event["user_id"])
+
+
+def make_etag(version: str, request: Request) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{version}|{request.url.path}|{query}".encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+async def cached_json_response(
+    request: Request,
+    firebase_uid: str,
+    compute: Callable[[], Awaitable[Any]]
+) -> Response:
+    """
+    Odpowiedź JSON z ETagiem zależnym od wersji danych użytkownika i parametrów zapytania.
+    If-None-Match z aktualnym ETagiem daje 304 bez zapytań do bazy; wersja rośnie przy
+    każdym zapisie paragonu użytkownika.
+    """
+    user_result = await get_user_id_by_token_async(firebase_uid)
+    if not user_result["success"]:
+        return _json_response(await compute())
+
+    etag = make_etag(response_cache_backend.get_version(user_result["user_id"]), request)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache_backend.get(etag)
+    if body is None:
+        # Równoczesne identyczne żądania (ten sam ETag) liczą odpowiedź raz
+        body = await responses.do_async(etag, lambda: _compute_body(etag, compute))
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _compute_body(etag: str, compute: Callable[[], Awaitable[Any]]) -> bytes:
+    body = dumps_json(await compute())
+    response_cache_backend.set(etag, body)
+    return body
+
+
+def _json_response(content: Any) -> Response:
+    return Response(content=dumps_json(content), media_type="application/json")
@@ -0,0 +1,49 @@
+import dataclasses
+import json
+import os
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson jest opcjonalny - bez niego używamy json ze standardowej biblioteki
+    orjson = None
+
+# Odpowiedzi mniejsze niż ten rozmiar nie są kompresowane
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+
+def _default(obj: Any) -> Any:
+    if dataclasses.is_dataclass(obj):
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Nie można zserializować {type(obj).__name__}")
+
+
+def dumps_json(content: Any) -> bytes:
+    """
+    Serializuje odpowiedź do JSON (orjson, jeśli jest zainstalowany). Dataclassy z models.rows
+    są serializowane bezpośrednio, a inne typy przechodzą przez jsonable_encoder.
+    """
+    try:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, default=_default, ensure_ascii=False).encode()
+    except TypeError:
+        content = jsonable_encoder(content)
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Domyślna klasa odpowiedzi aplikacji - szybsza serializacja przez dumps_json
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
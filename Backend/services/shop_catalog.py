@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+from services.product_index import normalize_name, trigrams
+
+# Co ile sekund najwyżej wczytujemy sklepy od nowa, gdy nazwa nie została znaleziona
+SHOP_CATALOG_REFRESH_INTERVAL = float(os.getenv("SHOP_CATALOG_REFRESH_INTERVAL", "30"))
+
+# Minimalne podobieństwo trigramów (Jaccard) dla podpowiedzi z literówką
+_FUZZY_THRESHOLD = 0.3
+
+
+class _TrieNode:
+    __slots__ = ("children", "shop_ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.shop_ids: Set[int] = set()
+
+
+class ShopCatalog:
+    """
+    Sklepy i ich lokalizacje w pamięci. Nazwy są znormalizowane (bez wielkości liter
+    i polskich znaków); drzewo prefiksowe obsługuje podpowiedzi, a indeks trigramów
+    podpowiedzi z literówkami.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._names: Dict[int, str] = {}
+        self._normalized: Dict[int, str] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        # shop_id -> [(shop_parcel_id, location)]
+        self._parcels: Dict[int, List[tuple]] = {}
+        self._trie = _TrieNode()
+        self._postings: Dict[str, Set[int]] = {}
+        self._trigram_counts: Dict[int, int] = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def add_shop(self, shop_id: int, name: str) -> None:
+        normalized = normalize_name(name)
+        with self._lock:
+            if shop_id in self._names:
+                return
+            self._names[shop_id] = name
+            self._normalized[shop_id] = normalized
+            self._by_name.setdefault(normalized, []).append(shop_id)
+            self._parcels.setdefault(shop_id, [])
+
+            # Podpowiedzi od początku nazwy i od początku każdego słowa ("lew" -> "Lewiatan")
+            words = normalized.split()
+            for i in range(len(words)):
+                node = self._trie
+                for char in " ".join(words[i:]):
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.shop_ids.add(shop_id)
+
+            name_trigrams = trigrams(normalized)
+            self._trigram_counts[shop_id] = len(name_trigrams)
+            for trigram in name_trigrams:
+                self._postings.setdefault(trigram, set()).add(shop_id)
+
+    def add_parcel(self, parcel_id: int, shop_id: int, location: Optional[str]) -> None:
+        with self._lock:
+            parcels = self._parcels.setdefault(shop_id, [])
+            if all(existing_id != parcel_id for existing_id, _ in parcels):
+                parcels.append((parcel_id, location))
+                parcels.sort()
+
+    def resolve(self, shop_name: str, location: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        {"shop_parcel_id", "shop_id"} dla nazwy sklepu (i opcjonalnie lokalizacji) albo None.
+        Brak lokalizacji daje shop_id z pustym shop_parcel_id.
+        """
+        with self._lock:
+            for shop_id in self._by_name.get(normalize_name(shop_name), []):
+                parcels = self._parcels.get(shop_id, [])
+                if location:
+                    parcels = [parcel for parcel in parcels if parcel[1] == location]
+                return {"shop_parcel_id": parcels[0][0] if parcels else None, "shop_id": shop_id}
+        return None
+
+    def parcel_ids_matching(self, fragment: str) -> List[int]:
+        """
+        ID lokalizacji sklepów, których nazwa zawiera fragment (odpowiednik ilike '%fragment%')
+        """
+        needle = normalize_name(fragment)
+        with self._lock:
+            return [
+                parcel_id
+                for shop_id, normalized in self._normalized.items()
+                if needle in normalized
+                for parcel_id, _ in self._parcels.get(shop_id, [])
+            ]
+
+    def name(self, shop_id: int) -> Optional[str]:
+        with self._lock:
+            return self._names.get(shop_id)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._names.values())
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Podpowiedzi sklepów: najpierw dopasowania prefiksu, potem podobne nazwy (literówki)
+        """
+        needle = normalize_name(query)
+        if not needle:
+            return []
+
+        with self._lock:
+            node = self._trie
+            for char in needle:
+                node = node.children.get(char)
+                if node is None:
+                    break
+            prefix_ids = sorted(
+                node.shop_ids if node is not None else (),
+                key=lambda shop_id: (not self._normalized[shop_id].startswith(needle), len(self._normalized[shop_id]))
+            )
+
+            fuzzy_ids: List[int] = []
+            if len(prefix_ids) < limit:
+                query_trigrams = trigrams(needle)
+                shared: Counter = Counter()
+                for trigram in query_trigrams:
+                    shared.update(self._postings.get(trigram, ()))
+                already = set(prefix_ids)
+                scored = []
+                for shop_id, count in shared.items():
+                    if shop_id in already:
+                        continue
+                    score = count / (len(query_trigrams) + self._trigram_counts[shop_id] - count)
+                    if score >= _FUZZY_THRESHOLD:
+                        scored.append((score, shop_id))
+                fuzzy_ids = [shop_id for _, shop_id in sorted(scored, reverse=True)]
+
+            return [
+                {
+                    "id": shop_id,
+                    "name": self._names[shop_id],
+                    "locations": [location for _, location in self._parcels.get(shop_id, []) if location]
+                }
+                for shop_id in (prefix_ids + fuzzy_ids)[:limit]
+            ]
+
+    def refresh(self, client, page_size: int = 1000) -> None:
+        """
+        Wczytuje wszystkie sklepy i lokalizacje od nowa (stronicowanie po id) i podmienia katalog.
+        Pełne wczytanie, a nie tylko id większe od ostatniego - inaczej zmiana nazwy
+        albo lokalizacji sklepu nigdy nie trafiłaby do katalogu.
+        """
+        self._last_refresh = time.monotonic()
+        fresh = ShopCatalog()
+        for table, columns, add in (
+            ("shops", "id, name", lambda row: fresh.add_shop(row["id"], row["name"])),
+            ("shops_parcels", "id, shops_id, location", lambda row: fresh.add_parcel(row["id"], row["shops_id"], row["location"])),
+        ):
+            last_id = 0
+            while True:
+                rows = client.table(table)\
+                    .select(columns)\
+                    .gt("id", last_id)\
+                    .order("id")\
+                    .limit(page_size)\
+                    .execute().data or []
+                for row in rows:
+                    add(row)
+                if len(rows) < page_size:
+                    break
+                last_id = rows[-1]["id"]
+
+        with self._lock:
+            self._names = fresh._names
+            self._normalized = fresh._normalized
+            self._by_name = fresh._by_name
+            self._parcels = fresh._parcels
+            self._trie = fresh._trie
+            self._postings = fresh._postings
+            self._trigram_counts = fresh._trigram_counts
+
+    def refresh_if_stale(self, client) -> bool:
+        if time.monotonic() - self._last_refresh < SHOP_CATALOG_REFRESH_INTERVAL:
+            return False
+        self.refresh(client)
+        return True
+
+
+shop_catalog = ShopCatalog()
+_load_lock = threading.Lock()
+
+
+def load_shop_catalog(client) -> ShopCatalog:
+    """
+    Wczytuje wszystkie sklepy i lokalizacje przy pierwszym użyciu
+    """
+    if shop_catalog.loaded:
+        return shop_catalog
+
+    with _load_lock:
+        if not shop_catalog.loaded:
+            shop_catalog.refresh(client)
+            shop_catalog.loaded = True
+
+    return shop_catalog
+
+
+def load_in_background(client) -> threading.Thread:
+    thread = threading.Thread(target=load_shop_catalog, args=(client,), daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from services.metrics import single_flight_calls
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Łączenie równoczesnych identycznych wywołań: pierwsze wywołanie z danym kluczem wykonuje
+    funkcję, a kolejne, które przyjdą przed jego końcem, czekają i dostają ten sam wynik
+    (albo ten sam wyjątek). Nic nie jest zapamiętywane po zakończeniu wywołania.
+    Wynik jest wspólny dla wszystkich czekających - nie należy go modyfikować.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Wersja dla kodu synchronicznego (handlery w puli wątków)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            single_flight_calls.inc((self.name, "coalesced"))
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        single_flight_calls.inc((self.name, "leader"))
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Wersja dla korutyn - czekający nie blokują pętli zdarzeń. Funkcja działa we własnym
+        zadaniu, więc anulowanie wywołującego (także pierwszego) nie przerywa jej pozostałym.
+        """
+        loop = asyncio.get_running_loop()
+        # zadania są związane z pętlą zdarzeń - klucz obejmuje pętlę
+        key = (id(loop), key)
+        task = self._tasks.get(key)
+        if task is None:
+            single_flight_calls.inc((self.name, "leader"))
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            single_flight_calls.inc((self.name, "coalesced"))
+        # shield - anulowanie jednego czekającego nie anuluje zadania pozostałym
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Future") -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # wyjątek odebrany - bez ostrzeżenia, gdy wszyscy czekający zostali anulowani
+        if not task.cancelled():
+            task.exception()
+
+
+# Równoczesne sprawdzenia tego samego Firebase UID (każde żądanie paragonów i statystyk)
+user_lookups = SingleFlight("user_id")
+
+# Wywołania RPC statystyk z tymi samymi parametrami (dashboard odpytuje je razem, często dwa razy)
+stats_calls = SingleFlight("stats")
+
+# Odpowiedzi z cached_json_response liczone dla tego samego ETagu
+responses = SingleFlight("response")
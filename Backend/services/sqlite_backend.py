@@ -0,0 +1,679 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Lokalny backend bazy danych (DB_BACKEND=sqlite) z tym samym podzbiorem API buildera
+# zapytań PostgREST, którego używają serwisy: select z osadzaniem relacji, filtry,
+# sortowanie, stronicowanie, insert/upsert/update/delete oraz funkcje RPC.
+# Służy do benchmarków i profilowania bez Supabase.
+
+# Sztuczne opóźnienie każdego zapytania (ms) - symuluje podróż do Supabase w testach obciążenia
+SQLITE_LATENCY_MS = float(os.getenv("SQLITE_LATENCY_MS", "0"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    token TEXT NOT NULL UNIQUE,
+    name TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS shops (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shops_parcels (
+    id INTEGER PRIMARY KEY,
+    shops_id INTEGER NOT NULL REFERENCES shops (id),
+    location TEXT
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    categorie_id INTEGER REFERENCES categories (id)
+);
+CREATE TABLE IF NOT EXISTS receipts (
+    id INTEGER PRIMARY KEY,
+    creator_id INTEGER NOT NULL REFERENCES users (id),
+    date TEXT,
+    create_date TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    shop_id INTEGER,
+    sum_price REAL,
+    pic_path TEXT,
+    items_saved INTEGER NOT NULL DEFAULT 0,
+    sync_seq INTEGER,
+    synced_at TEXT
+);
+CREATE TABLE IF NOT EXISTS receipt_indekses (
+    id INTEGER PRIMARY KEY,
+    indeks TEXT NOT NULL,
+    price REAL,
+    product_id INTEGER REFERENCES product (id),
+    shop_id INTEGER REFERENCES shops (id)
+);
+CREATE TABLE IF NOT EXISTS receipt_connect_indekses (
+    id INTEGER PRIMARY KEY,
+    receipt_id INTEGER NOT NULL REFERENCES receipts (id),
+    receipt_indeks_id INTEGER NOT NULL REFERENCES receipt_indekses (id),
+    quantity REAL
+);
+CREATE TABLE IF NOT EXISTS receipt_tombstones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    receipt_id INTEGER NOT NULL,
+    creator_id INTEGER NOT NULL,
+    deleted_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS shops_parcels_shops_id_idx ON shops_parcels (shops_id);
+CREATE INDEX IF NOT EXISTS product_name_idx ON product (name);
+CREATE INDEX IF NOT EXISTS categories_name_idx ON categories (name);
+CREATE INDEX IF NOT EXISTS receipts_creator_id_date_id_idx ON receipts (creator_id, date, id);
+CREATE INDEX IF NOT EXISTS receipt_connect_indekses_receipt_id_idx ON receipt_connect_indekses (receipt_id);
+CREATE INDEX IF NOT EXISTS receipt_tombstones_creator_id_id_idx ON receipt_tombstones (creator_id, id);
+
+CREATE TRIGGER IF NOT EXISTS receipts_tombstone AFTER DELETE ON receipts
+BEGIN
+    INSERT INTO receipt_tombstones (receipt_id, creator_id) VALUES (old.id, old.creator_id);
+END;
+"""
+
+# Odpowiednik sql/receipt_sync.sql - osobno, bo w starszych plikach bazy kolumny
+# dochodzą dopiero w _migrate
+SYNC_SCHEMA = """
+CREATE INDEX IF NOT EXISTS receipts_creator_id_sync_seq_idx ON receipts (creator_id, sync_seq);
+CREATE INDEX IF NOT EXISTS receipts_sync_seq_idx ON receipts (sync_seq);
+
+CREATE TRIGGER IF NOT EXISTS receipts_sync_seq AFTER UPDATE OF items_saved ON receipts
+WHEN new.items_saved AND new.sync_seq IS NULL
+BEGIN
+    UPDATE receipts
+    SET sync_seq = (SELECT COALESCE(MAX(sync_seq), 0) + 1 FROM receipts),
+        synced_at = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+    WHERE id = new.id;
+END;
+"""
+
+# Kolumny dodane po utworzeniu schematu: (tabela, kolumna, definicja)
+_MIGRATIONS = [
+    ("receipts", "items_saved", "INTEGER NOT NULL DEFAULT 0"),
+    ("receipts", "sync_seq", "INTEGER"),
+    ("receipts", "synced_at", "TEXT"),
+]
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """
+    Dodaje brakujące kolumny do pliku bazy utworzonego starszą wersją schematu
+    """
+    with conn:
+        added = set()
+        for table, column, definition in _MIGRATIONS:
+            if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                added.add(column)
+        if "sync_seq" in added:
+            # paragony zapisane wcześniej mają już pozycje
+            conn.execute("UPDATE receipts SET items_saved = 1, sync_seq = id, synced_at = create_date")
+    conn.executescript(SYNC_SCHEMA)
+
+# (tabela, osadzona relacja) -> (tabela docelowa, kolumna lokalna, kolumna docelowa, jeden-do-wielu)
+RELATIONS = {
+    ("receipts", "shops_parcels"): ("shops_parcels", "shop_id", "id", False),
+    ("receipts", "users"): ("users", "creator_id", "id", False),
+    ("receipts", "receipt_connect_indekses"): ("receipt_connect_indekses", "id", "receipt_id", True),
+    ("shops", "shops_parcels"): ("shops_parcels", "id", "shops_id", True),
+    ("shops_parcels", "shops"): ("shops", "shops_id", "id", False),
+    ("receipt_connect_indekses", "receipts"): ("receipts", "receipt_id", "id", False),
+    ("receipt_connect_indekses", "receipt_indekses"): ("receipt_indekses", "receipt_indeks_id", "id", False),
+    ("receipt_indekses", "shops"): ("shops", "shop_id", "id", False),
+    ("receipt_indekses", "product"): ("product", "product_id", "id", False),
+    ("product", "categories"): ("categories", "categorie_id", "id", False),
+}
+
+_IDENTIFIER_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+# Limit parametrów w jednym zapytaniu SQLite
+_MAX_PARAMS = 900
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER_RE.match(name):
+        raise ValueError(f"Niepoprawna nazwa kolumny: {name}")
+    return name
+
+
+class SQLiteResponse:
+    __slots__ = ("data", "count")
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _Embed:
+    __slots__ = ("name", "inner", "columns", "embeds")
+
+    def __init__(self, name: str, inner: bool, columns: List[str], embeds: List["_Embed"]):
+        self.name = name
+        self.inner = inner
+        self.columns = columns
+        self.embeds = embeds
+
+
+def _split_top_level(text: str) -> List[str]:
+    parts = []
+    depth = 0
+    quoted = False
+    start = 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part for part in parts if part]
+
+
+def parse_select(text: str) -> Tuple[List[str], List[_Embed]]:
+    """
+    Parsuje listę kolumn PostgREST, np. "*, shops_parcels!left(id, shops!inner(name))"
+    """
+    columns: List[str] = []
+    embeds: List[_Embed] = []
+    for part in _split_top_level(re.sub(r"\s+", "", text)):
+        if "(" not in part:
+            columns.append(part if part == "*" else _identifier(part))
+            continue
+        head, body = part.split("(", 1)
+        name, _, hint = head.partition("!")
+        inner_columns, inner_embeds = parse_select(body[:-1])
+        embeds.append(_Embed(_identifier(name), hint == "inner", inner_columns, inner_embeds))
+    return columns, embeds
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _condition(alias: str, column: str, operator: str, value: Any) -> Tuple[str, List[Any]]:
+    column = f"{alias}.{_identifier(column)}"
+    if operator in _OPERATORS:
+        return f"{column} {_OPERATORS[operator]} ?", [value]
+    if operator == "like":
+        return f"{column} LIKE ?", [str(value).replace("*", "%")]
+    if operator == "ilike":
+        # LIKE w SQLite ignoruje wielkość liter tylko dla ASCII - porównujemy małe litery
+        return f"py_lower({column}) LIKE py_lower(?)", [str(value).replace("*", "%")]
+    if operator == "in":
+        values = list(value)
+        if not values:
+            return "0", []
+        return f"{column} IN ({', '.join('?' * len(values))})", values
+    if operator == "is":
+        keyword = {"null": "NULL", "true": "1", "false": "0"}[str(value).lower()]
+        return f"{column} IS {keyword}", []
+    raise ValueError(f"Nieobsługiwany operator: {operator}")
+
+
+def _order_term(column: str, desc: bool, nullsfirst: Optional[bool]) -> str:
+    term = f"t.{column} {'DESC' if desc else 'ASC'}"
+    if nullsfirst is None:
+        return term
+    return term + (" NULLS FIRST" if nullsfirst else " NULLS LAST")
+
+
+def _logic(alias: str, text: str, joiner: str) -> Tuple[str, List[Any]]:
+    """
+    Warunek z filtra or_/and(...) w składni PostgREST, np. "date.lt.X,and(date.eq.X,id.lt.5)"
+    """
+    fragments = []
+    params: List[Any] = []
+    for part in _split_top_level(text):
+        if part.startswith(("and(", "or(")):
+            nested_joiner, body = part.split("(", 1)
+            fragment, nested_params = _logic(alias, body[:-1], nested_joiner.upper())
+        else:
+            column, operator, value = part.split(".", 2)
+            value = _unquote(value)
+            if operator == "in":
+                value = [_unquote(v) for v in _split_top_level(value.strip("()"))]
+            fragment, nested_params = _condition(alias, column, operator, value)
+        fragments.append(f"({fragment})")
+        params.extend(nested_params)
+    return f" {joiner} ".join(fragments), params
+
+
+def _run(client: "SQLiteClient", execute):
+    """
+    Wykonanie zapytania: synchronicznie albo (klient asynchroniczny) jako korutyna z pulą wątków
+    """
+    if client.is_async:
+        return _run_async(execute)
+    if SQLITE_LATENCY_MS:
+        time.sleep(SQLITE_LATENCY_MS / 1000)
+    return execute()
+
+
+async def _run_async(execute):
+    if SQLITE_LATENCY_MS:
+        await asyncio.sleep(SQLITE_LATENCY_MS / 1000)
+    return await asyncio.to_thread(execute)
+
+
+class SQLiteQuery:
+    """
+    Builder zapytania do jednej tabeli - odpowiednik buildera postgrest-py
+    """
+
+    def __init__(self, client: "SQLiteClient", table: str):
+        self._client = client
+        self._table = _identifier(table)
+        self._action = "select"
+        self._columns: List[str] = ["*"]
+        self._embeds: List[_Embed] = []
+        self._count: Optional[str] = None
+        self._values: Any = None
+        self._on_conflict = "id"
+        # (ścieżka osadzenia, fragment SQL bez aliasu - funkcja aliasu, parametry)
+        self._filters: List[Tuple[Tuple[str, ...], Any]] = []
+        self._order: List[Tuple[str, bool, Optional[bool]]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+
+    # --- akcje ---
+
+    def select(self, columns: str = "*", count: Optional[str] = None, **kwargs) -> "SQLiteQuery":
+        self._columns, self._embeds = parse_select(columns)
+        self._count = count
+        return self
+
+    def insert(self, values: Any, **kwargs) -> "SQLiteQuery":
+        self._action = "insert"
+        self._values = values
+        return self
+
+    def upsert(self, values: Any, on_conflict: str = "id", **kwargs) -> "SQLiteQuery":
+        self._action = "upsert"
+        self._values = values
+        self._on_conflict = _identifier(on_conflict)
+        return self
+
+    def update(self, values: Dict[str, Any], **kwargs) -> "SQLiteQuery":
+        self._action = "update"
+        self._values = values
+        return self
+
+    def delete(self, **kwargs) -> "SQLiteQuery":
+        self._action = "delete"
+        return self
+
+    # --- filtry ---
+
+    def _filter(self, column: str, operator: str, value: Any) -> "SQLiteQuery":
+        *path, name = column.split(".")
+        self._filters.append((tuple(path), lambda alias: _condition(alias, name, operator, value)))
+        return self
+
+    def eq(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(column, "lte", value)
+
+    def like(self, column: str, pattern: str) -> "SQLiteQuery":
+        return self._filter(column, "like", pattern)
+
+    def ilike(self, column: str, pattern: str) -> "SQLiteQuery":
+        return self._filter(column, "ilike", pattern)
+
+    def in_(self, column: str, values: List[Any]) -> "SQLiteQuery":
+        return self._filter(column, "in", values)
+
+    def is_(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(column, "is", value)
+
+    def or_(self, filters: str, **kwargs) -> "SQLiteQuery":
+        self._filters.append(((), lambda alias: _logic(alias, filters, "OR")))
+        return self
+
+    # --- sortowanie i stronicowanie ---
+
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None, **kwargs) -> "SQLiteQuery":
+        self._order.append((_identifier(column), desc, nullsfirst))
+        return self
+
+    def limit(self, size: int, **kwargs) -> "SQLiteQuery":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> "SQLiteQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # --- wykonanie ---
+
+    def execute(self):
+        return _run(self._client, self._execute)
+
+    def _execute(self) -> SQLiteResponse:
+        with self._client.lock:
+            conn = self._client.connection
+            if self._action == "select":
+                return self._select(conn)
+            with conn:
+                return getattr(self, f"_{self._action}")(conn)
+
+    def _where(self, alias: str, table: str, embeds: List[_Embed], path: Tuple[str, ...]) -> Tuple[str, List[Any]]:
+        """
+        Warunki dla tabeli na danej ścieżce osadzenia. Osadzenie !inner wymaga istnienia
+        pasującego wiersza (EXISTS) - tak jak w PostgREST filtruje wiersze nadrzędne.
+        """
+        fragments = ["1"]
+        params: List[Any] = []
+        for filter_path, build in self._filters:
+            if filter_path == path:
+                fragment, filter_params = build(alias)
+                # nawias - warunek z or_ nie może wyjść poza AND z pozostałymi filtrami
+                fragments.append(f"({fragment})")
+                params.extend(filter_params)
+
+        for embed in embeds:
+            if embed.inner:
+                fragment, embed_params = self._exists(alias, table, embed, path + (embed.name,))
+                fragments.append(fragment)
+                params.extend(embed_params)
+
+        return " AND ".join(fragments), params
+
+    def _exists(self, parent_alias: str, parent_table: str, embed: _Embed, path: Tuple[str, ...]) -> Tuple[str, List[Any]]:
+        target, local, remote, _ = RELATIONS[(parent_table, embed.name)]
+        alias = f"e{len(path)}"
+        where, params = self._where(alias, target, embed.embeds, path)
+        return (
+            f"EXISTS (SELECT 1 FROM {target} {alias} "
+            f"WHERE {alias}.{remote} = {parent_alias}.{local} AND {where})",
+            params
+        )
+
+    def _select(self, conn: sqlite3.Connection) -> SQLiteResponse:
+        where, params = self._where("t", self._table, self._embeds, ())
+
+        count = None
+        if self._count:
+            count = conn.execute(f"SELECT COUNT(*) FROM {self._table} t WHERE {where}", params).fetchone()[0]
+
+        sql = f"SELECT t.* FROM {self._table} t WHERE {where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(_order_term(*term) for term in self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {int(self._limit)} OFFSET {int(self._offset)}"
+
+        rows = [dict(row) for row in conn.execute(sql, params)]
+        self._attach(conn, rows, self._table, self._embeds, ())
+        return SQLiteResponse(_project(rows, self._columns, self._embeds), count)
+
+    def _attach(self, conn: sqlite3.Connection, rows: List[Dict[str, Any]], table: str,
+                embeds: List[_Embed], path: Tuple[str, ...]) -> None:
+        for embed in embeds:
+            target, local, remote, many = RELATIONS[(table, embed.name)]
+            embed_path = path + (embed.name,)
+            keys = list({row[local] for row in rows if row[local] is not None})
+
+            children: List[Dict[str, Any]] = []
+            where, params = self._where("e", target, embed.embeds, embed_path)
+            for i in range(0, len(keys), _MAX_PARAMS):
+                chunk = keys[i:i + _MAX_PARAMS]
+                children.extend(dict(row) for row in conn.execute(
+                    f"SELECT e.* FROM {target} e WHERE e.{remote} IN ({', '.join('?' * len(chunk))}) "
+                    f"AND {where} ORDER BY e.id",
+                    chunk + params
+                ))
+            self._attach(conn, children, target, embed.embeds, embed_path)
+
+            grouped: Dict[Any, Any] = {}
+            for child in children:
+                key = child[remote]
+                projected = _project([child], embed.columns, embed.embeds)[0]
+                if many:
+                    grouped.setdefault(key, []).append(projected)
+                else:
+                    grouped[key] = projected
+            for row in rows:
+                row[embed.name] = grouped.get(row[local], [] if many else None)
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        return self._values if isinstance(self._values, list) else [self._values]
+
+    def _insert(self, conn: sqlite3.Connection) -> SQLiteResponse:
+        data = []
+        for row in self._rows():
+            columns = [_identifier(column) for column in row]
+            data.append(dict(conn.execute(
+                f"INSERT INTO {self._table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))}) RETURNING *",
+                list(row.values())
+            ).fetchone()))
+        return SQLiteResponse(data)
+
+    def _upsert(self, conn: sqlite3.Connection) -> SQLiteResponse:
+        data = []
+        for row in self._rows():
+            columns = [_identifier(column) for column in row]
+            updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != self._on_conflict)
+            data.append(dict(conn.execute(
+                f"INSERT INTO {self._table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT ({self._on_conflict}) DO UPDATE SET {updates or f'{self._on_conflict} = excluded.{self._on_conflict}'} "
+                f"RETURNING *",
+                list(row.values())
+            ).fetchone()))
+        return SQLiteResponse(data)
+
+    def _update(self, conn: sqlite3.Connection) -> SQLiteResponse:
+        where, params = self._where(self._table, self._table, [], ())
+        assignments = ", ".join(f"{_identifier(column)} = ?" for column in self._values)
+        rows = conn.execute(
+            f"UPDATE {self._table} SET {assignments} WHERE {where} RETURNING *",
+            list(self._values.values()) + params
+        )
+        return SQLiteResponse([dict(row) for row in rows])
+
+    def _delete(self, conn: sqlite3.Connection) -> SQLiteResponse:
+        where, params = self._where(self._table, self._table, [], ())
+        rows = conn.execute(f"DELETE FROM {self._table} WHERE {where} RETURNING *", params)
+        return SQLiteResponse([dict(row) for row in rows])
+
+
+def _project(rows: List[Dict[str, Any]], columns: List[str], embeds: List[_Embed]) -> List[Dict[str, Any]]:
+    if "*" in columns:
+        return rows
+    keep = columns + [embed.name for embed in embeds]
+    return [{column: row[column] for column in keep} for row in rows]
+
+
+class SQLiteRPC:
+    def __init__(self, client: "SQLiteClient", function_name: str, params: Dict[str, Any]):
+        if function_name not in RPC_FUNCTIONS:
+            raise ValueError(f"Nieznana funkcja RPC: {function_name}")
+        self._client = client
+        self._function = RPC_FUNCTIONS[function_name]
+        self._params = params
+
+    def execute(self):
+        return _run(self._client, self._execute)
+
+    def _execute(self) -> SQLiteResponse:
+        with self._client.lock, self._client.connection as conn:
+            return SQLiteResponse(self._function(conn, **self._params))
+
+
+class SQLiteClient:
+    """
+    Klient bazy SQLite zgodny z używaną częścią klienta Supabase (table, from_, rpc).
+    Jedno połączenie współdzielone przez wątki, zapytania serializowane blokadą.
+    """
+
+    def __init__(self, path: str, is_async: bool = False, _shared: Optional["SQLiteClient"] = None):
+        self.is_async = is_async
+        if _shared is not None:
+            self.connection = _shared.connection
+            self.lock = _shared.lock
+            return
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.create_function("py_lower", 1, lambda value: value.lower() if isinstance(value, str) else value, deterministic=True)
+        self.lock = threading.RLock()
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        _migrate(self.connection)
+
+    def table(self, table_name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, table_name)
+
+    def from_(self, table_name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, table_name)
+
+    def rpc(self, function_name: str, params: Optional[Dict[str, Any]] = None, *args, **kwargs) -> SQLiteRPC:
+        return SQLiteRPC(self, function_name, params or {})
+
+    def async_client(self) -> "SQLiteClient":
+        """
+        Ten sam plik bazy, ale execute() zwraca korutynę (zapytanie w puli wątków)
+        """
+        return SQLiteClient("", is_async=True, _shared=self)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+# --- funkcje RPC (odpowiedniki funkcji z Supabase) ---
+
+_USER_RECEIPTS = """
+    r.creator_id = (SELECT id FROM users WHERE token = :user_id)
+    AND r.date >= :start_date AND r.date <= :end_date
+"""
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    return [dict(row) for row in cursor]
+
+
+def _expenses_by_category(conn: sqlite3.Connection, user_id: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+    return _rows(conn.execute(f"""
+        SELECT c.name AS category, ROUND(SUM(ri.price), 2) AS total, COUNT(DISTINCT r.id) AS receipt_count
+        FROM receipts r
+        JOIN receipt_connect_indekses rc ON rc.receipt_id = r.id
+        JOIN receipt_indekses ri ON ri.id = rc.receipt_indeks_id
+        LEFT JOIN product p ON p.id = ri.product_id
+        LEFT JOIN categories c ON c.id = p.categorie_id
+        WHERE {_USER_RECEIPTS}
+        GROUP BY c.name
+        ORDER BY total DESC
+    """, {"user_id": user_id, "start_date": start_date, "end_date": end_date}))
+
+
+def _expenses_by_shop(conn: sqlite3.Connection, user_id: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+    return _rows(conn.execute(f"""
+        SELECT s.name AS shop, ROUND(SUM(r.sum_price), 2) AS total, COUNT(*) AS receipt_count
+        FROM receipts r
+        LEFT JOIN shops_parcels sp ON sp.id = r.shop_id
+        LEFT JOIN shops s ON s.id = sp.shops_id
+        WHERE {_USER_RECEIPTS}
+        GROUP BY s.name
+        ORDER BY total DESC
+    """, {"user_id": user_id, "start_date": start_date, "end_date": end_date}))
+
+
+def _expenses_by_month(conn: sqlite3.Connection, user_id: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+    return _rows(conn.execute(f"""
+        SELECT substr(r.date, 1, 7) AS month, ROUND(SUM(r.sum_price), 2) AS total, COUNT(*) AS receipt_count
+        FROM receipts r
+        WHERE {_USER_RECEIPTS}
+        GROUP BY month
+        ORDER BY month
+    """, {"user_id": user_id, "start_date": start_date, "end_date": end_date}))
+
+
+def _total_expense_summary(conn: sqlite3.Connection, user_id: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+    return _rows(conn.execute(f"""
+        SELECT
+            ROUND(COALESCE(SUM(r.sum_price), 0), 2) AS total,
+            COUNT(*) AS receipt_count,
+            ROUND(COALESCE(AVG(r.sum_price), 0), 2) AS average
+        FROM receipts r
+        WHERE {_USER_RECEIPTS}
+    """, {"user_id": user_id, "start_date": start_date, "end_date": end_date}))
+
+
+def _save_receipt(conn: sqlite3.Connection, receipt: Dict[str, Any], shop_id: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Odpowiednik sql/save_receipt.sql - paragon, brakujące produkty i pozycje w jednej transakcji
+    """
+    receipt_row = dict(conn.execute(
+        "INSERT INTO receipts (creator_id, date, shop_id, sum_price, pic_path) VALUES (?, ?, ?, ?, ?) RETURNING *",
+        (receipt["creator_id"], receipt.get("date"), receipt.get("shop_id"), receipt.get("sum_price"), receipt.get("pic_path"))
+    ).fetchone())
+
+    saved_items = []
+    for item in items:
+        product = conn.execute("SELECT id FROM product WHERE name = ? ORDER BY id LIMIT 1", (item["indeks"],)).fetchone()
+        if product is None:
+            product = conn.execute(
+                "INSERT INTO product (name, categorie_id) VALUES (?, NULL) RETURNING id", (item["indeks"],)
+            ).fetchone()
+        indeks_id = conn.execute(
+            "INSERT INTO receipt_indekses (indeks, price, product_id, shop_id) VALUES (?, ?, ?, ?) RETURNING id",
+            (item["indeks"], item["price"], product["id"], shop_id)
+        ).fetchone()["id"]
+        connect_id = conn.execute(
+            "INSERT INTO receipt_connect_indekses (receipt_id, receipt_indeks_id, quantity) VALUES (?, ?, ?) RETURNING id",
+            (receipt_row["id"], indeks_id, item["quantity"])
+        ).fetchone()["id"]
+        saved_items.append({"connect_id": connect_id, "product_id": product["id"]})
+
+    # pozycje zapisane - trigger nadaje sync_seq
+    conn.execute("UPDATE receipts SET items_saved = 1 WHERE id = ?", (receipt_row["id"],))
+    return {
+        "receipt": dict(conn.execute("SELECT * FROM receipts WHERE id = ?", (receipt_row["id"],)).fetchone()),
+        "items": saved_items
+    }
+
+
+RPC_FUNCTIONS = {
+    "expenses_by_category": _expenses_by_category,
+    "expenses_by_shop": _expenses_by_shop,
+    "expenses_by_month": _expenses_by_month,
+    "total_expense_summary": _total_expense_summary,
+    "save_receipt": _save_receipt,
+}
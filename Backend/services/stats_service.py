@@ -1,33 +1,75 @@
-from services.db import supabase_client
+from services.db import supabase_client, get_async_supabase_client
+from services.aggregates import aggregate_store, refresh_if_stale
+from services.paragon_service import get_user_id_by_token
+from services.async_paragon_service import get_user_id_by_token_async
+from services.single_flight import stats_calls
+import asyncio
 
-def get_expenses_by_category(user_id: str, start_date: str, end_date: str): 
-    response = supabase_client.rpc("expenses_by_category", {
+def stats_rpc(client, function_name: str, user_id: str, start_date: str, end_date: str):
+    """
+    Wywołanie funkcji statystyk. Przyjmuje klienta synchronicznego lub asynchronicznego.
+    """
+    return client.rpc(function_name, {
         "user_id": user_id,
         "start_date": start_date,
         "end_date": end_date
-    }).execute()
-    return response.data
+    })
+
+def get_stats(function_name: str, user_id: str, start_date: str, end_date: str):
+    """
+    Statystyki z prekomputowanych agregatów, a gdy nie są gotowe - z funkcji RPC
+    """
+    if aggregate_store.ready:
+        refresh_if_stale(supabase_client)
+        user_result = get_user_id_by_token(user_id)
+        if user_result["success"]:
+            return aggregate_store.query(function_name, user_result["user_id"], start_date, end_date)
+
+    # Te same statystyki zamówione równocześnie (np. dwa przebudowania widżetu) - jedno wywołanie RPC
+    return stats_calls.do(
+        (function_name, user_id, start_date, end_date),
+        lambda: stats_rpc(supabase_client, function_name, user_id, start_date, end_date).execute().data
+    )
+
+def get_expenses_by_category(user_id: str, start_date: str, end_date: str): 
+    return get_stats("expenses_by_category", user_id, start_date, end_date)
 
 def get_expenses_by_shop(user_id: str, start_date: str, end_date: str):
-    response = supabase_client.rpc("expenses_by_shop", {
-        "user_id": user_id,
-        "start_date": start_date,
-        "end_date": end_date
-    }).execute()
-    return response.data
+    return get_stats("expenses_by_shop", user_id, start_date, end_date)
 
 def get_expenses_by_month(user_id: str, start_date: str, end_date: str):
-    response = supabase_client.rpc("expenses_by_month", {
-        "user_id": user_id,
-        "start_date": start_date,
-        "end_date": end_date
-    }).execute()
-    return response.data
+    return get_stats("expenses_by_month", user_id, start_date, end_date)
 
 def get_total_expense_summary(user_id: str, start_date: str, end_date: str):
-    response = supabase_client.rpc("total_expense_summary", {
-        "user_id": user_id,
-        "start_date": start_date,
-        "end_date": end_date
-    }).execute()
-    return response.data
\ No newline at end of file
+    return get_stats("total_expense_summary", user_id, start_date, end_date)
+
+async def get_stats_async(function_name: str, user_id: str, start_date: str, end_date: str):
+    if aggregate_store.ready:
+        refresh_if_stale(supabase_client)
+        user_result = await get_user_id_by_token_async(user_id)
+        if user_result["success"]:
+            return aggregate_store.query(function_name, user_result["user_id"], start_date, end_date)
+
+    async def fetch():
+        client = await get_async_supabase_client()
+        response = await stats_rpc(client, function_name, user_id, start_date, end_date).execute()
+        return response.data
+
+    return await stats_calls.do_async((function_name, user_id, start_date, end_date), fetch)
+
+async def get_dashboard_stats_async(user_id: str, start_date: str, end_date: str):
+    """
+    Wszystkie cztery statystyki dashboardu pobierane równolegle
+    """
+    categories, shops, months, summary = await asyncio.gather(
+        get_stats_async("expenses_by_category", user_id, start_date, end_date),
+        get_stats_async("expenses_by_shop", user_id, start_date, end_date),
+        get_stats_async("expenses_by_month", user_id, start_date, end_date),
+        get_stats_async("total_expense_summary", user_id, start_date, end_date)
+    )
+    return {
+        "categories": categories,
+        "shops": shops,
+        "months": months,
+        "summary": summary
+    }
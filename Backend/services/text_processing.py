@@ -1,3 +1,141 @@
-def przetworz_tekst_paragonu(tekst: str) -> list[str]:
-    produkty = tekst.lower().split()
-    return produkty
\ No newline at end of file
+import re
+from typing import Dict, Any, List, Optional, Iterable
+from models.receipt_model import Receipt, ReceiptItem
+
+# Kwota w formacie 12,34 / 12.34 (OCR często myli separator)
+_KWOTA = r"\d+[.,]\d{2}"
+
+# "NAZWA 2 szt.*19.00", "NAZWA 1 szt,48.00", "NAZWA 0,5 kg x 12,99 6,50 A"
+_POZYCJA_SZT_RE = re.compile(
+    rf"^(?P<name>.*?)\s*(?P<qty>\d+(?:[.,]\d+)?)\s*(?:szt|kg|op|l)\.?\s*[*xX×,]\s*(?P<price>{_KWOTA})"
+    rf"(?:\s*=?\s*(?P<total>{_KWOTA}))?\s*[A-G]?\s*$",
+    re.IGNORECASE
+)
+
+# "NAZWA 3 x 2,49 7,47 A", także "3 x 2,49" pod nazwą w poprzedniej linii
+_POZYCJA_X_RE = re.compile(
+    rf"^(?:(?P<name>.*?)\s+)?(?P<qty>\d+(?:[.,]\d+)?)\s*[*xX×]\s*(?P<price>{_KWOTA})"
+    rf"(?:\s*=?\s*(?P<total>{_KWOTA}))?\s*[A-G]?\s*$"
+)
+
+# "SUMA PLN 123,45", "SUMA: 123.45"
+_SUMA_RE = re.compile(rf"^\s*SUMA\b[^\d]*(?P<total>{_KWOTA})", re.IGNORECASE)
+
+# Linie nagłówka i stopki, które nie są pozycjami paragonu
+_POMIN_RE = re.compile(
+    r"^\s*(PARAGON|NIEFISKALNY|FISKALNY|NIP|PTU|SPRZEDA[ŻZ]|RAZEM|SUMA|KARTA|GOT[ÓO]WKA|RESZTA|"
+    r"ROZLICZENIE|PLATNO|PŁATNO|NR\s*SYS|KASA|KASJER|WYDRUK|ZAP[ŁL]ACONO|DO\s*ZAP|RABAT\s*RAZEM)",
+    re.IGNORECASE
+)
+
+_DATA_RE = re.compile(r"(?P<y>\d{4})-(?P<m>\d{2})-(?P<d>\d{2})|(?P<d2>\d{2})[.-](?P<m2>\d{2})[.-](?P<y2>\d{4})")
+
+_PARAGON_RE = re.compile(r"PARAGON", re.IGNORECASE)
+
+# Dopuszczalna różnica między sumą pozycji a SUMA PLN
+TOLERANCJA_SUMY = 0.02
+
+
+def _liczba(tekst: str) -> float:
+    return float(tekst.replace(",", "."))
+
+
+def _dopasuj_pozycje(linia: str):
+    return _POZYCJA_SZT_RE.match(linia) or _POZYCJA_X_RE.match(linia)
+
+
+def _znajdz_date(linia: str) -> Optional[str]:
+    dopasowanie = _DATA_RE.search(linia)
+    if not dopasowanie:
+        return None
+    if dopasowanie.group("y"):
+        return f"{dopasowanie.group('y')}-{dopasowanie.group('m')}-{dopasowanie.group('d')}"
+    return f"{dopasowanie.group('y2')}-{dopasowanie.group('m2')}-{dopasowanie.group('d2')}"
+
+
+def przetworz_tekst_paragonu(tekst: str, user_id: str = "") -> Dict[str, Any]:
+    """
+    Zamienia surowy tekst z OCR na Receipt. Sklep to pierwsza linia nagłówka przed PARAGON,
+    pozycje rozpoznawane są po wzorcach "N szt.*P" i "N x P", a suma pozycji jest
+    porównywana z linią SUMA.
+    """
+    store_name = None
+    date = None
+    total = None
+    items: List[ReceiptItem] = []
+    pending_name = None
+    w_naglowku = True
+
+    for surowa_linia in tekst.splitlines():
+        linia = surowa_linia.strip()
+        if not linia:
+            continue
+
+        if date is None:
+            date = _znajdz_date(linia)
+
+        if w_naglowku:
+            if _PARAGON_RE.search(linia):
+                w_naglowku = False
+                continue
+            if store_name is None and not _dopasuj_pozycje(linia):
+                store_name = linia
+                continue
+
+        suma = _SUMA_RE.match(linia)
+        if suma:
+            total = _liczba(suma.group("total"))
+            pending_name = None
+            continue
+
+        if _POMIN_RE.match(linia):
+            pending_name = None
+            continue
+
+        pozycja = _dopasuj_pozycje(linia)
+        if pozycja:
+            w_naglowku = False
+            name = (pozycja.group("name") or "").strip(" .,-*") or pending_name
+            pending_name = None
+            if not name:
+                continue
+            items.append(ReceiptItem(
+                name=name,
+                quantity=_liczba(pozycja.group("qty")),
+                price=_liczba(pozycja.group("price"))
+            ))
+        elif not w_naglowku:
+            # Nazwa bez ceny - ilość i cena są zwykle w następnej linii
+            pending_name = linia
+
+    items_total = round(sum(item.quantity * item.price for item in items), 2)
+    if total is None:
+        total = items_total
+
+    receipt = Receipt(
+        storeName=store_name or "Nieznany sklep",
+        date=date,
+        items=items,
+        total=total,
+        userId=user_id
+    )
+
+    return {
+        "success": True,
+        "receipt": receipt,
+        "items_total": items_total,
+        "total_valid": abs(items_total - total) <= TOLERANCJA_SUMY
+    }
+
+
+def przetworz_paragony(teksty: Iterable[str], user_id: str = "") -> List[Dict[str, Any]]:
+    """
+    Przetwarza wiele paragonów naraz - wyrażenia regularne są skompilowane raz na moduł
+    """
+    wyniki = []
+    for tekst in teksty:
+        try:
+            wyniki.append(przetworz_tekst_paragonu(tekst, user_id))
+        except Exception as e:
+            wyniki.append({"success": False, "error": str(e)})
+    return wyniki
@@ -0,0 +1,40 @@
+-- Kolejność zmian paragonów dla /paragon/sync.
+-- sync_seq jest nadawany dopiero wtedy, gdy pozycje paragonu są zapisane (items_saved),
+-- więc synchronizacja nie zwraca paragonów bez pozycji (zapis nieatomowy, RECEIPT_SAVE_MODE=queue).
+-- Numer pochodzi z sekwencji w chwili oznaczenia, a nie z create_date (czas początku
+-- transakcji) - paragon zatwierdzony później nie dostanie numeru mniejszego niż już pobrane.
+-- Pozostałe okno (numer nadany, transakcja jeszcze niezatwierdzona) pokrywa SYNC_SAFETY_LAG:
+-- synchronizacja pomija zmiany młodsze niż kilka sekund (synced_at).
+
+alter table receipts add column if not exists items_saved boolean not null default false;
+alter table receipts add column if not exists sync_seq bigint;
+alter table receipts add column if not exists synced_at timestamptz;
+
+create sequence if not exists receipt_sync_seq;
+
+create or replace function assign_receipt_sync_seq()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.items_saved and new.sync_seq is null then
+        new.sync_seq := nextval('receipt_sync_seq');
+        new.synced_at := clock_timestamp();
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists receipts_sync_seq on receipts;
+create trigger receipts_sync_seq
+    before insert or update of items_saved on receipts
+    for each row execute function assign_receipt_sync_seq();
+
+-- Paragony zapisane przed migracją - pozycje są już w bazie
+update receipts set items_saved = true where not items_saved;
+
+create index if not exists receipts_creator_id_sync_seq_idx
+    on receipts (creator_id, sync_seq);
+
+-- Poprzedni znacznik (create_date, id) nie jest już używany
+drop index if exists receipts_creator_id_create_date_id_idx;
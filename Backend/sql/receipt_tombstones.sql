@@ -0,0 +1,29 @@
+-- Nagrobki usuniętych paragonów dla /paragon/sync.
+-- Trigger zapisuje wiersz przy każdym usunięciu paragonu; id rośnie monotonicznie
+-- i służy jako część znacznika synchronizacji (paragony - patrz sql/receipt_sync.sql).
+
+create table if not exists receipt_tombstones (
+    id bigserial primary key,
+    receipt_id bigint not null,
+    creator_id bigint not null,
+    deleted_at timestamptz not null default now()
+);
+
+create index if not exists receipt_tombstones_creator_id_id_idx
+    on receipt_tombstones (creator_id, id);
+
+create or replace function record_receipt_tombstone()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into receipt_tombstones (receipt_id, creator_id)
+    values (old.id, old.creator_id);
+    return old;
+end;
+$$;
+
+drop trigger if exists receipts_tombstone on receipts;
+create trigger receipts_tombstone
+    after delete on receipts
+    for each row execute function record_receipt_tombstone();
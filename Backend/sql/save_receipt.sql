@@ -0,0 +1,80 @@
+-- Atomowy zapis paragonu z pozycjami jednym wywołaniem RPC.
+-- Używane przez services/paragon_service.insert_receipt_with_items gdy USE_SAVE_RECEIPT_RPC=true.
+--
+-- receipt: {"creator_id", "date", "shop_id", "sum_price", "pic_path"}
+-- shop_id: ID sklepu z tabeli shops zapisywane w receipt_indekses
+-- items:   [{"indeks", "price", "quantity"}, ...]
+--
+-- Zwraca {"receipt": wiersz receipts, "items": [{"connect_id", "product_id"}, ...]}
+-- z pozycjami w kolejności tablicy items.
+
+create or replace function save_receipt(receipt jsonb, shop_id bigint, items jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    new_receipt receipts%rowtype;
+    saved_items jsonb;
+    connected integer;
+begin
+    -- Typy kolumn bierzemy z tabeli receipts, a nie z rzutowań w funkcji
+    insert into receipts (creator_id, date, shop_id, sum_price, pic_path)
+    select r.creator_id, r.date, r.shop_id, r.sum_price, r.pic_path
+    from jsonb_populate_record(null::receipts, receipt) as r
+    returning * into new_receipt;
+
+    -- Brakujące produkty tworzymy jednym insertem
+    insert into product (name, categorie_id)
+    select distinct item->>'indeks', null
+    from jsonb_array_elements(items) as item
+    where not exists (
+        select 1 from product p where p.name = item->>'indeks'
+    );
+
+    -- Id pozycji pobieramy z sekwencji z góry, żeby pozycja w tablicy items (ordinality)
+    -- przeszła przez oba inserty bez polegania na kolejności RETURNING
+    with numbered as (
+        select
+            t.item,
+            t.ordinality,
+            nextval(pg_get_serial_sequence('receipt_indekses', 'id')) as indeks_id,
+            (select p.id from product p where p.name = t.item->>'indeks' order by p.id limit 1) as product_id
+        from jsonb_array_elements(items) with ordinality as t(item, ordinality)
+    ),
+    inserted as (
+        insert into receipt_indekses (id, indeks, price, product_id, shop_id)
+        overriding system value
+        select n.indeks_id, n.item->>'indeks', (n.item->>'price')::numeric, n.product_id, save_receipt.shop_id
+        from numbered n
+        returning id
+    ),
+    connected_items as (
+        insert into receipt_connect_indekses (receipt_id, receipt_indeks_id, quantity)
+        select new_receipt.id, i.id, (n.item->>'quantity')::numeric
+        from inserted i
+        join numbered n on n.indeks_id = i.id
+        returning id, receipt_indeks_id
+    )
+    select
+        count(*),
+        coalesce(
+            jsonb_agg(jsonb_build_object('connect_id', c.id, 'product_id', n.product_id) order by n.ordinality),
+            '[]'::jsonb
+        )
+    into connected, saved_items
+    from connected_items c
+    join numbered n on n.indeks_id = c.receipt_indeks_id;
+
+    -- Każda pozycja musi mieć powiązanie z paragonem - inaczej wycofujemy cały zapis
+    if connected <> jsonb_array_length(items) then
+        raise exception 'save_receipt: powiązano % z % pozycji', connected, jsonb_array_length(items);
+    end if;
+
+    -- Pozycje zapisane - trigger nadaje sync_seq (sql/receipt_sync.sql)
+    update receipts set items_saved = true
+    where id = new_receipt.id
+    returning * into new_receipt;
+
+    return jsonb_build_object('receipt', to_jsonb(new_receipt), 'items', saved_items);
+end;
+$$;
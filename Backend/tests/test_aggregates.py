@@ -0,0 +1,69 @@
+import threading
+import time
+import uuid
+
+from services import aggregates
+from services.aggregates import AggregateStore, refresh_if_stale
+from services.db import supabase_client
+
+
+def test_shop_from_rebuild_and_from_event_is_one_row():
+    token = f"test-user-{uuid.uuid4().hex}"
+    user = supabase_client.table("users").insert({"token": token}).execute().data[0]
+    name = f"Sklep {uuid.uuid4().hex[:8]}"
+    shop = supabase_client.table("shops").insert({"name": name}).execute().data[0]
+    parcel = supabase_client.table("shops_parcels").insert({"shops_id": shop["id"], "location": None}).execute().data[0]
+    supabase_client.table("receipts")\
+        .insert({"creator_id": user["id"], "shop_id": parcel["id"], "date": "2024-03-01", "sum_price": 10.0})\
+        .execute()
+
+    store = AggregateStore()
+    store.rebuild(supabase_client)
+    # storeName z paragonu wpisany inaczej niż nazwa w bazie
+    store.add_receipt({
+        "user_id": user["id"], "receipt_id": 0, "date": "2024-03-02", "shop_id": shop["id"],
+        "shop_name": name.lower(), "sum_price": 5.0, "items": []
+    })
+
+    assert store.expenses_by_shop(user["id"], "2024-03-01", "2024-03-31") == [
+        {"shop": name, "total": 15.0, "receipt_count": 2}
+    ]
+
+
+def test_stale_aggregates_are_rebuilt_once_in_background(monkeypatch):
+    store = AggregateStore()
+    store.built_at = time.monotonic()
+    release = threading.Event()
+    rebuilds = []
+
+    def rebuild(client):
+        rebuilds.append(client)
+        release.wait(5)
+
+    monkeypatch.setattr(store, "rebuild", rebuild)
+    monkeypatch.setattr(aggregates, "aggregate_store", store)
+    monkeypatch.setattr(aggregates, "STATS_AGGREGATES_MAX_AGE", 60.0)
+    assert not refresh_if_stale("client")
+
+    store.built_at -= 61
+    assert refresh_if_stale("client")
+    assert not refresh_if_stale("client")
+    release.set()
+    assert rebuilds == ["client"]
+
+
+def test_listener_is_idle_when_aggregates_are_off(monkeypatch):
+    store = AggregateStore()
+    monkeypatch.setattr(aggregates, "aggregate_store", store)
+    event = {
+        "user_id": 1, "receipt_id": 1, "date": "2024-03-01", "shop_id": None,
+        "shop_name": None, "sum_price": 5.0, "items": []
+    }
+
+    monkeypatch.setattr(aggregates, "STATS_AGGREGATES", False)
+    aggregates.update_aggregates(event)
+    assert store.expenses_by_month(1, "2024-03-01", "2024-03-31") == []
+
+    monkeypatch.setattr(aggregates, "STATS_AGGREGATES", True)
+    aggregates.update_aggregates(event)
+    assert store.expenses_by_month(1, "2024-03-01", "2024-03-31") != []
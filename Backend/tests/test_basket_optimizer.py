@@ -0,0 +1,45 @@
+import tracemalloc
+from itertools import combinations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services import basket_optimizer
+from services.basket_optimizer import best_split
+
+np = pytest.importorskip("numpy")
+
+
+def _split_total(cost, shops):
+    return cost[:, shops].min(axis=1).sum()
+
+
+def test_best_split_matches_exhaustive_search():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        cost = rng.integers(1, 6, (int(rng.integers(1, 8)), int(rng.integers(1, 15)))).astype(float)
+        best = min(
+            _split_total(cost, list(shops))
+            for k in (1, 2, 3)
+            for shops in combinations(range(cost.shape[1]), k)
+        )
+        assert _split_total(cost, best_split(cost, 3)) == best
+
+
+def test_many_shops_do_not_build_shops_by_shops_tensor():
+    cost = np.random.default_rng(2).uniform(1.0, 50.0, (60, 5000))
+    tracemalloc.start()
+    best_split(cost, 3)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # pełny tensor pozycje x sklepy x sklepy to 1,5 GB
+    assert peak < 50 * 1024 * 1024
+
+
+def test_optimize_without_numpy_returns_503(monkeypatch):
+    monkeypatch.setattr(basket_optimizer, "np", None)
+    with TestClient(app) as client:
+        response = client.post("/lists/optimize", json={"items": [{"name": "MLEKO", "quantity": 1}]})
+    assert response.status_code == 503
+    assert "numpy" in response.json()["detail"]
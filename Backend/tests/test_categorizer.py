@@ -0,0 +1,37 @@
+import pytest
+
+from services.categorizer import CATEGORIES, Categorizer, load_seed
+
+
+def test_seed_has_only_known_categories():
+    names, labels = load_seed()
+    assert names and set(labels) <= set(CATEGORIES)
+
+
+def test_unquoted_comma_in_seed_is_rejected(tmp_path):
+    seed = tmp_path / "seed.csv"
+    seed.write_text("name,category\nMLEKO 3,2%,Nabiał\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_seed(str(seed))
+
+
+def test_unknown_label_is_rejected(tmp_path):
+    seed = tmp_path / "seed.csv"
+    seed.write_text("name,category\nMLEKO 2%,Nabial\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_seed(str(seed))
+    with pytest.raises(ValueError):
+        Categorizer().fit(["MLEKO 2%"], ["2%"])
+
+
+def test_predictions_are_known_categories_or_none():
+    names, labels = load_seed()
+    model = Categorizer().fit(names, labels)
+    predictions = model.predict(["MLEKO ŁACIATE 3,2% 1L", "WODA 6X1,5L", "XQZW"])
+    assert all(prediction is None or prediction in CATEGORIES for prediction in predictions)
+    assert predictions[2] is None
+
+
+def test_close_scores_give_no_category():
+    model = Categorizer(min_score=0.0, min_margin=1.0).fit(["MLEKO", "CHLEB"], ["Nabiał", "Pieczywo"])
+    assert model.predict(["MLEKO"]) == [None]
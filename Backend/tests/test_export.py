@@ -0,0 +1,42 @@
+import asyncio
+import tracemalloc
+
+from benchmarks.generator import generate
+from services import export_service
+from services.sqlite_backend import SQLiteClient
+
+
+def _export(monkeypatch, path):
+    client = SQLiteClient(path).async_client()
+
+    async def get_client():
+        return client
+
+    async def consume():
+        size = 0
+        async for chunk in export_service.export_csv(export_service.iter_export_pages(1, page_size=50)):
+            size += len(chunk)
+        return size
+
+    monkeypatch.setattr(export_service, "get_async_supabase_client", get_client)
+    tracemalloc.start()
+    try:
+        size = asyncio.run(consume())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return size, peak
+
+
+def test_export_memory_stays_flat(monkeypatch, tmp_path):
+    results = []
+    for receipts in (500, 2000):
+        # jeden użytkownik - cała baza trafia do jego eksportu
+        path = str(tmp_path / f"export_{receipts}.db")
+        generate(path, users=1, receipts=receipts, products=300)
+        results.append(_export(monkeypatch, path))
+
+    (small_size, small_peak), (size, peak) = results
+    # cztery razy większy eksport, a szczyt pamięci zależy tylko od rozmiaru strony
+    assert size > 3 * small_size
+    assert peak < 1.25 * small_peak
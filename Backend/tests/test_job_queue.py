@@ -0,0 +1,19 @@
+from services import job_queue as job_queue_module
+from services.job_queue import FAILED, JobQueue, MemoryJobStore, job_handler
+
+
+@job_handler("test_short_results")
+def _short_results(payloads):
+    return [payload["n"] for payload in payloads[:1]]
+
+
+def test_batch_with_missing_results_fails_every_job(monkeypatch):
+    monkeypatch.setattr(job_queue_module, "JOB_MAX_ATTEMPTS", 1)
+    queue = JobQueue(MemoryJobStore())
+    job_ids = [queue.enqueue("test_short_results", {"n": n}) for n in range(3)]
+
+    queue._process(queue._take_batch())
+
+    statuses = [queue.status(job_id) for job_id in job_ids]
+    assert [status["status"] for status in statuses] == [FAILED] * 3
+    assert all(status["result"] is None for status in statuses)
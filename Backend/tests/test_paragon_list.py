@@ -0,0 +1,45 @@
+import base64
+import uuid
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.db import supabase_client
+
+
+def _user_with_receipts(dates):
+    token = f"test-user-{uuid.uuid4().hex}"
+    user = supabase_client.table("users").insert({"token": token}).execute().data[0]
+    shop = supabase_client.table("shops").insert({"name": f"Sklep {uuid.uuid4().hex[:8]}"}).execute().data[0]
+    parcel = supabase_client.table("shops_parcels").insert({"shops_id": shop["id"], "location": None}).execute().data[0]
+    rows = [{"creator_id": user["id"], "shop_id": parcel["id"], "date": date, "sum_price": 1.0} for date in dates]
+    ids = [row["id"] for row in supabase_client.table("receipts").insert(rows).execute().data]
+    return token, ids
+
+
+def test_cursor_pages_through_receipts_without_date():
+    token, ids = _user_with_receipts(["2024-03-01", None, "2024-03-02", None, "2024-03-01"])
+
+    seen, cursor = [], None
+    with TestClient(app) as client:
+        for _ in range(len(ids)):
+            params = {"user_id": token, "page_size": 2, "count": "none"}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/paragon/list", params=params)
+            assert response.status_code == 200, response.text
+            seen += [paragon["id"] for paragon in response.json()["paragons"]]
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                break
+
+    # najnowsze najpierw, paragony bez daty na końcu
+    assert seen == [ids[2], ids[4], ids[0], ids[3], ids[1]]
+
+
+def test_cursor_with_injected_filter_is_rejected():
+    token, _ = _user_with_receipts(["2024-03-01"])
+    cursor = base64.urlsafe_b64encode(b"2024-03-01,id.gt.0|1").decode().rstrip("=")
+    with TestClient(app) as client:
+        response = client.get("/paragon/list", params={"user_id": token, "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,83 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services import paragon_service
+from services.db import supabase_client
+from services.paragon_service import mark_items_saved
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(paragon_service, "SYNC_SAFETY_LAG", 0.0)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _user_and_shop():
+    token = f"test-user-{uuid.uuid4().hex}"
+    user = supabase_client.table("users").insert({"token": token}).execute().data[0]
+    shop_name = f"Sklep {uuid.uuid4().hex[:8]}"
+    shop = supabase_client.table("shops").insert({"name": shop_name}).execute().data[0]
+    supabase_client.table("shops_parcels").insert({"shops_id": shop["id"], "location": None}).execute()
+    return token, user["id"], shop_name
+
+
+def _save(client, token, shop_name, total):
+    response = client.post("/receipt/save", json={
+        "storeName": shop_name,
+        "date": "2024-03-01",
+        "items": [{"name": "MLEKO 2%", "quantity": 1, "price": total}],
+        "total": total,
+        "userId": token
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["id"]
+
+
+def _sync(client, token, since=None):
+    params = {"user_id": token}
+    if since:
+        params["since"] = since
+    response = client.get("/paragon/sync", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_receipt_without_items_is_synced_once_items_are_saved(client):
+    token, user_id, shop_name = _user_and_shop()
+    # paragon zapisany przed pozycjami (zapis nieatomowy / RECEIPT_SAVE_MODE=queue)
+    pending = supabase_client.table("receipts").insert({"creator_id": user_id, "date": "2024-03-01"}).execute().data[0]
+    saved = _save(client, token, shop_name, 10.0)
+
+    first = _sync(client, token)
+    assert [receipt["id"] for receipt in first["receipts"]] == [saved]
+
+    # pozycje dopisane później - paragon ma starsze create_date, ale i tak trafia do synchronizacji
+    mark_items_saved([pending["id"]])
+    second = _sync(client, token, first["watermark"])
+    assert [receipt["id"] for receipt in second["receipts"]] == [pending["id"]]
+
+
+def test_deleted_receipt_is_reported(client):
+    token, _, shop_name = _user_and_shop()
+    receipt_id = _save(client, token, shop_name, 12.5)
+    first = _sync(client, token)
+
+    supabase_client.table("receipts").delete().eq("id", receipt_id).execute()
+    second = _sync(client, token, first["watermark"])
+    assert second["deleted"] == [receipt_id]
+    assert second["receipts"] == []
+
+
+def test_recent_changes_wait_for_safety_lag(client, monkeypatch):
+    token, _, shop_name = _user_and_shop()
+    _save(client, token, shop_name, 7.0)
+
+    monkeypatch.setattr(paragon_service, "SYNC_SAFETY_LAG", 60.0)
+    assert _sync(client, token)["receipts"] == []
+
+    monkeypatch.setattr(paragon_service, "SYNC_SAFETY_LAG", 0.0)
+    assert len(_sync(client, token)["receipts"]) == 1
@@ -0,0 +1,74 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from services import price_history as price_history_module
+from services import price_index as price_index_module
+from services.price_history import PriceHistory
+from services.price_index import PriceIndex, rebuild_indexes
+
+
+def test_repeat_purchases_during_rebuild_are_kept(monkeypatch):
+    history = PriceHistory()
+
+    def scan(client, page_size):
+        yield (1, 10, 100, "2024-01-01", 2.0, "MLEKO", "Sklep")
+        # dwa takie same zakupy tego samego dnia: pierwszy jest już w skanie, drugi nie
+        history.add(10, 100, "2024-01-01", 2.0, "Sklep", connect_id=1)
+        history.add(10, 100, "2024-01-01", 2.0, "Sklep", connect_id=2)
+
+    monkeypatch.setattr(price_index_module, "iter_price_observations", scan)
+    history.rebuild(client=None)
+    assert history.observations() == 2
+
+
+def test_one_scan_feeds_both_indexes(monkeypatch):
+    index, history = PriceIndex(), PriceHistory()
+    scans = []
+
+    def scan(client, page_size):
+        scans.append(client)
+        yield (1, 10, 100, "2024-01-01", 2.0, "MLEKO", "Sklep")
+        yield (2, 10, 100, "2024-01-02", 3.0, "MLEKO", "Sklep")
+
+    monkeypatch.setattr(price_index_module, "iter_price_observations", scan)
+    result = rebuild_indexes(None, [index, history])
+
+    assert len(scans) == 1
+    assert result["observations"] == 2
+    assert index.ready and history.ready
+    assert index._prices[10][100].to_dict()["observations"] == 2
+    assert history.observations() == 2
+
+
+def test_invalid_dates_are_rejected():
+    with TestClient(app) as client:
+        for params in ({"start_date": "2024-13-01"}, {"end_date": "wczoraj"}):
+            response = client.get("/api/prices/history", params={"product_id": 1, **params})
+            assert response.status_code == 400
+        assert client.get("/api/prices/history", params={"product_id": 1, "start_date": "2024-01-01"}).status_code == 200
+
+
+def test_history_without_numpy(monkeypatch):
+    monkeypatch.setattr(price_history_module, "np", None)
+    history = PriceHistory()
+    history.add(10, 100, "2024-01-01", 2.5, "Sklep")
+    assert history.history(10, bucket="raw")[0]["points"] == [{"date": "2024-01-01", "price": 2.5}]
+
+    with TestClient(app) as client:
+        response = client.get("/api/prices/history", params={"product_id": 10, "bucket": "week"})
+    assert response.status_code == 503
+
+
+def test_shop_names_come_from_catalog(monkeypatch):
+    class Catalog:
+        def name(self, shop_id):
+            return {100: "Biedronka"}.get(shop_id)
+
+    monkeypatch.setattr(price_history_module, "shop_catalog", Catalog())
+    history = PriceHistory()
+    history.add(10, 100, "2024-01-01", 2.0, "biedronka")
+    history.add(10, 200, "2024-01-01", 3.0, "Sklep spoza katalogu")
+    history.add(10, 200, "2024-01-02", 3.0, "sklep SPOZA katalogu")
+
+    names = {series["shop_id"]: series["shop_name"] for series in history.history(10, bucket="raw")}
+    assert names == {100: "Biedronka", 200: "Sklep spoza katalogu"}
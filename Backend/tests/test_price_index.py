@@ -0,0 +1,97 @@
+import time
+
+from services import price_index as price_index_module
+from services.price_index import PriceIndex
+
+
+def test_rebuild_skips_pending_observations_already_scanned(monkeypatch):
+    index = PriceIndex()
+
+    def scan(client, page_size):
+        yield (1, 10, 100, "2024-01-01", 2.0, "MLEKO", "Sklep")
+        yield (2, 10, 100, "2024-01-02", 4.0, "MLEKO", "Sklep")
+        # zapisane w trakcie odbudowy: pozycja 2 jest już w skanie, pozycja 3 jeszcze nie
+        index.add(10, 100, "2024-01-02", 4.0, "MLEKO", "Sklep", connect_id=2)
+        index.add(10, 100, "2024-01-03", 9.0, "MLEKO", "Sklep", connect_id=3)
+
+    monkeypatch.setattr(price_index_module, "iter_price_observations", scan)
+    index.rebuild(client=None)
+
+    stats = index._prices[10][100].to_dict()
+    assert stats["observations"] == 3
+    assert stats["median"] == 4.0
+    assert stats["latest"] == 9.0
+
+
+def test_pending_observation_without_connect_id_is_kept(monkeypatch):
+    index = PriceIndex()
+
+    def scan(client, page_size):
+        yield (1, 10, 100, "2024-01-01", 2.0, "MLEKO", "Sklep")
+        index.add(10, 100, "2024-01-01", 2.0, "MLEKO", "Sklep")
+
+    monkeypatch.setattr(price_index_module, "iter_price_observations", scan)
+    index.rebuild(client=None)
+    assert index._prices[10][100].to_dict()["observations"] == 2
+
+
+class _Catalog:
+    def __init__(self, names):
+        self._names = names
+
+    def name(self, shop_id):
+        return self._names.get(shop_id)
+
+
+def test_shop_names_come_from_catalog(monkeypatch):
+    monkeypatch.setattr(price_index_module, "shop_catalog", _Catalog({100: "Biedronka"}))
+    index = PriceIndex()
+    # storeName z paragonu tak, jak wpisał go użytkownik
+    index.add(10, 100, "2024-01-01", 2.0, "MLEKO", "biedronka")
+    index.add(10, 200, "2024-01-01", 3.0, "MLEKO", "Sklep spoza katalogu")
+    index.add(10, 200, "2024-01-02", 3.0, "MLEKO", "sklep SPOZA katalogu")
+
+    shops = {shop["shop_id"]: shop["shop_name"] for shop in index.compare()[0]["shops"]}
+    assert shops == {100: "Biedronka", 200: "Sklep spoza katalogu"}
+
+
+def test_median_uses_recent_window(monkeypatch):
+    monkeypatch.setattr(price_index_module, "PRICE_INDEX_MEDIAN_WINDOW", 3)
+    index = PriceIndex()
+    for day, price in enumerate((1.0, 1.0, 1.0, 5.0, 6.0, 7.0), start=1):
+        index.add(10, 100, f"2024-01-0{day}", price)
+
+    stats = index._prices[10][100].to_dict()
+    assert stats["observations"] == 6
+    assert stats["median"] == 6.0
+    assert stats["min"] == 1.0
+
+
+def _wait_for_refresh():
+    deadline = time.monotonic() + 5
+    while price_index_module._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_first_use_builds_index_and_stale_index_is_rebuilt(monkeypatch):
+    index = PriceIndex()
+    scans = []
+
+    def scan(client, page_size):
+        scans.append(client)
+        yield (1, 10, 100, "2024-01-01", 2.0, "MLEKO", "Sklep")
+
+    monkeypatch.setattr(price_index_module, "price_index", index)
+    monkeypatch.setattr(price_index_module, "iter_price_observations", scan)
+    # odbudowa zlecona przez wcześniejsze testy endpointów
+    _wait_for_refresh()
+
+    assert price_index_module.refresh_if_stale(None)
+    _wait_for_refresh()
+    assert index.ready and len(scans) == 1
+    assert not price_index_module.refresh_if_stale(None)
+
+    monkeypatch.setattr(price_index_module, "PRICE_INDEX_MAX_AGE", 0.0)
+    assert price_index_module.refresh_if_stale(None)
+    _wait_for_refresh()
+    assert len(scans) == 2
@@ -0,0 +1,29 @@
+import pytest
+
+from services.product_index import ProductIndex
+
+
+@pytest.mark.parametrize("existing, query", [
+    ("MLEKO 2%", "MLEKO 3%"),
+    ("PIWO ZYWIEC 0,5L", "PIWO ZYWIEC 0,3L"),
+    ("JAJA L 10", "JAJA M 10"),
+])
+def test_different_size_or_grade_is_not_merged(existing, query):
+    index = ProductIndex()
+    index.add(1, existing)
+    assert index.match(query) is None
+
+
+def test_ocr_typos_still_match():
+    index = ProductIndex()
+    index.add(1, "MLEKO ŁACIATE 3,2% 1L")
+    index.add(2, "SER GOUDA 500 G")
+    assert index.match("MLEK0 LACIATE 3,2% 1L")[0] == 1
+    assert index.match("SER GOUDE 500G")[0] == 2
+
+
+def test_matching_size_wins_over_closer_name():
+    index = ProductIndex()
+    index.add(1, "PIWO ZYWIEC 0,5L")
+    index.add(2, "PIWO ZYWEC 0,3L")
+    assert index.match("PIWO ZYWIEC 0,3L")[0] == 2
@@ -0,0 +1,54 @@
+import re
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services import metrics
+from services.db import supabase_client
+
+_CALLS_RE = re.compile(r'db;[^,]*desc="(\d+) calls"')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(metrics, "SERVER_TIMING", True)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _user_with_receipts(receipts, items):
+    token = f"test-user-{uuid.uuid4().hex}"
+    user = supabase_client.table("users").insert({"token": token}).execute().data[0]
+    shop = supabase_client.table("shops").insert({"name": f"Sklep {uuid.uuid4().hex[:8]}"}).execute().data[0]
+    parcel = supabase_client.table("shops_parcels").insert({"shops_id": shop["id"], "location": None}).execute().data[0]
+    for _ in range(receipts):
+        receipt = supabase_client.table("receipts")\
+            .insert({"creator_id": user["id"], "shop_id": parcel["id"], "date": "2024-03-01", "sum_price": 1.0})\
+            .execute().data[0]
+        indekses = supabase_client.table("receipt_indekses")\
+            .insert([{"indeks": f"PRODUKT {i}", "price": 1.0, "shop_id": shop["id"]} for i in range(items)])\
+            .execute().data
+        supabase_client.table("receipt_connect_indekses")\
+            .insert([{"receipt_id": receipt["id"], "receipt_indeks_id": row["id"], "quantity": 1} for row in indekses])\
+            .execute()
+    return token
+
+
+def _db_calls(response):
+    assert response.status_code == 200, response.text
+    return int(_CALLS_RE.search(response.headers["server-timing"]).group(1))
+
+
+@pytest.mark.parametrize("path", [
+    "/paragon/list?user_id={token}&page_size=20",
+    "/paragon/date-range/?user_id={token}&start_date=2024-01-01&end_date=2024-12-31",
+])
+def test_query_count_does_not_grow_with_receipts(client, path):
+    small = _db_calls(client.get(path.format(token=_user_with_receipts(1, 1))))
+    large = _db_calls(client.get(path.format(token=_user_with_receipts(15, 5))))
+
+    assert large == small
+    # użytkownik, paragony z pozycjami i (dla listy) licznik
+    assert large <= 3
@@ -0,0 +1,80 @@
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+
+from main import app
+from models.receipt_model import Receipt
+from services import paragon_service, receipt_service
+from services.db import supabase_client
+from tests.test_receipt_items import _FailingConnects
+
+
+def _user_and_shop():
+    token = f"test-user-{uuid.uuid4().hex}"
+    supabase_client.table("users").insert({"token": token}).execute()
+    shop_name = f"Sklep {uuid.uuid4().hex[:8]}"
+    shop = supabase_client.table("shops").insert({"name": shop_name}).execute().data[0]
+    supabase_client.table("shops_parcels").insert({"shops_id": shop["id"], "location": None}).execute()
+    return token, shop_name
+
+
+def _receipt(token, shop_name, total):
+    return json.dumps({
+        "storeName": shop_name,
+        "date": "2024-03-01",
+        "items": [{"name": "CHLEB", "quantity": 1, "price": total}],
+        "total": total,
+        "userId": token
+    })
+
+
+def test_malformed_json_keeps_results_of_saved_chunks():
+    token, shop_name = _user_and_shop()
+    lines = [_receipt(token, shop_name, float(total)) for total in (1, 2, 3)]
+    body = "\n".join(lines + ['{"storeName": "zepsuty', _receipt(token, shop_name, 4.0)])
+
+    with TestClient(app) as client:
+        response = client.post("/receipt/bulk?chunk_size=2", content=body.encode())
+
+    assert response.status_code == 207
+    result = response.json()
+    assert result["complete"] is False
+    assert result["saved"] == 3
+    assert [entry["index"] for entry in result["results"]] == [0, 1, 2, 3]
+    assert not result["results"][3]["success"]
+    assert "Niepoprawny JSON" in result["results"][3]["error"]
+
+
+def test_valid_stream_returns_200():
+    token, shop_name = _user_and_shop()
+    body = "[" + ",".join(_receipt(token, shop_name, float(total)) for total in (5, 6)) + "]"
+
+    with TestClient(app) as client:
+        response = client.post("/receipt/bulk", content=body.encode())
+
+    assert response.status_code == 200
+    assert response.json()["saved"] == 2
+    assert response.json()["complete"] is True
+
+
+def test_failed_items_fail_receipts_without_orphans(monkeypatch):
+    token, shop_name = _user_and_shop()
+    failing = _FailingConnects(supabase_client)
+    monkeypatch.setattr(paragon_service, "supabase_client", failing)
+    events = []
+    monkeypatch.setattr(receipt_service, "publish_receipt_saved", events.append)
+
+    receipts = [(i, Receipt(**json.loads(_receipt(token, shop_name, float(total))))) for i, total in enumerate((7, 8))]
+    results = receipt_service.save_receipts_bulk(receipts)
+
+    assert failing.failed
+    assert [result["success"] for result in results] == [False, False]
+    assert events == []
+    user = supabase_client.table("users").select("id").eq("token", token).execute().data[0]
+    assert supabase_client.table("receipts").select("id").eq("creator_id", user["id"]).execute().data == []
+
+    # ponowienie tej samej paczki nie jest traktowane jako duplikat
+    results = receipt_service.save_receipts_bulk(receipts)
+    assert [result.get("duplicate") for result in results] == [None, None]
+    assert all(result["success"] for result in results)
@@ -0,0 +1,49 @@
+import threading
+import uuid
+
+from models.receipt_model import Receipt
+from services.db import supabase_client
+from services.receipt_dedup import idempotent, key_lock, receipt_fingerprint
+from services.receipt_service import save_receipts_bulk
+
+
+def _user_and_shop():
+    token = f"test-user-{uuid.uuid4().hex}"
+    supabase_client.table("users").insert({"token": token}).execute()
+    shop_name = f"Sklep {uuid.uuid4().hex[:8]}"
+    shop = supabase_client.table("shops").insert({"name": shop_name}).execute().data[0]
+    supabase_client.table("shops_parcels").insert({"shops_id": shop["id"], "location": None}).execute()
+    return token, shop_name
+
+
+def test_idempotency_key_and_fingerprint_locks_do_not_deadlock():
+    # zapis z Idempotency-Key bierze blokadę odcisku, trzymając blokadę klucza
+    def save_all():
+        for i in range(500):
+            fingerprint = receipt_fingerprint(1, 1, "2024-01-01", float(i), [])
+            def save():
+                with key_lock(fingerprint):
+                    return {"success": True}
+            idempotent("uid", f"key-{i}", save)
+
+    thread = threading.Thread(target=save_all, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def test_bulk_duplicates_in_batch_share_first_result():
+    token, shop_name = _user_and_shop()
+    receipt = Receipt(
+        storeName=shop_name, date="2024-03-01", total=5.0, userId=token,
+        items=[{"name": "CHLEB", "quantity": 1, "price": 5.0}]
+    )
+
+    results = sorted(save_receipts_bulk([(0, receipt), (1, receipt)]), key=lambda r: r["index"])
+
+    assert results[0]["success"] and not results[0].get("duplicate")
+    assert results[1] == {"index": 1, "success": True, "receipt_id": results[0]["receipt_id"], "duplicate": True}
+
+    # ten sam paragon w kolejnej paczce - taki sam kształt wyniku
+    again = save_receipts_bulk([(0, receipt)])
+    assert again == [{"index": 0, "success": True, "receipt_id": results[0]["receipt_id"], "duplicate": True}]
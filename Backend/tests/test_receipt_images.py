@@ -0,0 +1,69 @@
+import asyncio
+import random
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from models.receipt_model import Receipt
+from services import receipt_images
+from services.receipt_service import save_receipt_to_db
+
+pytest.importorskip("PIL")
+
+
+class _BrokenExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("proces roboczy zakończony"))
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        pass
+
+
+def _image() -> bytes:
+    from benchmarks.images import receipt_image
+    return receipt_image(random.Random(1), width=300, height=600)
+
+
+async def _chunks(data: bytes):
+    yield data
+
+
+@pytest.fixture
+def images_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(receipt_images, "RECEIPT_IMAGES_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_broken_pool_is_replaced_and_retried(images_dir, monkeypatch):
+    executors = [_BrokenExecutor(), ThreadPoolExecutor(max_workers=1)]
+    monkeypatch.setattr(receipt_images, "get_executor", lambda: executors.pop(0))
+
+    result = asyncio.run(receipt_images.store_image(_chunks(_image()), "image/jpeg"))
+
+    assert result["processed"] is True
+    assert executors == []
+    assert receipt_images.variant_path(result["pic_path"], "thumbnail") is not None
+
+
+def test_original_is_served_with_uploaded_content_type(images_dir, monkeypatch):
+    monkeypatch.setattr(receipt_images, "get_executor", lambda: ThreadPoolExecutor(max_workers=1))
+    with TestClient(app) as client:
+        upload = client.post("/receipt/image?user_id=x", content=_image(), headers={"Content-Type": "image/jpeg"})
+        assert upload.status_code == 200, upload.text
+        original = client.get(f"/receipt/image/{upload.json()['pic_path']}?variant=original")
+
+    assert original.status_code == 200
+    assert original.headers["content-type"] == "image/jpeg"
+
+
+def test_unknown_pic_path_is_rejected(images_dir):
+    for pic_path in ("../../etc/passwd", "a" * 64, "a" * 64 + "\n"):
+        receipt = Receipt(storeName="Sklep", items=[], total=0.0, userId="x", picPath=pic_path)
+        result = save_receipt_to_db(receipt)
+        assert not result["success"]
+        assert "picPath" in result["error"]
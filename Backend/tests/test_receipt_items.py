@@ -0,0 +1,54 @@
+import uuid
+
+from services import paragon_service
+from services.db import supabase_client
+from services.paragon_service import save_receipts_items
+
+
+class _FailingConnects:
+    """
+    Klient, którego pierwszy insert do receipt_connect_indekses kończy się błędem
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self.failed = False
+
+    def table(self, name):
+        query = self._client.table(name)
+        if name == "receipt_connect_indekses" and not self.failed:
+            def insert(values, **kwargs):
+                self.failed = True
+                raise Exception("connection reset")
+            query.insert = insert
+        return query
+
+
+def _receipt():
+    user = supabase_client.table("users").insert({"token": f"test-user-{uuid.uuid4().hex}"}).execute().data[0]
+    return supabase_client.table("receipts").insert({"creator_id": user["id"], "date": "2024-03-01"}).execute().data[0]
+
+
+def _items(name):
+    return [{"indeks": f"{name} {i}", "price": 1.0 + i, "quantity": 1} for i in range(3)]
+
+
+def _count(table, column, values):
+    return len(supabase_client.table(table).select("id").in_(column, values).execute().data)
+
+
+def test_retry_after_failed_connect_leaves_no_orphans(monkeypatch):
+    receipt = _receipt()
+    name = uuid.uuid4().hex
+    failing = _FailingConnects(supabase_client)
+    monkeypatch.setattr(paragon_service, "supabase_client", failing)
+
+    assert not save_receipts_items([(receipt["id"], None, _items(name))])["success"]
+    assert failing.failed
+    assert _count("receipt_indekses", "indeks", [item["indeks"] for item in _items(name)]) == 0
+
+    # ponowienie zadania z kolejki - i jeszcze jedno, gdy pierwsze się udało
+    assert save_receipts_items([(receipt["id"], None, _items(name))])["success"]
+    assert save_receipts_items([(receipt["id"], None, _items(name))])["success"]
+    assert _count("receipt_indekses", "indeks", [item["indeks"] for item in _items(name)]) == 3
+    assert _count("receipt_connect_indekses", "receipt_id", [receipt["id"]]) == 3
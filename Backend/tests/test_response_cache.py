@@ -0,0 +1,59 @@
+import pytest
+
+from services import response_cache
+from services.response_cache import InProcessBackend, RedisBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_redis_version_changes_on_bump():
+    backend = RedisBackend(fakeredis.FakeRedis())
+    first = backend.get_version(1)
+    assert backend.get_version(1) == first
+    backend.bump_version(1)
+    assert backend.get_version(1) != first
+
+
+def test_redis_version_does_not_repeat_after_flush():
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(client)
+    seen = {backend.get_version(1)}
+    for _ in range(3):
+        backend.bump_version(1)
+        seen.add(backend.get_version(1))
+
+    client.flushall()
+    assert backend.get_version(1) not in seen
+
+
+def test_redis_bodies_expire():
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(client, ttl=30)
+    backend.set("etag", b"{}")
+    assert backend.get("etag") == b"{}"
+    assert 0 < client.ttl("response_cache:body:etag") <= 30
+
+
+def test_memory_bodies_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    backend = InProcessBackend(ttl=60)
+    backend.set("etag", b"{}")
+    assert backend.get("etag") == b"{}"
+
+    now[0] += 61
+    assert backend.get("etag") is None
+    assert backend.size == 0
+
+
+def test_memory_version_changes_every_ttl_window(monkeypatch):
+    now = [6000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    backend = InProcessBackend(ttl=60)
+    version = backend.get_version(1)
+
+    # zapis obsłużony przez inny proces nie podbija wersji tutaj - ETag zmienia się po ttl
+    now[0] += 30
+    assert backend.get_version(1) == version
+    now[0] += 30
+    assert backend.get_version(1) != version
@@ -0,0 +1,25 @@
+import uuid
+
+from services import paragon_service
+from services.db import supabase_client
+from services.paragon_service import insert_receipt_with_items
+
+
+def test_rpc_save_returns_receipt_and_item_ids(monkeypatch):
+    monkeypatch.setattr(paragon_service, "USE_SAVE_RECEIPT_RPC", True)
+    user = supabase_client.table("users").insert({"token": f"test-user-{uuid.uuid4().hex}"}).execute().data[0]
+    shop = supabase_client.table("shops").insert({"name": f"Sklep {uuid.uuid4().hex[:8]}"}).execute().data[0]
+    name = uuid.uuid4().hex
+    items = [{"indeks": f"{name} {i}", "price": 1.0 + i, "quantity": 1} for i in range(3)]
+
+    result = insert_receipt_with_items({"creator_id": user["id"], "date": "2024-03-01", "sum_price": 6.0}, shop["id"], items)
+
+    assert result["success"]
+    assert result["data"]["creator_id"] == user["id"]
+    connects = supabase_client.table("receipt_connect_indekses")\
+        .select("id, receipt_indekses(indeks, product_id)")\
+        .eq("receipt_id", result["data"]["id"])\
+        .execute().data
+    by_id = {row["id"]: row["receipt_indekses"] for row in connects}
+    for item in items:
+        assert by_id[item["connect_id"]] == {"indeks": item["indeks"], "product_id": item["product_id"]}
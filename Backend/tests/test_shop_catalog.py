@@ -0,0 +1,45 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services.db import supabase_client
+from services.shop_catalog import ShopCatalog, load_shop_catalog
+
+
+def _shop(name):
+    shop = supabase_client.table("shops").insert({"name": name}).execute().data[0]
+    parcel = supabase_client.table("shops_parcels").insert({"shops_id": shop["id"], "location": None}).execute().data[0]
+    return shop["id"], parcel["id"]
+
+
+def test_refresh_picks_up_renamed_shop():
+    old_name, new_name = f"Sklep {uuid.uuid4().hex[:8]}", f"Sklep {uuid.uuid4().hex[:8]}"
+    shop_id, parcel_id = _shop(old_name)
+    catalog = ShopCatalog()
+    catalog.refresh(supabase_client)
+    assert catalog.resolve(old_name)["shop_id"] == shop_id
+
+    supabase_client.table("shops").update({"name": new_name}).eq("id", shop_id).execute()
+    catalog.refresh(supabase_client)
+
+    assert catalog.resolve(old_name) is None
+    assert catalog.resolve(new_name) == {"shop_parcel_id": parcel_id, "shop_id": shop_id}
+    assert catalog.parcel_ids_matching(new_name) == [parcel_id]
+
+
+def test_store_filter_sees_shop_added_after_catalog_load():
+    load_shop_catalog(supabase_client)
+    name = f"Sklep {uuid.uuid4().hex[:8]}"
+    _, parcel_id = _shop(name)
+    token = f"test-user-{uuid.uuid4().hex}"
+    user = supabase_client.table("users").insert({"token": token}).execute().data[0]
+    receipt = supabase_client.table("receipts")\
+        .insert({"creator_id": user["id"], "shop_id": parcel_id, "date": "2024-03-01", "sum_price": 1.0})\
+        .execute().data[0]
+
+    with TestClient(app) as client:
+        response = client.get("/paragon/list", params={"user_id": token, "store_name": name})
+
+    assert response.status_code == 200, response.text
+    assert [paragon["id"] for paragon in response.json()["paragons"]] == [receipt["id"]]
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.do_async("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(scenario()) == [42, 42, 42]
+    assert calls == 1
+
+
+def test_error_is_shared_and_not_remembered():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do_async("key", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        with pytest.raises(ValueError):
+            await flight.do_async("key", fail)
+
+    asyncio.run(scenario())
+    assert calls == 2
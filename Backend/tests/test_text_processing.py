@@ -0,0 +1,32 @@
+from services.text_processing import przetworz_tekst_paragonu
+
+TEXT = """Żabka
+ul. Krakowska 12
+2024-03-01
+PARAGON FISKALNY
+PLACEK PO HEGIERSKU1 szt,48.00
+SCHABOWY PANIEROWANY 1 szt.*39.00
+PIEROGI RUSKIE 2 x 16,41
+CYTRYNOWKA
+1 x 55.88
+HERBATA Z CYTRYNA
+2 szt.x4,50
+SPRZEDAZ OPODATK. A
+SUMA PLN 184,70
+KARTA"""
+
+
+def test_item_formats_from_ocr():
+    result = przetworz_tekst_paragonu(TEXT, "user")
+    receipt = result["receipt"]
+
+    assert receipt.storeName == "Żabka"
+    assert receipt.date == "2024-03-01"
+    assert [(item.name, item.quantity, item.price) for item in receipt.items] == [
+        ("PLACEK PO HEGIERSKU", 1.0, 48.0),
+        ("SCHABOWY PANIEROWANY", 1.0, 39.0),
+        ("PIEROGI RUSKIE", 2.0, 16.41),
+        ("CYTRYNOWKA", 1.0, 55.88),
+        ("HERBATA Z CYTRYNA", 2.0, 4.5),
+    ]
+    assert result["total_valid"]